@@ -0,0 +1,231 @@
+"""
+Сравнение построчной и пакетной генерации графика обслуживания.
+
+Запуск из каталога проекта:
+
+    python benchmarks/schedule_generation.py --sizes 1 100 10000
+
+Замеры выполняются на временной файловой БД SQLite, рабочая БД
+не затрагивается. Построчная генерация, как и во view, работает в режиме
+autocommit; обработчики сохранения записей графика (сводки и календари),
+которых у прежней реализации не было, на время её замера отключаются.
+Для парков больше --legacy-limit её время не замеряется, а оценивается
+линейно по удельному времени на запись из последнего замера (помечено
+"~"); рост БД и индексов при этом не учитывается.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "maintenance_project.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+from django.db.models.signals import post_save, pre_save  # noqa: E402
+
+from equipment.models import (  # noqa: E402
+    Equipment,
+    EquipmentMaintenance,
+    EquipmentType,
+    MaintenanceSchedule,
+)
+from equipment.scheduling import (  # noqa: E402
+    generate_schedules,
+    iter_fleet_plans,
+)
+from equipment.signals import (  # noqa: E402
+    refresh_on_schedule_save,
+    remember_schedule_month,
+)
+
+
+START_DATE = date(2024, 1, 1)
+
+
+def legacy_generate_schedule(equipment, start_date, end_date):
+    """Прежняя реализация: отдельный INSERT на каждую запись."""
+    MaintenanceSchedule.objects.filter(
+        equipment=equipment, planned_date__gte=start_date, planned_date__lte=end_date
+    ).delete()
+
+    periodicity_map = {
+        "to": equipment.maintenance.to_periodicity,
+        "tr": equipment.maintenance.tr_periodicity,
+        "kr": equipment.maintenance.kr_periodicity,
+    }
+
+    for maintenance_type, periodicity in periodicity_map.items():
+        if periodicity:
+            current_date = start_date
+            while current_date <= end_date:
+                MaintenanceSchedule.objects.create(
+                    equipment=equipment,
+                    maintenance_type=maintenance_type,
+                    planned_date=current_date,
+                    status=MaintenanceSchedule.STATUS_CHOICES[0][0],
+                )
+                current_date += timedelta(days=periodicity)
+
+
+@contextmanager
+def schedule_receivers_disconnected():
+    """Отключает обработчики сохранения записей графика на время замера."""
+    receivers = (
+        (pre_save, remember_schedule_month),
+        (post_save, refresh_on_schedule_save),
+    )
+    for signal, receiver in receivers:
+        signal.disconnect(receiver, sender=MaintenanceSchedule)
+    try:
+        yield
+    finally:
+        for signal, receiver in receivers:
+            signal.connect(receiver, sender=MaintenanceSchedule)
+
+
+def create_fleet(size, to, tr, kr):
+    equipment_type = EquipmentType.objects.create(
+        name=f"Бенчмарк {size}", slug=f"benchmark-{size}"
+    )
+    equipments = Equipment.objects.bulk_create(
+        [
+            Equipment(
+                equipment_type=equipment_type,
+                name=f"Станок {index}",
+                model="М-1",
+                manufacturer="Завод",
+                serial_number=f"SN-{index}",
+                inventory_number=f"INV-{size}-{index}",
+                installation_date=START_DATE,
+            )
+            for index in range(size)
+        ]
+    )
+    EquipmentMaintenance.objects.bulk_create(
+        [
+            EquipmentMaintenance(
+                equipment=equipment,
+                to_periodicity=to,
+                tr_periodicity=tr,
+                kr_periodicity=kr,
+            )
+            for equipment in equipments
+        ]
+    )
+    return list(
+        Equipment.objects.filter(equipment_type=equipment_type)
+        .select_related("maintenance")
+    )
+
+
+def measure(func):
+    started = time.perf_counter()
+    func()
+    return time.perf_counter() - started
+
+
+def run(sizes, days, to, tr, kr, legacy_limit):
+    end_date = START_DATE + timedelta(days=days)
+    print(
+        f"Горизонт: {days} дн., периодичности ТО/ТР/КР: {to}/{tr}/{kr}"
+    )
+    print(f"{'Оборудование':>12} {'Записей':>10} {'Построчно, с':>14} "
+          f"{'Пакетно, с':>12} {'Ускорение':>10}")
+
+    seconds_per_row = None
+    measured_size = None
+    extrapolated = False
+    for size in sizes:
+        equipments = create_fleet(size, to, tr, kr)
+        ids = [equipment.pk for equipment in equipments]
+
+        bulk_time = measure(
+            lambda: generate_schedules(
+                iter_fleet_plans(end_date, equipment_ids=ids)
+            )
+        )
+        rows = MaintenanceSchedule.objects.filter(equipment_id__in=ids).count()
+
+        if size <= legacy_limit:
+            MaintenanceSchedule.objects.filter(equipment_id__in=ids).delete()
+            with schedule_receivers_disconnected():
+                legacy_time = measure(
+                    lambda: [
+                        legacy_generate_schedule(equipment, START_DATE, end_date)
+                        for equipment in equipments
+                    ]
+                )
+            measured_size = size
+            seconds_per_row = legacy_time / rows
+            legacy_column = f"{legacy_time:.3f}"
+        elif seconds_per_row is not None:
+            legacy_time = seconds_per_row * rows
+            legacy_column = f"~{legacy_time:.3f}"
+            extrapolated = True
+        else:
+            legacy_time = None
+            legacy_column = "-"
+
+        speedup_column = (
+            "-" if legacy_time is None else f"x{legacy_time / bulk_time:.1f}"
+        )
+        print(f"{size:>12} {rows:>10} {legacy_column:>14} "
+              f"{bulk_time:>12.3f} {speedup_column:>10}")
+
+    if extrapolated:
+        print(
+            '"~" - построчная генерация не замерялась: время оценено линейно '
+            f"по удельному времени парка из {measured_size} ед. (--legacy-limit), "
+            "без учёта роста БД и индексов; ускорение для этих строк - оценка."
+        )
+    print(
+        "Построчная генерация замерена без обработчиков сохранения записей "
+        "графика, которых у прежней реализации не было."
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 100, 10000])
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--to", type=int, default=7)
+    parser.add_argument("--tr", type=int, default=28)
+    parser.add_argument("--kr", type=int, default=364)
+    parser.add_argument(
+        "--legacy-limit",
+        type=int,
+        default=100,
+        help="Не замерять построчную генерацию для парков больше этого размера.",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        connection.settings_dict["TEST"]["NAME"] = str(
+            Path(tmp_dir) / "benchmark.sqlite3"
+        )
+        old_name = connection.creation.create_test_db(verbosity=0)
+        try:
+            run(
+                args.sizes,
+                args.days,
+                args.to,
+                args.tr,
+                args.kr,
+                args.legacy_limit,
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
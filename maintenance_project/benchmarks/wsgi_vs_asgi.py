@@ -0,0 +1,169 @@
+"""
+Нагрузочное сравнение JSON API под WSGI (gunicorn) и ASGI (uvicorn).
+
+Запуск из каталога проекта:
+
+    python benchmarks/wsgi_vs_asgi.py --requests 2000 --concurrency 8 64
+
+Скрипт поочерёдно запускает gunicorn (потоковые воркеры gthread) и
+uvicorn с одинаковым числом процессов на рабочей БД проекта, прогревает
+их и отправляет --requests GET-запросов к чтениям графика, календаря и
+оборудования с заданным числом одновременных соединений. Запросы только
+читают данные и отправляются без If-None-Match, поэтому каждый ответ
+строится заново. Для каждого сервера выводятся пропускная способность
+и перцентили задержки.
+
+Оба сервера обслуживают одни и те же асинхронные представления API.
+Под WSGI Django выполняет их через async_to_sync, а асинхронный ORM
+в обоих случаях уходит в поток через sync_to_async, поэтому строка WSGI
+включает накладные расходы адаптера и не равна синхронному варианту
+представлений: сравнивается развёртывание асинхронного API, а не
+синхронный код против асинхронного.
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+DEFAULT_URLS = (
+    "/api/calendar/?year=2024&month=3",
+    "/api/schedule/?from=2024-03-01&to=2024-03-31",
+    "/api/equipment/1/",
+)
+
+
+def server_commands(port, workers, threads):
+    bind = f"127.0.0.1:{port}"
+    return {
+        "WSGI": [
+            sys.executable, "-m", "gunicorn", "maintenance_project.wsgi",
+            "--bind", bind, "--workers", str(workers),
+            "--worker-class", "gthread", "--threads", str(threads),
+            "--log-level", "warning",
+        ],
+        "ASGI": [
+            sys.executable, "-m", "uvicorn", "maintenance_project.asgi:application",
+            "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(workers), "--log-level", "warning",
+        ],
+    }
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as sock:
+            if sock.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.1)
+    raise RuntimeError(f"Сервер не ответил на порту {port} за {timeout} с.")
+
+
+async def fetch(port, url):
+    """Выполняет один GET-запрос и возвращает код ответа."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(
+        f"GET {url} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n"
+        .encode()
+    )
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    await writer.wait_closed()
+    return int(response.split(b" ", 2)[1])
+
+
+async def load(port, urls, requests, concurrency):
+    """
+    Отправляет requests запросов не более чем по concurrency одновременно.
+
+    Returns:
+        Кортеж (общее время, задержки успешных запросов, число ошибок).
+    """
+    queue = itertools.islice(itertools.cycle(urls), requests)
+    latencies = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        for url in queue:
+            started = time.perf_counter()
+            try:
+                status = await fetch(port, url)
+            except OSError:
+                status = None
+            if status == 200:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - started, latencies, errors
+
+
+def percentile(values, fraction):
+    return sorted(values)[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run(args):
+    print(
+        f"Процессов: {args.workers}, потоков gthread: {args.threads}, "
+        f"запросов: {args.requests}"
+    )
+    print(
+        "Представления API асинхронные: под WSGI они выполняются через "
+        "async_to_sync, это не замер синхронных представлений."
+    )
+    print(f"{'Сервер':>6} {'Соединений':>10} {'Запросов/с':>11} {'p50, мс':>8} "
+          f"{'p95, мс':>8} {'p99, мс':>8} {'Ошибок':>7}")
+
+    for name, command in server_commands(
+        args.port, args.workers, args.threads
+    ).items():
+        server = subprocess.Popen(command, cwd=BASE_DIR, env=os.environ.copy())
+        try:
+            wait_for_port(args.port)
+            asyncio.run(load(args.port, args.urls, len(args.urls) * 10, 4))
+            for concurrency in args.concurrency:
+                elapsed, latencies, errors = asyncio.run(
+                    load(args.port, args.urls, args.requests, concurrency)
+                )
+                if not latencies:
+                    print(f"{name:>6} {concurrency:>10} {'-':>11} {'-':>8} "
+                          f"{'-':>8} {'-':>8} {errors:>7}")
+                    continue
+                print(
+                    f"{name:>6} {concurrency:>10} "
+                    f"{len(latencies) / elapsed:>11.0f} "
+                    f"{statistics.median(latencies) * 1000:>8.1f} "
+                    f"{percentile(latencies, 0.95) * 1000:>8.1f} "
+                    f"{percentile(latencies, 0.99) * 1000:>8.1f} "
+                    f"{errors:>7}"
+                )
+        finally:
+            server.terminate()
+            server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[8, 64])
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--urls", nargs="+", default=list(DEFAULT_URLS))
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
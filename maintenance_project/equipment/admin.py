@@ -1,13 +1,76 @@
-from django.contrib import admin
+import io
 
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+
+from .forms import EquipmentImportForm
+from .importing import import_equipment
 from .models import (
     Equipment,
     EquipmentType,
     EquipmentMaintenance,
     MaintenanceSchedule,
+    schedules_bulk_updated,
 )
 
 
+class EquipmentAutocompleteFilter(admin.SimpleListFilter):
+    """
+    Фильтр по оборудованию с автодополнением.
+
+    Варианты не перечисляются в боковой панели: оборудование ищется
+    через автодополнение админки (search_fields EquipmentAdmin), поэтому
+    фильтр не загружает весь парк.
+    """
+
+    title = "оборудование"
+    parameter_name = "equipment"
+    template = "admin/equipment/autocomplete_filter.html"
+
+    def __init__(self, request, params, model, model_admin):
+        super().__init__(request, params, model, model_admin)
+        if self.value() and not self.value().isdigit():
+            raise IncorrectLookupParameters("Неверный идентификатор оборудования.")
+        self.widget = AutocompleteSelect(
+            model._meta.get_field("equipment"), model_admin.admin_site
+        )
+        self.widget.choices = forms.ModelChoiceField(
+            queryset=Equipment.objects.all()
+        ).choices
+
+    def rendered_widget(self):
+        return self.widget.render(
+            self.parameter_name,
+            self.value(),
+            attrs={"id": "equipment-autocomplete-filter"},
+        )
+
+    @classmethod
+    def media(cls, model, admin_site):
+        return AutocompleteSelect(
+            model._meta.get_field("equipment"), admin_site
+        ).media
+
+    def has_output(self):
+        return True
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(equipment_id=self.value())
+        return queryset
+
+
 class EquipmentMaintenanceInline(admin.StackedInline):
     model = EquipmentMaintenance
     can_delete = False
@@ -24,35 +87,115 @@ class EquipmentAdmin(admin.ModelAdmin):
         "get_to_periodicity",
         "get_tr_periodicity",
         "get_kr_periodicity",
+        "get_next_to_date",
+        "get_overdue_count",
+        "get_last_completed_date",
     )
+    list_select_related = ("equipment_type", "summary")
+    search_fields = ("name", "inventory_number", "serial_number")
     inlines = [EquipmentMaintenanceInline]
+    change_list_template = "admin/equipment/equipment/change_list.html"
 
-    def get_to_periodicity(self, obj):
+    def get_urls(self):
+        return [
+            path(
+                "import/",
+                self.admin_site.admin_view(self.import_view),
+                name="equipment_equipment_import",
+            ),
+        ] + super().get_urls()
+
+    def import_view(self, request):
+        """Массовый импорт оборудования из CSV с отчётом по строкам."""
+        if not self.has_add_permission(request):
+            return redirect("admin:equipment_equipment_changelist")
+
+        report = None
+        form = EquipmentImportForm(request.POST or None, request.FILES or None)
+        if request.method == "POST" and form.is_valid():
+            lines = io.TextIOWrapper(
+                form.cleaned_data["file"].file, encoding="utf-8-sig", newline=""
+            )
+            try:
+                report = import_equipment(
+                    lines, schedule_until=form.cleaned_data["schedule_until"]
+                )
+            except (UnicodeDecodeError, ValidationError) as error:
+                form.add_error(
+                    "file",
+                    " ".join(error.messages)
+                    if isinstance(error, ValidationError)
+                    else "Файл должен быть в кодировке UTF-8.",
+                )
+            else:
+                messages.success(
+                    request,
+                    f"Создано: {report.created}, обновлено: {report.updated}, "
+                    f"ошибок: {len(report.errors)} "
+                    f"({report.rows_per_second:.0f} строк/с).",
+                )
+
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": "Импорт оборудования",
+            "form": form,
+            "report": report,
+        }
+        return TemplateResponse(
+            request, "admin/equipment/equipment/import.html", context
+        )
+
+    def get_queryset(self, request):
+        # Периодичности берутся из того же запроса (LEFT JOIN), что и
+        # страница списка, и доступны для сортировки.
         return (
-            obj.maintenance.to_periodicity
-            if hasattr(obj, "maintenance")
-            else None
+            super()
+            .get_queryset(request)
+            .annotate(
+                to_periodicity=F("maintenance__to_periodicity"),
+                tr_periodicity=F("maintenance__tr_periodicity"),
+                kr_periodicity=F("maintenance__kr_periodicity"),
+            )
         )
 
+    def get_to_periodicity(self, obj):
+        return obj.to_periodicity
+
     get_to_periodicity.short_description = "ТО (дни)"
+    get_to_periodicity.admin_order_field = "to_periodicity"
 
     def get_tr_periodicity(self, obj):
-        return (
-            obj.maintenance.tr_periodicity
-            if hasattr(obj, "maintenance") and obj.maintenance.tr_periodicity
-            else None
-        )
+        return obj.tr_periodicity or None
 
     get_tr_periodicity.short_description = "ТР (дни)"
+    get_tr_periodicity.admin_order_field = "tr_periodicity"
 
     def get_kr_periodicity(self, obj):
+        return obj.kr_periodicity or None
+
+    get_kr_periodicity.short_description = "КР (дни)"
+    get_kr_periodicity.admin_order_field = "kr_periodicity"
+
+    def get_next_to_date(self, obj):
+        return obj.summary.next_to_date if hasattr(obj, "summary") else None
+
+    get_next_to_date.short_description = "Следующее ТО"
+    get_next_to_date.admin_order_field = "summary__next_to_date"
+
+    def get_overdue_count(self, obj):
+        return obj.summary.overdue_count if hasattr(obj, "summary") else None
+
+    get_overdue_count.short_description = "Просрочено работ"
+    get_overdue_count.admin_order_field = "summary__overdue_count"
+
+    def get_last_completed_date(self, obj):
         return (
-            obj.maintenance.kr_periodicity
-            if hasattr(obj, "maintenance") and obj.maintenance.kr_periodicity
-            else None
+            obj.summary.last_completed_date if hasattr(obj, "summary") else None
         )
 
-    get_kr_periodicity.short_description = "КР (дни)"
+    get_last_completed_date.short_description = "Последняя выполненная работа"
+    get_last_completed_date.admin_order_field = "summary__last_completed_date"
 
 
 @admin.register(EquipmentType)
@@ -70,5 +213,59 @@ class MaintenanceScheduleAdmin(admin.ModelAdmin):
         "status",
         "notes",
     )
-    list_filter = ("equipment", "maintenance_type", "status")
-    list_editable = ("status", "notes", "actual_date")
\ No newline at end of file
+    list_filter = (EquipmentAutocompleteFilter, "maintenance_type", "status")
+    list_editable = ("status", "notes", "actual_date")
+    list_select_related = ("equipment",)
+    search_fields = ("equipment__name", "equipment__inventory_number")
+    autocomplete_fields = ("equipment",)
+    # Без полного COUNT(*) по таблице графика на каждой странице.
+    show_full_result_count = False
+    actions = ("mark_completed", "reopen")
+
+    @property
+    def media(self):
+        return super().media + EquipmentAutocompleteFilter.media(
+            self.model, self.admin_site
+        )
+
+    def delete_queryset(self, request, queryset):
+        # Одно удаление без сигналов на каждую запись, затем один пересчёт
+        # сводок и календарей затронутого оборудования.
+        with transaction.atomic():
+            items = list(queryset.values_list("equipment_id", "planned_date"))
+            queryset.delete()
+            schedules_bulk_updated.send(sender=self.model, items=items)
+
+    def delete_model(self, request, obj):
+        self.delete_queryset(request, self.model.objects.filter(pk=obj.pk))
+
+    def transition(self, request, queryset, status):
+        ids = queryset.values_list("pk", flat=True)
+        try:
+            updated = MaintenanceSchedule.objects.bulk_transition(
+                (pk, status, None) for pk in ids
+            )
+        except ValidationError as error:
+            self.message_user(
+                request,
+                "Статусы не изменены: "
+                + "; ".join(
+                    f"запись {pk}: {' '.join(field_errors)}"
+                    for pk, field_errors in error.message_dict.items()
+                ),
+                messages.ERROR,
+            )
+        else:
+            self.message_user(
+                request, f"Статус «{status}» установлен у записей: {len(updated)}."
+            )
+
+    def mark_completed(self, request, queryset):
+        self.transition(request, queryset, MaintenanceSchedule.STATUS_CHOICES[1][0])
+
+    mark_completed.short_description = "Отметить выполненными (сегодня)"
+
+    def reopen(self, request, queryset):
+        self.transition(request, queryset, MaintenanceSchedule.STATUS_CHOICES[0][0])
+
+    reopen.short_description = "Вернуть в план"
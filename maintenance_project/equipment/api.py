@@ -0,0 +1,421 @@
+from calendar import monthrange
+from datetime import date
+
+from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.http import quote_etag
+from django.views import View
+from django.views.decorators.http import condition
+
+from .caching import (
+    calendar_month_key,
+    calendar_owner_key,
+    catalog_key,
+    equipment_version_keys,
+    get_month_skeleton,
+    remember_equipment_type,
+    versions_etag,
+)
+from .forecast import FORECAST_MAX_WEEKS, FORECAST_WEEKS, aget_forecast
+from .models import Equipment, EquipmentType, MaintenanceSchedule
+from .pagination import InvalidCursor, KeysetPaginator
+from .utils import filter_equipment
+
+
+# Размер страницы списков по умолчанию и максимальный.
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 200
+
+# Максимальная длина диапазона графика (в днях).
+API_MAX_RANGE_DAYS = 731
+
+
+class ApiError(Exception):
+    """Ошибка в параметрах запроса; возвращается клиенту с кодом 400."""
+
+
+def get_periodicities(equipment):
+    maintenance = getattr(equipment, "maintenance", None)
+    if maintenance is None:
+        return None
+    return {
+        "to": maintenance.to_periodicity,
+        "tr": maintenance.tr_periodicity,
+        "kr": maintenance.kr_periodicity,
+    }
+
+
+EQUIPMENT_FIELDS = {
+    "id": lambda equipment: equipment.pk,
+    "name": lambda equipment: equipment.name,
+    "type": lambda equipment: (
+        equipment.equipment_type.slug if equipment.equipment_type else None
+    ),
+    "model": lambda equipment: equipment.model,
+    "manufacturer": lambda equipment: equipment.manufacturer,
+    "serial_number": lambda equipment: equipment.serial_number,
+    "inventory_number": lambda equipment: equipment.inventory_number,
+    "installation_date": lambda equipment: equipment.installation_date,
+    "description": lambda equipment: equipment.description,
+    "periodicities": get_periodicities,
+}
+
+TYPE_FIELDS = {
+    "id": lambda equipment_type: equipment_type.pk,
+    "name": lambda equipment_type: equipment_type.name,
+    "slug": lambda equipment_type: equipment_type.slug,
+    "description": lambda equipment_type: equipment_type.description,
+}
+
+SCHEDULE_FIELDS = {
+    "id": lambda item: item.pk,
+    "equipment": lambda item: item.equipment_id,
+    "maintenance_type": lambda item: item.maintenance_type,
+    "planned_date": lambda item: item.planned_date,
+    "actual_date": lambda item: item.actual_date,
+    "status": lambda item: item.current_status,
+    "notes": lambda item: item.notes,
+}
+
+
+def parse_date(value, name):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ApiError(f"Параметр {name}: неверная дата (ожидается ГГГГ-ММ-ДД).")
+
+
+def iter_months(start_date, end_date):
+    year, month = start_date.year, start_date.month
+    while (year, month) <= (end_date.year, end_date.month):
+        yield year, month
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+class ApiView(View):
+    """
+    Базовое представление JSON API только для чтения.
+
+    Ответы снабжаются сильным ETag, который вычисляется из счётчиков
+    версий в кэше (get_version_keys) и параметров запроса, поэтому при
+    совпадении If-None-Match ответ 304 отдаётся без обращения к БД.
+    Списки поддерживают выбор полей (?fields=a,b) и курсорную пагинацию.
+
+    Представления асинхронные и читают БД через асинхронный ORM, поэтому
+    под ASGI один процесс обслуживает много одновременных запросов.
+    """
+
+    http_method_names = ["get", "head", "options"]
+    fields = {}
+
+    def get_version_keys(self):
+        """
+        Возвращает ключи версий ответа.
+
+        None означает, что ключи ещё неизвестны без обращения к БД; такой
+        ответ получает ETag после обработки запроса.
+        """
+        raise NotImplementedError
+
+    def get_etag(self, request, *args, **kwargs):
+        try:
+            keys = self.get_version_keys()
+        except ApiError:
+            return None
+        if keys is None:
+            return None
+        # Текущая дата влияет на фильтры и статусы с учётом просрочки.
+        return versions_etag(
+            keys,
+            request.path,
+            sorted(request.GET.lists()),
+            timezone.now().date(),
+        )
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            response = await condition(etag_func=self.get_etag)(self.handle)(
+                request, *args, **kwargs
+            )
+        except ApiError as error:
+            return self.render({"error": str(error)}, status=400)
+        # Ключи версий могли стать известны при обработке запроса.
+        if response.status_code == 200 and not response.has_header("ETag"):
+            etag = self.get_etag(request, *args, **kwargs)
+            if etag:
+                response["ETag"] = quote_etag(etag)
+        return response
+
+    async def handle(self, request, *args, **kwargs):
+        return await super().dispatch(request, *args, **kwargs)
+
+    def render(self, data, status=200):
+        return JsonResponse(
+            data, status=status, json_dumps_params={"ensure_ascii": False}
+        )
+
+    def get_fields(self):
+        requested = self.request.GET.get("fields")
+        if not requested:
+            return list(self.fields)
+        fields = [field.strip() for field in requested.split(",") if field.strip()]
+        unknown = [field for field in fields if field not in self.fields]
+        if unknown:
+            raise ApiError("Неизвестные поля: " + ", ".join(unknown) + ".")
+        return fields
+
+    def serialize(self, obj, fields):
+        return {field: self.fields[field](obj) for field in fields}
+
+    def get_limit(self):
+        try:
+            limit = int(self.request.GET.get("limit", API_PAGE_SIZE))
+        except ValueError:
+            raise ApiError("Параметр limit должен быть целым числом.")
+        if not 1 <= limit <= API_MAX_PAGE_SIZE:
+            raise ApiError(f"Параметр limit должен быть от 1 до {API_MAX_PAGE_SIZE}.")
+        return limit
+
+    def get_page_url(self, cursor):
+        if cursor is None:
+            return None
+        params = self.request.GET.copy()
+        params["cursor"] = cursor
+        return f"{self.request.path}?{params.urlencode()}"
+
+    async def render_page(self, queryset, ordering):
+        fields = self.get_fields()
+        paginator = KeysetPaginator(queryset, ordering, self.get_limit())
+        try:
+            page = await paginator.apage(self.request.GET.get("cursor"))
+        except InvalidCursor as error:
+            raise ApiError(str(error))
+        return self.render(
+            {
+                "results": [self.serialize(obj, fields) for obj in page],
+                "next": self.get_page_url(page.next_cursor),
+                "previous": self.get_page_url(page.previous_cursor),
+            }
+        )
+
+
+class EquipmentApiMixin:
+    fields = EQUIPMENT_FIELDS
+
+    def get_queryset(self):
+        return filter_equipment(
+            Equipment.objects.select_related("equipment_type", "maintenance")
+        )
+
+
+class EquipmentListApiView(EquipmentApiMixin, ApiView):
+    """Список оборудования; фильтр по типу: ?type=<slug>."""
+
+    # Страница оборудования с типом и периодичностями.
+    query_budget = 1
+
+    def get_version_keys(self):
+        return [catalog_key()]
+
+    async def get(self, request, *args, **kwargs):
+        queryset = self.get_queryset()
+        if request.GET.get("type"):
+            queryset = queryset.filter(equipment_type__slug=request.GET["type"])
+        return await self.render_page(queryset, ("id",))
+
+
+class EquipmentDetailApiView(EquipmentApiMixin, ApiView):
+    """Оборудование с периодичностями обслуживания."""
+
+    # Оборудование с типом и периодичностями.
+    query_budget = 1
+
+    def get_version_keys(self):
+        return equipment_version_keys(self.kwargs["equipment_id"])
+
+    async def get(self, request, *args, **kwargs):
+        equipment = (
+            await self.get_queryset().filter(pk=self.kwargs["equipment_id"]).afirst()
+        )
+        if equipment is None:
+            return self.render({"error": "Оборудование не найдено."}, status=404)
+        remember_equipment_type(equipment.pk, equipment.equipment_type_id)
+        return self.render(self.serialize(equipment, self.get_fields()))
+
+
+class EquipmentTypeListApiView(ApiView):
+    """Список отображаемых типов оборудования."""
+
+    fields = TYPE_FIELDS
+    # Страница типов.
+    query_budget = 1
+
+    def get_version_keys(self):
+        return [catalog_key()]
+
+    async def get(self, request, *args, **kwargs):
+        return await self.render_page(
+            EquipmentType.objects.filter(is_displayed=True), ("id",)
+        )
+
+
+class ScheduleApiView(ApiView):
+    """
+    График обслуживания за диапазон дат.
+
+    Параметры: from и to (ГГГГ-ММ-ДД; по умолчанию текущий месяц),
+    equipment - идентификатор оборудования (по умолчанию весь парк).
+    Статус возвращается с учётом просрочки на текущую дату.
+    """
+
+    fields = SCHEDULE_FIELDS
+    # Страница записей графика.
+    query_budget = 1
+
+    def get_range(self):
+        today = timezone.now().date()
+        params = self.request.GET
+        start_date = (
+            parse_date(params["from"], "from")
+            if params.get("from")
+            else today.replace(day=1)
+        )
+        if params.get("to"):
+            end_date = parse_date(params["to"], "to")
+        else:
+            end_date = start_date.replace(
+                day=monthrange(start_date.year, start_date.month)[1]
+            )
+        if end_date < start_date:
+            raise ApiError("Дата from не может быть позже даты to.")
+        if (end_date - start_date).days > API_MAX_RANGE_DAYS:
+            raise ApiError(
+                f"Диапазон не может быть длиннее {API_MAX_RANGE_DAYS} дней."
+            )
+        return start_date, end_date
+
+    def get_equipment_id(self):
+        equipment_id = self.request.GET.get("equipment")
+        if not equipment_id:
+            return None
+        if not equipment_id.isdigit():
+            raise ApiError("Параметр equipment должен быть целым числом.")
+        return int(equipment_id)
+
+    def get_version_keys(self):
+        equipment_id = self.get_equipment_id()
+        keys = [calendar_owner_key(equipment_id)]
+        keys.extend(
+            calendar_month_key(equipment_id, year, month)
+            for year, month in iter_months(*self.get_range())
+        )
+        return keys
+
+    def get_schedule(self, start_date, end_date):
+        queryset = MaintenanceSchedule.objects.filter(
+            planned_date__gte=start_date, planned_date__lte=end_date
+        ).annotate_effective_status()
+        equipment_id = self.get_equipment_id()
+        if equipment_id is not None:
+            queryset = queryset.filter(equipment_id=equipment_id)
+        return queryset
+
+    async def get(self, request, *args, **kwargs):
+        return await self.render_page(
+            self.get_schedule(*self.get_range()),
+            ("planned_date", "equipment_id", "id"),
+        )
+
+
+class CalendarApiView(ScheduleApiView):
+    """
+    Календарь обслуживания на месяц.
+
+    Параметры: year и month (по умолчанию текущий месяц), equipment -
+    идентификатор оборудования (по умолчанию весь парк). Возвращает
+    недели месяца с записями графика по дням.
+    """
+
+    fields = {
+        field: getter
+        for field, getter in SCHEDULE_FIELDS.items()
+        if field != "planned_date"
+    }
+    # Записи графика за месяц.
+    query_budget = 1
+
+    def get_year_month(self):
+        today = timezone.now().date()
+        try:
+            year = int(self.request.GET.get("year", today.year))
+            month = int(self.request.GET.get("month", today.month))
+        except ValueError:
+            raise ApiError("Параметры year и month должны быть целыми числами.")
+        if not 1 <= month <= 12:
+            raise ApiError("Параметр month должен быть от 1 до 12.")
+        if not 1 <= year <= 9999:
+            raise ApiError("Параметр year должен быть от 1 до 9999.")
+        return year, month
+
+    def get_range(self):
+        year, month = self.get_year_month()
+        return date(year, month, 1), date(year, month, monthrange(year, month)[1])
+
+    async def get(self, request, *args, **kwargs):
+        year, month = self.get_year_month()
+        fields = self.get_fields()
+        today = timezone.now().date()
+
+        items_by_day = {}
+        schedule = self.get_schedule(*self.get_range()).order_by(
+            "planned_date", "equipment_id", "id"
+        )
+        async for item in schedule.aiterator():
+            items_by_day.setdefault(item.planned_date.day, []).append(
+                self.serialize(item, fields)
+            )
+
+        weeks = [
+            [
+                {
+                    "day": day,
+                    "is_today": date(year, month, day) == today,
+                    "is_weekend": is_weekend,
+                    "items": items_by_day.get(day, []),
+                }
+                if day
+                else None
+                for day, is_weekend in week
+            ]
+            for week in get_month_skeleton(year, month)
+        ]
+        return self.render({"year": year, "month": month, "weeks": weeks})
+
+
+class ForecastApiView(ApiView):
+    """
+    Прогноз числа работ ТО/ТР/КР по неделям и типам оборудования.
+
+    Параметр weeks - горизонт в неделях (по умолчанию FORECAST_WEEKS).
+    Прогноз вычисляется по периодичностям и датам ввода без обращения
+    к графику и кэшируется по горизонту (см. get_forecast).
+    """
+
+    # При промахе кэша периодичности парка и названия типов.
+    query_budget = 2
+
+    def get_weeks(self):
+        try:
+            weeks = int(self.request.GET.get("weeks", FORECAST_WEEKS))
+        except ValueError:
+            raise ApiError("Параметр weeks должен быть целым числом.")
+        if not 1 <= weeks <= FORECAST_MAX_WEEKS:
+            raise ApiError(f"Параметр weeks должен быть от 1 до {FORECAST_MAX_WEEKS}.")
+        return weeks
+
+    def get_version_keys(self):
+        self.get_weeks()
+        return [catalog_key()]
+
+    async def get(self, request, *args, **kwargs):
+        return self.render(await aget_forecast(self.get_weeks()))
@@ -1,7 +1,22 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.db.models.signals import post_migrate
 
 
 class EquipmentConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'equipment'
     verbose_name = "Оборудование"
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .search import reinstall_search_index
+
+        # Миграции, пересоздающие таблицу оборудования в SQLite, теряют
+        # триггеры поискового индекса.
+        post_migrate.connect(reinstall_search_index, sender=self)
+
+        if getattr(settings, "OVERDUE_SWEEPER_THREAD", False):
+            from .sweeper import start_overdue_sweeper
+
+            start_overdue_sweeper()
@@ -0,0 +1,336 @@
+import hashlib
+from calendar import monthrange
+from functools import lru_cache
+
+from django.core.cache import cache
+from django.utils import timezone
+
+
+# Время жизни закэшированных данных календаря (в секундах).
+CALENDAR_CACHE_TIMEOUT = 60 * 60
+
+# Идентификатор календаря всего парка в ключах кэша.
+FLEET = "all"
+
+# Время жизни закэшированных фрагментов шаблонов (в секундах).
+FRAGMENT_CACHE_TIMEOUT = 24 * 60 * 60
+
+
+# Начальное значение версии. Оно одинаково во всех процессах, поэтому
+# одно и то же представление получает один ETag, какой бы процесс его
+# ни построил.
+INITIAL_VERSION = 1
+
+
+def version_key(*parts):
+    return "equipment:version:" + ":".join(str(part) for part in parts)
+
+
+def get_versions(*keys):
+    """
+    Возвращает текущие версии для набора ключей версий.
+
+    Отсутствующие версии создаются через cache.add, который не
+    перезаписывает версию, уже созданную другим процессом.
+    """
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        for key in missing:
+            cache.add(key, INITIAL_VERSION, None)
+        versions.update(cache.get_many(missing))
+    return [versions.get(key, INITIAL_VERSION) for key in keys]
+
+
+def bump_versions(keys):
+    """Увеличивает версии, делая недействительными зависящие от них ключи."""
+    for key in set(keys):
+        cache.add(key, INITIAL_VERSION, None)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Ключ вытеснен между add и incr.
+            cache.set(key, INITIAL_VERSION + 1, None)
+
+
+def calendar_owner_key(equipment_id):
+    """
+    Ключ общей версии календаря оборудования (или парка, если None).
+
+    Меняется при массовой перегенерации графика оборудования.
+    """
+    return version_key("calendar", equipment_id or FLEET)
+
+
+def calendar_month_key(equipment_id, year, month):
+    """Ключ версии календаря оборудования (или парка) за месяц."""
+    return version_key("calendar", equipment_id or FLEET, year, month)
+
+
+def schedule_key(equipment_id):
+    """
+    Ключ версии всего графика оборудования (или парка, если None).
+
+    Меняется при любом изменении записей графика, в каком бы месяце
+    они ни находились.
+    """
+    return version_key("schedule", equipment_id or FLEET)
+
+
+def versions_etag(keys, *parts):
+    """
+    Возвращает ETag из текущих версий keys и дополнительных частей parts.
+
+    Вычисляется только по кэшу, без обращения к БД.
+    """
+    payload = repr((parts, get_versions(*keys)))
+    return hashlib.md5(payload.encode()).hexdigest()
+
+
+@lru_cache(maxsize=256)
+def get_month_skeleton(year, month):
+    """
+    Возвращает неизменную сетку месяца.
+
+    Returns:
+        Кортеж недель; неделя - кортеж из семи пар (день, выходной),
+        где день равен None для ячеек вне месяца.
+    """
+    days_in_month = monthrange(year, month)[1]
+    first_day_weekday = monthrange(year, month)[0]
+
+    cells = [(None, False)] * first_day_weekday
+    for day in range(1, days_in_month + 1):
+        cells.append((day, (first_day_weekday + day - 1) % 7 in (5, 6)))
+    cells.extend([(None, False)] * (-len(cells) % 7))
+
+    return tuple(tuple(cells[index:index + 7]) for index in range(0, len(cells), 7))
+
+
+def group_by_day(schedule_items):
+    """Группирует записи графика по дню месяца плановой даты."""
+    schedule_by_day = {}
+    for item in schedule_items:
+        schedule_by_day.setdefault(item.planned_date.day, []).append(item)
+    return schedule_by_day
+
+
+def get_month_buckets(year, month, loader, equipment_id=None):
+    """
+    Возвращает записи месяца, сгруппированные по дням, из кэша.
+
+    Args:
+        year: Год.
+        month: Номер месяца.
+        loader: Функция без аргументов, возвращающая записи месяца
+                в порядке плановой даты; вызывается при промахе кэша.
+        equipment_id: Оборудование; None - календарь всего парка.
+
+    Returns:
+        Словарь {день: [записи]}.
+    """
+    versions = get_versions(
+        calendar_owner_key(equipment_id),
+        calendar_month_key(equipment_id, year, month),
+    )
+    key = "equipment:calendar:{}:{}:{}:{}".format(
+        equipment_id or FLEET,
+        year,
+        month,
+        ":".join(str(version) for version in versions),
+    )
+    schedule_by_day = cache.get(key)
+    if schedule_by_day is None:
+        schedule_by_day = group_by_day(loader())
+        cache.set(key, schedule_by_day, CALENDAR_CACHE_TIMEOUT)
+    return schedule_by_day
+
+
+def invalidate_calendar_months(items):
+    """
+    Сбрасывает календари месяцев, затронутых изменёнными записями.
+
+    Args:
+        items: Пары (equipment_id, planned_date).
+    """
+    keys = []
+    for equipment_id, planned_date in items:
+        for owner in (equipment_id, None):
+            keys.append(
+                calendar_month_key(owner, planned_date.year, planned_date.month)
+            )
+            keys.append(schedule_key(owner))
+    bump_versions(keys)
+
+
+def invalidate_equipment_calendars(equipment_ids):
+    """Сбрасывает все месяцы календарей оборудования и календарь парка."""
+    keys = [calendar_owner_key(None), schedule_key(None)]
+    for equipment_id in equipment_ids:
+        keys.append(calendar_owner_key(equipment_id))
+        keys.append(schedule_key(equipment_id))
+    bump_versions(keys)
+
+
+def catalog_key():
+    """
+    Ключ версии справочника оборудования (оборудование, типы, периодичности).
+
+    Меняется при любом изменении оборудования парка.
+    """
+    return version_key("catalog")
+
+
+def equipment_key(equipment_id):
+    """Ключ версии данных одной единицы оборудования."""
+    return version_key("equipment", equipment_id)
+
+
+def equipment_type_key(equipment_type_id):
+    """
+    Ключ версии типа оборудования.
+
+    Меняется при изменении типа и делает недействительными данные всего
+    оборудования типа без перебора этого оборудования.
+    """
+    return version_key("equipment-type", equipment_type_id or "none")
+
+
+def equipment_type_link_key(equipment_id):
+    return f"equipment:type-of:{equipment_id}"
+
+
+def remember_equipment_type(equipment_id, equipment_type_id):
+    """Запоминает тип оборудования для ключей версий без обращения к БД."""
+    cache.set(equipment_type_link_key(equipment_id), equipment_type_id or 0, None)
+
+
+def equipment_version_keys(equipment_id):
+    """
+    Ключи версий данных оборудования вместе с данными его типа.
+
+    Тип берётся из кэша (remember_equipment_type), без обращения к БД.
+
+    Returns:
+        Список ключей или None, если тип оборудования ещё не запомнен.
+    """
+    equipment_type_id = cache.get(equipment_type_link_key(equipment_id))
+    if equipment_type_id is None:
+        return None
+    return [equipment_key(equipment_id), equipment_type_key(equipment_type_id)]
+
+
+def invalidate_equipment_versions(equipment_ids):
+    """
+    Сбрасывает версии справочника и указанного оборудования.
+
+    Календари оборудования тоже сбрасываются: периодичности и дата ввода
+    в эксплуатацию задают работы проекции графика. Запомненные типы
+    оборудования забываются: тип мог измениться.
+    """
+    equipment_ids = list(equipment_ids)
+    keys = [catalog_key()]
+    keys.extend(equipment_key(equipment_id) for equipment_id in equipment_ids)
+    bump_versions(keys)
+    cache.delete_many(
+        [equipment_type_link_key(equipment_id) for equipment_id in equipment_ids]
+    )
+    invalidate_equipment_calendars(equipment_ids)
+
+
+def invalidate_type_versions(equipment_type_ids):
+    """
+    Сбрасывает версии справочника и указанных типов оборудования.
+
+    Календарь парка тоже сбрасывается: он показывает только оборудование
+    отображаемых типов.
+    """
+    keys = [catalog_key(), calendar_owner_key(None), schedule_key(None)]
+    keys.extend(
+        equipment_type_key(equipment_type_id)
+        for equipment_type_id in equipment_type_ids
+    )
+    bump_versions(keys)
+
+
+def fragment_card_keys(equipment_id, equipment_type_id):
+    # Карточка показывает данные оборудования, типа и сводку по графику.
+    return [
+        equipment_key(equipment_id),
+        equipment_type_key(equipment_type_id),
+        schedule_key(equipment_id),
+    ]
+
+
+def fragment_calendar_keys(equipment_id, year, month):
+    return [
+        calendar_owner_key(equipment_id),
+        calendar_month_key(equipment_id, year, month),
+    ]
+
+
+# Ключи версий фрагментов шаблонов по имени фрагмента; аргументы -
+# значения, переданные тегу fragment_cache после имени.
+FRAGMENT_VERSION_KEYS = {
+    "equipment_card": fragment_card_keys,
+    "equipment_calendar": fragment_calendar_keys,
+    "range_calendar_month": fragment_calendar_keys,
+}
+
+
+def fragment_stats_key(name, outcome):
+    return f"equipment:fragment-stats:{name}:{outcome}"
+
+
+def count_fragment_access(name, hit):
+    key = fragment_stats_key(name, "hits" if hit else "misses")
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key)
+
+
+def get_fragment(name, args, render):
+    """
+    Возвращает HTML фрагмента шаблона из кэша или рендерит его.
+
+    Ключ фрагмента включает текущие версии FRAGMENT_VERSION_KEYS[name],
+    поэтому запись в модели, от которых зависит фрагмент, делает
+    прежний HTML недоступным без явного удаления. Версии и фрагменты
+    хранятся в общем кэше (settings.CACHES), поэтому изменения из других
+    веб-процессов и management-команд видны сразу. Текущая дата входит
+    в ключ: от неё зависят статусы с учётом просрочки и отметка дня.
+
+    Args:
+        name: Имя фрагмента.
+        args: Аргументы функции ключей версий фрагмента.
+        render: Функция без аргументов, возвращающая HTML при промахе.
+    """
+    versions = get_versions(*FRAGMENT_VERSION_KEYS[name](*args))
+    key = "equipment:fragment:{}:{}:{}:{}".format(
+        name,
+        ":".join(str(arg) for arg in args),
+        timezone.now().date().isoformat(),
+        ":".join(str(version) for version in versions),
+    )
+    html = cache.get(key)
+    count_fragment_access(name, hit=html is not None)
+    if html is None:
+        html = render()
+        cache.set(key, html, FRAGMENT_CACHE_TIMEOUT)
+    return html
+
+
+def get_fragment_stats():
+    """Счётчики попаданий и промахов кэша фрагментов по имени фрагмента."""
+    keys = {
+        (name, outcome): fragment_stats_key(name, outcome)
+        for name in FRAGMENT_VERSION_KEYS
+        for outcome in ("hits", "misses")
+    }
+    counters = cache.get_many(keys.values())
+    stats = {}
+    for (name, outcome), key in keys.items():
+        stats.setdefault(name, {})[outcome] = counters.get(key, 0)
+    return stats
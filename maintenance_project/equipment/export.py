@@ -0,0 +1,214 @@
+import csv
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+from .models import MaintenanceSchedule
+
+
+# Количество строк, которое курсор БД отдаёт за одно обращение.
+EXPORT_CHUNK_SIZE = 2000
+
+# Через сколько строк листа XLSX отдавать накопленные байты клиенту.
+XLSX_FLUSH_ROWS = 500
+
+CSV_DELIMITER = ";"
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": (
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    ),
+}
+
+EXPORT_COLUMNS = (
+    ("planned_date", "Плановая дата"),
+    ("actual_date", "Фактическая дата"),
+    ("maintenance_type", "Вид работ"),
+    ("current_status", "Статус"),
+    ("equipment__name", "Оборудование"),
+    ("equipment__inventory_number", "Инвентарный номер"),
+    ("equipment__serial_number", "Серийный номер"),
+    ("equipment__equipment_type__name", "Тип оборудования"),
+    ("notes", "Заметки"),
+)
+
+# Символы, недопустимые в XML 1.0.
+INVALID_XML_CHARS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def get_export_queryset(
+    date_from=None,
+    date_to=None,
+    maintenance_type=None,
+    status=None,
+    equipment_type_slug=None,
+):
+    """
+    Возвращает записи графика для выгрузки с учётом фильтров.
+
+    Статус фильтруется и выгружается с учётом просрочки на текущую дату.
+    """
+    queryset = MaintenanceSchedule.objects.all()
+    if date_from:
+        queryset = queryset.filter(planned_date__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(planned_date__lte=date_to)
+    if maintenance_type:
+        queryset = queryset.filter(maintenance_type=maintenance_type)
+    if status:
+        queryset = queryset.filter_effective_status(status)
+    if equipment_type_slug:
+        queryset = queryset.filter(
+            equipment__equipment_type__slug=equipment_type_slug
+        )
+    return queryset.annotate_effective_status().order_by(
+        "planned_date", "equipment_id", "id"
+    )
+
+
+def iter_export_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Генерирует строки выгрузки без загрузки всего результата в память.
+
+    Используется серверный итератор с чтением по chunk_size строк.
+    """
+    type_labels = dict(MaintenanceSchedule.MAINTENANCE_TYPE_CHOICES)
+    rows = queryset.values_list(*(field for field, _ in EXPORT_COLUMNS))
+    for row in rows.iterator(chunk_size=chunk_size):
+        row = list(row)
+        row[2] = type_labels.get(row[2], row[2])
+        yield [
+            "" if value is None else
+            value.isoformat() if hasattr(value, "isoformat") else
+            str(value)
+            for value in row
+        ]
+
+
+class _Echo:
+    """Псевдобуфер: csv.writer пишет в него, а строка сразу возвращается."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows):
+    """Генерирует CSV построчно (UTF-8 с BOM для корректного открытия в Excel)."""
+    writer = csv.writer(_Echo(), delimiter=CSV_DELIMITER)
+    yield "﻿" + writer.writerow([title for _, title in EXPORT_COLUMNS])
+    for row in rows:
+        yield writer.writerow(row)
+
+
+class _ChunkBuffer:
+    """Несмещаемый поток для zipfile, из которого забираются готовые байты."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+XLSX_STATIC_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/'
+        'content-types">'
+        '<Default Extension="rels" ContentType="application/'
+        'vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/'
+        'vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/'
+        'vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        "</Types>"
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/'
+        '2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/'
+        'officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        "</Relationships>"
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/'
+        'spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/'
+        'relationships">'
+        '<sheets><sheet name="График" sheetId="1" r:id="rId1"/></sheets>'
+        "</workbook>"
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/'
+        '2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/'
+        'officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        "</Relationships>"
+    ),
+}
+
+
+def _xlsx_row(values):
+    cells = "".join(
+        '<c t="inlineStr"><is><t xml:space="preserve">'
+        f"{escape(INVALID_XML_CHARS.sub('', value))}</t></is></c>"
+        for value in values
+    )
+    return f"<row>{cells}</row>"
+
+
+def iter_xlsx(rows):
+    """
+    Генерирует XLSX-файл по частям.
+
+    Лист пишется в zip-архив потоком, поэтому память не зависит
+    от количества строк.
+    """
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_STATIC_PARTS.items():
+            archive.writestr(name, content)
+        yield buffer.pop()
+
+        with archive.open(
+            "xl/worksheets/sheet1.xml", "w", force_zip64=True
+        ) as sheet:
+            sheet.write(
+                (
+                    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                    '<worksheet xmlns="http://schemas.openxmlformats.org/'
+                    'spreadsheetml/2006/main"><sheetData>'
+                    + _xlsx_row([title for _, title in EXPORT_COLUMNS])
+                ).encode()
+            )
+            for index, row in enumerate(rows, start=1):
+                sheet.write(_xlsx_row(row).encode())
+                if index % XLSX_FLUSH_ROWS == 0:
+                    yield buffer.pop()
+            sheet.write(b"</sheetData></worksheet>")
+    yield buffer.pop()
+
+
+def iter_export(queryset, export_format):
+    """Генерирует содержимое выгрузки в формате csv или xlsx."""
+    rows = iter_export_rows(queryset)
+    if export_format == "xlsx":
+        return iter_xlsx(rows)
+    return iter_csv(rows)
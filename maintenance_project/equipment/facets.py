@@ -0,0 +1,252 @@
+import hashlib
+from collections import Counter
+from datetime import MAXYEAR, MINYEAR
+
+from django.core.cache import cache
+from django.db.models import Case, CharField, Count, F, Q, Value, When
+from django.db.models.functions import Cast, Substr
+
+from .caching import catalog_key, get_versions, schedule_key
+
+
+# Время жизни закэшированных счётчиков фасетов (в секундах); данные
+# сбрасываются раньше при смене версий справочника и графика.
+FACET_CACHE_TIMEOUT = 60 * 60
+
+# Сколько значений фасета показывать (самые частые и выбранные).
+FACET_OPTION_LIMIT = 12
+
+OVERDUE_LABELS = {"1": "Есть просроченные работы", "0": "Нет просроченных работ"}
+
+# Фасеты списков оборудования: заголовок и выражение значения. Значения
+# приводятся к строкам, как и выбранные значения из GET-параметров.
+FACETS = {
+    "type": {
+        "title": "Тип оборудования",
+        "value": F("equipment_type__slug"),
+        "label": F("equipment_type__name"),
+        "lookup": "equipment_type__slug__in",
+    },
+    "manufacturer": {
+        "title": "Производитель",
+        "value": F("manufacturer"),
+        "lookup": "manufacturer__in",
+    },
+    "year": {
+        "title": "Год ввода в эксплуатацию",
+        # Год - первые символы даты в ISO-формате: без вызова функции
+        # извлечения года на каждую строку.
+        "value": Substr(Cast("installation_date", CharField()), 1, 4),
+        "lookup": "installation_date__year__in",
+    },
+    "overdue": {
+        "title": "Просроченные работы",
+        "value": Case(
+            When(summary__overdue_count__gt=0, then=Value("1")),
+            default=Value("0"),
+            output_field=CharField(),
+        ),
+    },
+}
+
+
+def is_year(value):
+    """Проверяет, что строка - допустимый год даты (MINYEAR..MAXYEAR)."""
+    return (
+        value.isascii()
+        and value.isdigit()
+        and MINYEAR <= int(value) <= MAXYEAR
+    )
+
+
+def parse_facet_selection(params, facets=tuple(FACETS)):
+    """
+    Возвращает выбранные значения фасетов из GET-параметров.
+
+    Параметр повторяется для нескольких значений (?year=2020&year=2021);
+    значения одного фасета объединяются через ИЛИ, разных фасетов - через И.
+    Неизвестные значения просрочки и годы вне MINYEAR..MAXYEAR
+    отбрасываются.
+    """
+    selection = {}
+    for name in facets:
+        values = {value for value in params.getlist(name) if value}
+        if name == "year":
+            values = {value for value in values if is_year(value)}
+        elif name == "overdue":
+            values &= set(OVERDUE_LABELS)
+        if values:
+            selection[name] = values
+    return selection
+
+
+def apply_facets(queryset, selection):
+    """Оставляет в queryset оборудования записи выбранных значений фасетов."""
+    for name, values in selection.items():
+        if name == "overdue":
+            if values == {"1"}:
+                queryset = queryset.filter(summary__overdue_count__gt=0)
+            elif values == {"0"}:
+                queryset = queryset.filter(
+                    Q(summary__isnull=True) | Q(summary__overdue_count=0)
+                )
+            continue
+        lookup_values = values
+        if name == "year":
+            lookup_values = [int(value) for value in values]
+        queryset = queryset.filter(**{FACETS[name]["lookup"]: lookup_values})
+    return queryset
+
+
+def get_facet_rows(queryset, facets):
+    """
+    Считает оборудование по сочетаниям значений всех фасетов одним запросом.
+
+    Returns:
+        Список пар ({фасет: значение}, количество) и подписи значений
+        {фасет: {значение: подпись}}.
+    """
+    annotations = {f"facet_{name}": FACETS[name]["value"] for name in facets}
+    if "type" in facets:
+        annotations["facet_type_label"] = FACETS["type"]["label"]
+    rows = (
+        queryset.order_by()
+        .values(**annotations)
+        .annotate(facet_count=Count("pk"))
+        .values_list(*annotations, "facet_count")
+    )
+    combinations = []
+    labels = {name: {} for name in facets}
+    for row in rows:
+        values = dict(zip(annotations, row))
+        combination = {name: values[f"facet_{name}"] for name in facets}
+        if "type" in facets:
+            labels["type"][combination["type"]] = values["facet_type_label"]
+        combinations.append((combination, row[-1]))
+    return combinations, labels
+
+
+def count_facets(combinations, selection, facets):
+    """
+    Считает значения фасетов с учётом выбора (disjunctive faceting).
+
+    Количество у значения фасета - число записей, подходящих под выбор
+    во всех остальных фасетах: так видно, сколько записей добавит ещё одно
+    значение того же фасета.
+
+    Returns:
+        Пару (число записей под полным выбором, {фасет: Counter}).
+    """
+    counts = {name: Counter() for name in facets}
+    total = 0
+    for combination, count in combinations:
+        failed = [
+            name
+            for name, values in selection.items()
+            if combination[name] not in values
+        ]
+        if not failed:
+            total += count
+            for name in facets:
+                counts[name][combination[name]] += count
+        elif len(failed) == 1:
+            counts[failed[0]][combination[failed[0]]] += count
+    return total, counts
+
+
+def get_facet_counts(queryset, selection, facets=tuple(FACETS)):
+    """
+    Возвращает счётчики фасетов для базового queryset и выбора.
+
+    Результат кэшируется по SQL базового запроса (в нём фильтры списка,
+    строка поиска и текущая дата), выбору и версиям справочника и графика
+    парка, поэтому изменения оборудования и просрочек сбрасывают кэш.
+
+    Args:
+        queryset: Оборудование списка без фильтров фасетов.
+        selection: Выбор из parse_facet_selection.
+        facets: Имена фасетов списка.
+
+    Returns:
+        Словарь с total, counts {фасет: {значение: количество}} и labels.
+    """
+    sql, params = queryset.query.sql_with_params()
+    payload = repr(
+        (
+            sql,
+            params,
+            tuple(facets),
+            sorted((name, sorted(values)) for name, values in selection.items()),
+            get_versions(catalog_key(), schedule_key(None)),
+        )
+    )
+    key = "equipment:facets:" + hashlib.md5(payload.encode()).hexdigest()
+    result = cache.get(key)
+    if result is None:
+        combinations, labels = get_facet_rows(queryset, facets)
+        total, counts = count_facets(combinations, selection, facets)
+        result = {
+            "total": total,
+            "counts": {name: dict(counter) for name, counter in counts.items()},
+            "labels": labels,
+        }
+        cache.set(key, result, FACET_CACHE_TIMEOUT)
+    return result
+
+
+def get_option_label(name, value, labels):
+    if name == "overdue":
+        return OVERDUE_LABELS[value]
+    return labels.get(name, {}).get(value, value)
+
+
+def build_facet_blocks(result, selection, params, facets=tuple(FACETS)):
+    """
+    Готовит блоки фасетов для шаблона.
+
+    Args:
+        result: Результат get_facet_counts.
+        selection: Выбор из parse_facet_selection.
+        params: GET-параметры запроса (для ссылок выбора значений).
+        facets: Имена фасетов списка.
+
+    Returns:
+        Список блоков {name, title, options}; у значения есть label, count,
+        selected и query - строка запроса, переключающая это значение.
+    """
+    blocks = []
+    for name in facets:
+        counts = result["counts"][name]
+        selected = selection.get(name, set())
+        values = sorted(counts, key=lambda value: (-counts[value], value))
+        values = values[:FACET_OPTION_LIMIT] + [
+            value for value in values[FACET_OPTION_LIMIT:] if value in selected
+        ]
+        values += [value for value in sorted(selected) if value not in counts]
+        if name in ("year", "overdue"):
+            values.sort(reverse=True)
+        elif name == "type":
+            values.sort(
+                key=lambda value: get_option_label(name, value, result["labels"])
+            )
+
+        options = []
+        for value in values:
+            query = params.copy()
+            query.pop("cursor", None)
+            chosen = set(selected) ^ {value}
+            query.setlist(name, sorted(chosen))
+            options.append(
+                {
+                    "value": value,
+                    "label": get_option_label(name, value, result["labels"]),
+                    "count": counts.get(value, 0),
+                    "selected": value in selected,
+                    "query": query.urlencode(),
+                }
+            )
+        if options:
+            blocks.append(
+                {"name": name, "title": FACETS[name]["title"], "options": options}
+            )
+    return blocks
@@ -0,0 +1,278 @@
+from datetime import timedelta
+
+import numpy as np
+from django.core.cache import cache
+from django.db.models import Count
+from django.utils import timezone
+
+from .caching import catalog_key, get_versions
+from .models import EquipmentMaintenance, EquipmentType
+from .scheduling import (
+    dominant_work_type_enabled,
+    get_periodicities,
+    get_recurrences,
+)
+
+
+# Горизонт прогноза по умолчанию и максимальный (в неделях).
+FORECAST_WEEKS = 156
+FORECAST_MAX_WEEKS = 520
+
+# Время жизни закэшированного прогноза (в секундах); прогноз сбрасывается
+# раньше при смене версии справочника оборудования.
+FORECAST_CACHE_TIMEOUT = 24 * 60 * 60
+
+MAINTENANCE_TYPES = ("to", "tr", "kr")
+
+FORECAST_FIELDS = (
+    "equipment__equipment_type_id",
+    "equipment__installation_date",
+    "to_periodicity",
+    "tr_periodicity",
+    "kr_periodicity",
+)
+
+
+def get_forecast_start(today=None):
+    """Первый день прогноза - понедельник текущей недели."""
+    if today is None:
+        today = timezone.now().date()
+    return today - timedelta(days=today.weekday())
+
+
+def count_daily(starts, units, step, days):
+    """
+    Считает, сколько работ серий дат приходится на каждый день окна.
+
+    Серия i - даты starts[i] + k * step (k >= 0) в днях от начала окна,
+    по units[i] работ на дату. Для серий, начавшихся до окна, число работ
+    в день d - сумма серий с остатком d по модулю step; для начинающихся
+    внутри окна начала накапливаются по дням с тем же остатком. Стоимость
+    пропорциональна числу серий плюс длине окна, а не числу работ.
+
+    Args:
+        starts: Массив начал серий (int64, дни от начала окна).
+        units: Массив количеств оборудования серий.
+        step: Шаг серий в днях.
+        days: Длина окна в днях.
+
+    Returns:
+        Массив количеств работ по дням окна.
+    """
+    counts = np.zeros(days, dtype=np.int64)
+    if step >= days:
+        # Серия попадает в окно не больше одного раза; массивы длиной
+        # в шаг (годы и тысячелетия) не нужны.
+        days_in_window = np.where(starts < 0, starts % step, starts)
+        inside = days_in_window < days
+        counts += np.bincount(
+            days_in_window[inside], weights=units[inside], minlength=days
+        ).astype(np.int64)
+        return counts
+
+    past = starts < 0
+    if past.any():
+        residues = np.bincount(
+            starts[past] % step, weights=units[past], minlength=step
+        ).astype(np.int64)
+        counts += residues[np.arange(days) % step]
+    future = ~past & (starts < days)
+    if future.any():
+        padded = -(-days // step) * step
+        first = np.bincount(
+            starts[future], weights=units[future], minlength=padded
+        ).astype(np.int64)
+        counts += first.reshape(-1, step).cumsum(axis=0).ravel()[:days]
+    return counts
+
+
+def compute_forecast(rows, start_date, weeks, dominant=None):
+    """
+    Считает число работ каждого вида по неделям и типам оборудования.
+
+    Даты работ не строятся: оборудование группируется по типу и набору
+    периодичностей, серии дат группы (см. get_recurrences) сводятся
+    к началам относительно start_date, и количества по дням вычисляются
+    в замкнутом виде (count_daily) сразу для всех серий с одинаковым
+    типом оборудования, видом работ и шагом. Прогноз не учитывает
+    перенесённые и выполненные записи графика.
+
+    Args:
+        rows: Строки get_forecast_rows: FORECAST_FIELDS и количество
+              оборудования с такими значениями.
+        start_date: Начало прогноза (понедельник).
+        weeks: Число недель.
+        dominant: Режим доминирующего вида работ (см. get_recurrences).
+
+    Returns:
+        Пару (идентификаторы типов оборудования, массив формы
+        (типы, виды работ MAINTENANCE_TYPES, недели)).
+    """
+    days = weeks * 7
+    if not rows:
+        return [], np.zeros((0, len(MAINTENANCE_TYPES), weeks), dtype=np.int64)
+
+    type_ids, installation_dates, to, tr, kr, units = zip(*rows)
+    unique_types, type_index = np.unique(
+        [-1 if type_id is None else type_id for type_id in type_ids],
+        return_inverse=True,
+    )
+    starts = np.fromiter(
+        (installation_date.toordinal() for installation_date in installation_dates),
+        dtype=np.int64,
+        count=len(rows),
+    ) - start_date.toordinal()
+    units = np.array(units, dtype=np.int64)
+
+    # Группа - уникальная строка (тип, ТО, ТР, КР). Строки сравниваются
+    # целиком, а не упаковываются в одно число: произведение диапазонов
+    # неограниченных периодичностей может не поместиться в int64.
+    columns = [type_index.ravel()] + [
+        np.array([value or 0 for value in column], dtype=np.int64)
+        for column in (to, tr, kr)
+    ]
+    groups, group_index = np.unique(
+        np.stack(columns, axis=1), axis=0, return_inverse=True
+    )
+    order = np.argsort(group_index.ravel(), kind="stable")
+    bounds = np.searchsorted(group_index.ravel()[order], np.arange(len(groups) + 1))
+
+    series = {}
+    for group, (type_position, *periodicities) in enumerate(groups.tolist()):
+        members = order[bounds[group]:bounds[group + 1]]
+        for maintenance_type, offset, step in get_recurrences(
+            get_periodicities(*periodicities), dominant
+        ):
+            series_key = (
+                type_position,
+                MAINTENANCE_TYPES.index(maintenance_type),
+                step,
+            )
+            series.setdefault(series_key, []).append(
+                (starts[members] + offset, units[members])
+            )
+
+    counts = np.zeros((len(unique_types), len(MAINTENANCE_TYPES), weeks), np.int64)
+    for (type_position, maintenance_index, step), parts in series.items():
+        daily = count_daily(
+            np.concatenate([part[0] for part in parts]),
+            np.concatenate([part[1] for part in parts]),
+            step,
+            days,
+        )
+        counts[type_position, maintenance_index] += daily.reshape(weeks, 7).sum(
+            axis=1
+        )
+    return unique_types.tolist(), counts
+
+
+def get_forecast_rows():
+    """Оборудование с периодичностями, сгруппированное по FORECAST_FIELDS."""
+    return (
+        EquipmentMaintenance.objects.order_by()
+        .values(*FORECAST_FIELDS)
+        .annotate(units=Count("pk"))
+        .values_list(*FORECAST_FIELDS, "units")
+    )
+
+
+def get_forecast_types(type_ids):
+    return EquipmentType.objects.filter(pk__in=type_ids).values_list(
+        "pk", "name", "slug"
+    )
+
+
+def forecast_key(start_date, weeks, dominant):
+    return "equipment:forecast:{}:{}:{}:{}".format(
+        start_date.isoformat(), weeks, int(dominant), *get_versions(catalog_key())
+    )
+
+
+def build_forecast(start_date, weeks, dominant, type_ids, counts, types):
+    """
+    Собирает прогноз в словарь для API и шаблона.
+
+    Тип оборудования None - оборудование без типа.
+    """
+    names = {pk: (name, slug) for pk, name, slug in types}
+    result_types = []
+    for type_id, type_counts in zip(type_ids, counts.tolist()):
+        type_id = None if type_id == -1 else type_id
+        name, slug = names.get(type_id, ("Без типа", None))
+        result_types.append(
+            {
+                "id": type_id,
+                "name": name,
+                "slug": slug,
+                "counts": dict(zip(MAINTENANCE_TYPES, type_counts)),
+            }
+        )
+    result_types.sort(key=lambda item: item["name"])
+    return {
+        "start": start_date,
+        "weeks": weeks,
+        "dominant": dominant,
+        "week_starts": [
+            start_date + timedelta(weeks=week) for week in range(weeks)
+        ],
+        "types": result_types,
+        "totals": dict(zip(MAINTENANCE_TYPES, counts.sum(axis=0).tolist())),
+    }
+
+
+def get_forecast(weeks=FORECAST_WEEKS, today=None, dominant=None):
+    """
+    Возвращает прогноз числа работ по неделям, закэшированный по горизонту.
+
+    Ключ кэша включает начало прогноза, число недель, режим доминирующего
+    вида работ и версию справочника оборудования, которая меняется при
+    изменении оборудования, типов и периодичностей.
+
+    Args:
+        weeks: Горизонт прогноза в неделях.
+        today: Текущая дата (по умолчанию сегодня).
+        dominant: Режим доминирующего вида работ; по умолчанию берётся
+                  из настройки MAINTENANCE_DOMINANT_WORK_TYPE.
+
+    Returns:
+        Словарь build_forecast.
+    """
+    if dominant is None:
+        dominant = dominant_work_type_enabled()
+    start_date = get_forecast_start(today)
+    key = forecast_key(start_date, weeks, dominant)
+    forecast = cache.get(key)
+    if forecast is None:
+        type_ids, counts = compute_forecast(
+            list(get_forecast_rows()), start_date, weeks, dominant
+        )
+        forecast = build_forecast(
+            start_date,
+            weeks,
+            dominant,
+            type_ids,
+            counts,
+            get_forecast_types(type_ids) if type_ids else (),
+        )
+        cache.set(key, forecast, FORECAST_CACHE_TIMEOUT)
+    return forecast
+
+
+async def aget_forecast(weeks=FORECAST_WEEKS, today=None, dominant=None):
+    """Асинхронный вариант get_forecast для async-представлений."""
+    if dominant is None:
+        dominant = dominant_work_type_enabled()
+    start_date = get_forecast_start(today)
+    key = forecast_key(start_date, weeks, dominant)
+    forecast = await cache.aget(key)
+    if forecast is None:
+        rows = [row async for row in get_forecast_rows()]
+        type_ids, counts = compute_forecast(rows, start_date, weeks, dominant)
+        types = (
+            [row async for row in get_forecast_types(type_ids)] if type_ids else ()
+        )
+        forecast = build_forecast(
+            start_date, weeks, dominant, type_ids, counts, types
+        )
+        await cache.aset(key, forecast, FORECAST_CACHE_TIMEOUT)
+    return forecast
@@ -2,6 +2,7 @@ from django import forms
 from django.utils import timezone
 from django.contrib.auth.models import User
 
+from .forecast import FORECAST_MAX_WEEKS, FORECAST_WEEKS
 from .models import MaintenanceSchedule
 
 
@@ -34,3 +35,98 @@ class MaintenanceScheduleEditForm(forms.ModelForm):
         widgets = {
             "actual_date": forms.DateInput(attrs={"type": "date"}),
         }
+
+
+class ScheduleExportForm(forms.Form):
+    FORMAT_CHOICES = (
+        ("csv", "CSV"),
+        ("xlsx", "XLSX"),
+    )
+
+    date_from = forms.DateField(label="С даты", required=False)
+    date_to = forms.DateField(label="По дату", required=False)
+    maintenance_type = forms.ChoiceField(
+        label="Вид работ",
+        choices=(("", "Все"),) + MaintenanceSchedule.MAINTENANCE_TYPE_CHOICES,
+        required=False,
+    )
+    status = forms.ChoiceField(
+        label="Статус",
+        choices=(("", "Все"),) + MaintenanceSchedule.STATUS_CHOICES,
+        required=False,
+    )
+    equipment_type = forms.SlugField(label="Тип оборудования", required=False)
+    format = forms.ChoiceField(
+        label="Формат", choices=FORMAT_CHOICES, required=False
+    )
+
+    def clean_format(self):
+        return self.cleaned_data["format"] or "csv"
+
+    def clean(self):
+        cleaned_data = super().clean()
+        date_from = cleaned_data.get("date_from")
+        date_to = cleaned_data.get("date_to")
+        if date_from and date_to and date_from > date_to:
+            raise forms.ValidationError(
+                "Дата начала не может быть позже даты окончания."
+            )
+        return cleaned_data
+
+
+class ForecastForm(forms.Form):
+    weeks = forms.IntegerField(
+        label="Горизонт (недель)",
+        min_value=1,
+        max_value=FORECAST_MAX_WEEKS,
+        required=False,
+    )
+
+    def clean_weeks(self):
+        return self.cleaned_data["weeks"] or FORECAST_WEEKS
+
+
+class EquipmentImportForm(forms.Form):
+    file = forms.FileField(
+        label="CSV-файл",
+        help_text=(
+            "Колонки: inventory_number, name, equipment_type (slug), model, "
+            "manufacturer, serial_number, installation_date (ГГГГ-ММ-ДД), "
+            "to_periodicity, tr_periodicity, kr_periodicity."
+        ),
+    )
+    schedule_until = forms.DateField(
+        label="Дополнить график до",
+        required=False,
+        widget=forms.DateInput(attrs={"type": "date"}),
+        input_formats=["%Y-%m-%d"],
+    )
+
+
+class IntegerListField(forms.Field):
+    """Список целых чисел из нескольких значений (?ids=1&ids=2 или JSON)."""
+
+    widget = forms.MultipleHiddenInput
+
+    def to_python(self, value):
+        if not value:
+            return []
+        if not isinstance(value, (list, tuple)):
+            raise forms.ValidationError("Ожидается список идентификаторов.")
+        try:
+            return [int(item) for item in value]
+        except (TypeError, ValueError):
+            raise forms.ValidationError("Идентификаторы должны быть целыми числами.")
+
+
+class ScheduleTransitionForm(forms.Form):
+    ids = IntegerListField(label="Записи графика")
+    status = forms.ChoiceField(
+        label="Статус", choices=MaintenanceSchedule.STATUS_CHOICES
+    )
+    actual_date = forms.DateField(
+        label="Фактическая дата",
+        required=False,
+        widget=forms.DateInput(attrs={"type": "date"}),
+        input_formats=["%Y-%m-%d"],
+    )
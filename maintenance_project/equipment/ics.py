@@ -0,0 +1,229 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from itertools import groupby
+
+from .models import Equipment, MaintenanceSchedule
+from .scheduling import get_periodicities, get_recurrences
+from .utils import filter_equipment
+
+
+ICS_CONTENT_TYPE = "text/calendar; charset=utf-8"
+
+# Количество записей графика, которое курсор БД отдаёт за одно обращение.
+ICS_CHUNK_SIZE = 2000
+
+# Максимальная длина строки iCalendar в байтах (RFC 5545, 3.1).
+ICS_LINE_OCTETS = 75
+
+PRODID = "-//maintenance_project//Maintenance schedule//RU"
+UID_DOMAIN = "maintenance-project"
+
+MAINTENANCE_TYPE_LABELS = dict(MaintenanceSchedule.MAINTENANCE_TYPE_CHOICES)
+
+FEED_EQUIPMENT_FIELDS = (
+    "id",
+    "name",
+    "inventory_number",
+    "installation_date",
+    "maintenance__to_periodicity",
+    "maintenance__tr_periodicity",
+    "maintenance__kr_periodicity",
+)
+FEED_SCHEDULE_FIELDS = (
+    "id",
+    "equipment_id",
+    "maintenance_type",
+    "planned_date",
+    "actual_date",
+    "current_status",
+    "notes",
+)
+
+
+def escape_text(value):
+    """Экранирует значение текстового свойства iCalendar."""
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def fold_line(line):
+    """
+    Переносит строку длиннее ICS_LINE_OCTETS байт (RFC 5545, 3.1).
+
+    Перенос не разрывает многобайтовые символы UTF-8.
+    """
+    parts = []
+    size = 0
+    limit = ICS_LINE_OCTETS
+    start = 0
+    for index, char in enumerate(line):
+        char_size = len(char.encode())
+        if size + char_size > limit:
+            parts.append(line[start:index])
+            start, size = index, 0
+            # Строка продолжения начинается с пробела.
+            limit = ICS_LINE_OCTETS - 1
+        size += char_size
+    parts.append(line[start:])
+    return "\r\n ".join(parts)
+
+
+def format_date(value):
+    return value.strftime("%Y%m%d")
+
+
+def render_event(properties):
+    lines = ["BEGIN:VEVENT"]
+    lines.extend(fold_line(f"{name}:{value}") for name, value in properties)
+    lines.append("END:VEVENT")
+    return "\r\n".join(lines) + "\r\n"
+
+
+def get_feed_equipment(equipment_id=None, type_slug=None):
+    """
+    Возвращает отображаемое оборудование для ленты с периодичностями.
+
+    Args:
+        equipment_id: Одна единица оборудования.
+        type_slug: Всё оборудование типа.
+    """
+    equipments = filter_equipment(Equipment.objects.all())
+    if equipment_id is not None:
+        equipments = equipments.filter(pk=equipment_id)
+    if type_slug is not None:
+        equipments = equipments.filter(equipment_type__slug=type_slug)
+    return equipments.order_by("id")
+
+
+def get_feed_schedule(equipments):
+    """Записи графика оборудования ленты в порядке оборудования и дат."""
+    return (
+        MaintenanceSchedule.objects.filter(equipment__in=equipments.values("pk"))
+        .annotate_effective_status()
+        .order_by("equipment_id", "planned_date", "id")
+    )
+
+
+def iter_equipment_events(equipment, items, stamp):
+    """
+    Генерирует события одной единицы оборудования.
+
+    Каждая сохранённая запись графика становится отдельным событием. Для
+    каждой серии дат вида работ (см. get_recurrences) добавляется
+    повторяющееся событие (RRULE) от даты ввода в эксплуатацию; даты
+    сохранённых записей исключаются из него через EXDATE, поэтому будущие
+    работы описываются без материализации записей.
+    """
+    equipment_id, name, inventory_number, installation_date, *periodicities = (
+        equipment
+    )
+    title = escape_text(f"{name} ({inventory_number})")
+
+    stored_dates = {}
+    for pk, _, maintenance_type, planned_date, actual_date, status, notes in items:
+        stored_dates.setdefault(maintenance_type, []).append(planned_date)
+        description = f"Статус: {status}."
+        if actual_date:
+            description += f" Фактическая дата: {actual_date:%d.%m.%Y}."
+        if notes:
+            description += f"\n{notes}"
+        yield render_event(
+            (
+                ("UID", f"schedule-{pk}@{UID_DOMAIN}"),
+                ("DTSTAMP", stamp),
+                ("DTSTART;VALUE=DATE", format_date(planned_date)),
+                (
+                    "SUMMARY",
+                    f"{MAINTENANCE_TYPE_LABELS[maintenance_type]}: {title}",
+                ),
+                ("DESCRIPTION", escape_text(description)),
+            )
+        )
+
+    periodicities = dict(get_periodicities(*periodicities))
+    for maintenance_type, offset, interval in get_recurrences(
+        tuple(periodicities.items())
+    ):
+        uid = f"plan-{equipment_id}-{maintenance_type}"
+        if offset:
+            uid += f"-{offset}"
+        properties = [
+            ("UID", f"{uid}@{UID_DOMAIN}"),
+            ("DTSTAMP", stamp),
+            (
+                "DTSTART;VALUE=DATE",
+                format_date(installation_date + timedelta(days=offset)),
+            ),
+            ("RRULE", f"FREQ=DAILY;INTERVAL={interval}"),
+        ]
+        excluded = []
+        for planned_date in stored_dates.get(maintenance_type, ()):
+            days = (planned_date - installation_date).days - offset
+            if days >= 0 and days % interval == 0:
+                excluded.append(format_date(planned_date))
+        if excluded:
+            properties.append(("EXDATE;VALUE=DATE", ",".join(excluded)))
+        description = (
+            f"Плановая работа, периодичность {periodicities[maintenance_type]} дн."
+        )
+        properties.extend(
+            (
+                (
+                    "SUMMARY",
+                    f"{MAINTENANCE_TYPE_LABELS[maintenance_type]}: {title}",
+                ),
+                ("DESCRIPTION", escape_text(description)),
+            )
+        )
+        yield render_event(properties)
+
+
+def iter_ics(equipments, calendar_name):
+    """
+    Потоково формирует календарь iCalendar для набора оборудования.
+
+    Выполняются два запроса: оборудование с периодичностями и его записи
+    графика, которые читаются курсором. Размер ленты пропорционален
+    числу сохранённых записей плюс три правила на единицу оборудования
+    и не зависит от того, насколько далеко в будущее смотрит клиент.
+
+    Args:
+        equipments: Queryset оборудования (см. get_feed_equipment).
+        calendar_name: Название календаря.
+
+    Yields:
+        Фрагменты текста календаря.
+    """
+    stamp = datetime.now(dt_timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    yield "\r\n".join(
+        (
+            "BEGIN:VCALENDAR",
+            "VERSION:2.0",
+            f"PRODID:{PRODID}",
+            "CALSCALE:GREGORIAN",
+            "METHOD:PUBLISH",
+            fold_line(f"X-WR-CALNAME:{escape_text(calendar_name)}"),
+        )
+    ) + "\r\n"
+
+    schedule = (
+        get_feed_schedule(equipments)
+        .values_list(*FEED_SCHEDULE_FIELDS)
+        .iterator(chunk_size=ICS_CHUNK_SIZE)
+    )
+    groups = groupby(schedule, key=lambda item: item[1])
+    group = next(groups, None)
+    for equipment in equipments.values_list(*FEED_EQUIPMENT_FIELDS):
+        while group is not None and group[0] < equipment[0]:
+            group = next(groups, None)
+        items = ()
+        if group is not None and group[0] == equipment[0]:
+            items = group[1]
+        yield from iter_equipment_events(equipment, items, stamp)
+
+    yield "END:VCALENDAR\r\n"
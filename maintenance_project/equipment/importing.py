@@ -0,0 +1,293 @@
+import csv
+import time
+from dataclasses import dataclass, field
+from datetime import date
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .caching import invalidate_equipment_versions
+from .models import Equipment, EquipmentMaintenance, EquipmentType
+from .scheduling import (
+    SCHEDULE_BATCH_SIZE,
+    ScheduleStats,
+    chunked,
+    generate_schedules,
+    iter_fleet_plans,
+)
+from .summaries import refresh_summaries
+from .validators import check_periodicities_bulk
+
+
+# Количество строк CSV, обрабатываемых и записываемых за одну транзакцию.
+IMPORT_CHUNK_SIZE = 1000
+
+# Колонки CSV; первые колонки до periodicity обязательны.
+IMPORT_COLUMNS = (
+    "inventory_number",
+    "name",
+    "equipment_type",
+    "model",
+    "manufacturer",
+    "serial_number",
+    "installation_date",
+    "to_periodicity",
+    "tr_periodicity",
+    "kr_periodicity",
+)
+REQUIRED_COLUMNS = IMPORT_COLUMNS[:8]
+
+# Поля оборудования, обновляемые при совпадении инвентарного номера.
+EQUIPMENT_UPDATE_FIELDS = (
+    "name",
+    "equipment_type",
+    "model",
+    "manufacturer",
+    "serial_number",
+    "installation_date",
+)
+MAINTENANCE_UPDATE_FIELDS = (
+    "to_periodicity",
+    "tr_periodicity",
+    "kr_periodicity",
+)
+
+
+@dataclass
+class ImportReport:
+    """Итоги импорта оборудования."""
+
+    rows: int = 0
+    created: int = 0
+    updated: int = 0
+    errors: list = field(default_factory=list)
+    schedule: ScheduleStats = field(default_factory=ScheduleStats)
+    elapsed: float = 0.0
+
+    @property
+    def imported(self):
+        return self.created + self.updated
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def add_error(self, line, message):
+        self.errors.append((line, message))
+
+
+def read_csv(lines):
+    """
+    Читает CSV построчно, определяя разделитель (";" или ",").
+
+    Args:
+        lines: Итерируемый набор строк, например открытый текстовый файл.
+
+    Yields:
+        Пары (номер строки в файле, словарь значений).
+    """
+    lines = iter(lines)
+    header = next(lines, "")
+    try:
+        dialect = csv.Sniffer().sniff(header, delimiters=";,")
+    except csv.Error:
+        dialect = csv.excel
+    columns = next(csv.reader([header], dialect))
+    missing = [column for column in REQUIRED_COLUMNS if column not in columns]
+    if missing:
+        raise ValidationError(
+            "В файле отсутствуют колонки: " + ", ".join(missing) + "."
+        )
+
+    for line, values in enumerate(csv.reader(lines, dialect), start=2):
+        if not any(values):
+            continue
+        yield line, dict(zip(columns, (value.strip() for value in values)))
+
+
+def parse_periodicity(value, label):
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValidationError(f"Периодичность '{label}' должна быть целым числом.")
+
+
+def parse_row(row, type_ids):
+    """
+    Разбирает строку CSV и создаёт по ней несохранённые объекты.
+
+    Согласованность периодичностей проверяется отдельно для всей пачки.
+
+    Args:
+        row: Словарь значений строки.
+        type_ids: Словарь {slug типа оборудования: id}.
+
+    Returns:
+        Пара (Equipment, EquipmentMaintenance) без первичных ключей.
+
+    Raises:
+        ValidationError: Если строка содержит ошибки.
+    """
+    empty = [column for column in REQUIRED_COLUMNS if not row.get(column)]
+    if empty:
+        raise ValidationError("Не заполнены колонки: " + ", ".join(empty) + ".")
+
+    type_slug = row["equipment_type"]
+    if type_slug not in type_ids:
+        raise ValidationError(f"Неизвестный тип оборудования '{type_slug}'.")
+
+    try:
+        installation_date = date.fromisoformat(row["installation_date"])
+    except ValueError:
+        raise ValidationError(
+            "Неверная дата ввода в эксплуатацию (ожидается ГГГГ-ММ-ДД)."
+        )
+
+    periodicities = (
+        parse_periodicity(row["to_periodicity"], "ТО"),
+        parse_periodicity(row.get("tr_periodicity"), "ТР"),
+        parse_periodicity(row.get("kr_periodicity"), "КР"),
+    )
+
+    equipment = Equipment(
+        inventory_number=row["inventory_number"],
+        name=row["name"],
+        equipment_type_id=type_ids[type_slug],
+        model=row["model"],
+        manufacturer=row["manufacturer"],
+        serial_number=row["serial_number"],
+        installation_date=installation_date,
+    )
+    maintenance = EquipmentMaintenance(
+        to_periodicity=periodicities[0],
+        tr_periodicity=periodicities[1],
+        kr_periodicity=periodicities[2],
+    )
+    return equipment, maintenance
+
+
+def upsert_chunk(parsed):
+    """
+    Создаёт или обновляет оборудование и периодичности пачкой.
+
+    Args:
+        parsed: Словарь {инвентарный номер: (Equipment, EquipmentMaintenance)}.
+
+    Returns:
+        Пара (количество новых единиц, идентификаторы оборудования).
+    """
+    inventory_numbers = list(parsed)
+    existing = Equipment.objects.filter(
+        inventory_number__in=inventory_numbers
+    ).count()
+
+    Equipment.objects.bulk_create(
+        [equipment for equipment, _ in parsed.values()],
+        update_conflicts=True,
+        unique_fields=["inventory_number"],
+        update_fields=EQUIPMENT_UPDATE_FIELDS,
+    )
+    # Первичные ключи при upsert возвращаются не всеми СУБД.
+    ids = dict(
+        Equipment.objects.filter(
+            inventory_number__in=inventory_numbers
+        ).values_list("inventory_number", "id")
+    )
+
+    maintenances = []
+    for inventory_number, (_, maintenance) in parsed.items():
+        maintenance.equipment_id = ids[inventory_number]
+        maintenances.append(maintenance)
+    EquipmentMaintenance.objects.bulk_create(
+        maintenances,
+        update_conflicts=True,
+        unique_fields=["equipment"],
+        update_fields=MAINTENANCE_UPDATE_FIELDS,
+    )
+    equipment_ids = list(ids.values())
+    transaction.on_commit(lambda: invalidate_equipment_versions(equipment_ids))
+    return len(parsed) - existing, equipment_ids
+
+
+def import_equipment(
+    lines,
+    chunk_size=IMPORT_CHUNK_SIZE,
+    schedule_until=None,
+    batch_size=SCHEDULE_BATCH_SIZE,
+    dry_run=False,
+):
+    """
+    Импортирует оборудование с периодичностями обслуживания из CSV.
+
+    Файл читается и записывается пачками по chunk_size строк; оборудование
+    сопоставляется по инвентарному номеру, а тип - по slug. Строки с
+    ошибками пропускаются и попадают в отчёт.
+
+    Args:
+        lines: Строки CSV-файла.
+        chunk_size: Количество строк в одной транзакции.
+        schedule_until: Если указана, для импортированного оборудования
+                        дополняется график обслуживания до этой даты.
+        batch_size: Размер пачки bulk_create для графика.
+        dry_run: Только проверить строки, не изменяя БД.
+
+    Returns:
+        ImportReport.
+    """
+    report = ImportReport()
+    started = time.perf_counter()
+    type_ids = dict(EquipmentType.objects.values_list("slug", "id"))
+
+    for chunk in chunked(read_csv(lines), chunk_size):
+        rows = []
+        for line, row in chunk:
+            report.rows += 1
+            try:
+                rows.append((line, *parse_row(row, type_ids)))
+            except ValidationError as error:
+                report.add_error(line, " ".join(error.messages))
+
+        errors = check_periodicities_bulk(
+            [
+                (
+                    maintenance.to_periodicity,
+                    maintenance.tr_periodicity,
+                    maintenance.kr_periodicity,
+                )
+                for _, _, maintenance in rows
+            ]
+        )
+        parsed = {}
+        for index, (line, equipment, maintenance) in enumerate(rows):
+            if index in errors:
+                report.add_error(line, errors[index])
+                continue
+            if equipment.inventory_number in parsed:
+                report.add_error(
+                    line,
+                    "Инвентарный номер повторяется в файле; "
+                    "используется последняя строка.",
+                )
+            parsed[equipment.inventory_number] = (equipment, maintenance)
+
+        if dry_run or not parsed:
+            continue
+
+        with transaction.atomic():
+            created, equipment_ids = upsert_chunk(parsed)
+            report.created += created
+            report.updated += len(parsed) - created
+            if schedule_until:
+                report.schedule += generate_schedules(
+                    iter_fleet_plans(schedule_until, equipment_ids=equipment_ids),
+                    batch_size=batch_size,
+                    incremental=True,
+                )
+            else:
+                refresh_summaries(equipment_ids)
+
+    report.errors.sort()
+    report.elapsed = time.perf_counter() - started
+    return report
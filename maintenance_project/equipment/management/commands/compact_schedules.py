@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from equipment.models import MaintenanceSchedule
+from equipment.scheduling import dominant_work_type_enabled
+
+
+class Command(BaseCommand):
+    help = (
+        "Удаляет из графика запланированные работы, совпадающие по дню "
+        "с ближайшей более крупной работой того же оборудования, если её "
+        "периодичность кратна (ТО в день ТР, ТР в день КР). Работы "
+        "с фактической датой или заметками остаются."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Только посчитать записи, не изменяя БД.",
+        )
+
+    def handle(self, *args, **options):
+        deleted = MaintenanceSchedule.objects.delete_dominated(
+            dry_run=options["dry_run"]
+        )
+        verb = "Будет удалено" if options["dry_run"] else "Удалено"
+        self.stdout.write(self.style.SUCCESS(f"{verb} записей: {deleted}."))
+        if not dominant_work_type_enabled():
+            self.stdout.write(
+                self.style.WARNING(
+                    "Настройка MAINTENANCE_DOMINANT_WORK_TYPE выключена: "
+                    "при следующей генерации графика совпадающие работы "
+                    "будут созданы снова."
+                )
+            )
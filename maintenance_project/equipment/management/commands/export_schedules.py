@@ -0,0 +1,95 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from equipment.export import get_export_queryset, iter_export
+from equipment.forms import ScheduleExportForm
+from equipment.models import MaintenanceSchedule
+
+
+class Command(BaseCommand):
+    help = (
+        "Выгружает график обслуживания в CSV или XLSX. Записи читаются из БД "
+        "порциями и сразу пишутся в файл, поэтому объём выгрузки не ограничен "
+        "памятью."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--from", dest="date_from", help="Начальная плановая дата (ГГГГ-ММ-ДД)."
+        )
+        parser.add_argument(
+            "--to", dest="date_to", help="Конечная плановая дата (ГГГГ-ММ-ДД)."
+        )
+        parser.add_argument(
+            "--type",
+            dest="maintenance_type",
+            choices=[code for code, _ in MaintenanceSchedule.MAINTENANCE_TYPE_CHOICES],
+            help="Вид работ.",
+        )
+        parser.add_argument(
+            "--status",
+            choices=[code for code, _ in MaintenanceSchedule.STATUS_CHOICES],
+            help="Статус с учётом просрочки на текущую дату.",
+        )
+        parser.add_argument(
+            "--equipment-type", help="Slug типа оборудования."
+        )
+        parser.add_argument(
+            "--format",
+            choices=[code for code, _ in ScheduleExportForm.FORMAT_CHOICES],
+            default="csv",
+            help="Формат файла.",
+        )
+        parser.add_argument(
+            "--output",
+            help="Путь к файлу; по умолчанию вывод в stdout.",
+        )
+
+    def handle(self, *args, **options):
+        form = ScheduleExportForm(
+            {
+                field: options[field]
+                for field in (
+                    "date_from",
+                    "date_to",
+                    "maintenance_type",
+                    "status",
+                    "equipment_type",
+                    "format",
+                )
+                if options[field]
+            }
+        )
+        if not form.is_valid():
+            raise CommandError(
+                " ".join(
+                    error for errors in form.errors.values() for error in errors
+                )
+            )
+
+        data = form.cleaned_data
+        queryset = get_export_queryset(
+            date_from=data["date_from"],
+            date_to=data["date_to"],
+            maintenance_type=data["maintenance_type"],
+            status=data["status"],
+            equipment_type_slug=data["equipment_type"],
+        )
+
+        output = (
+            open(options["output"], "wb")
+            if options["output"]
+            else sys.stdout.buffer
+        )
+        try:
+            for chunk in iter_export(queryset, data["format"]):
+                output.write(chunk.encode() if isinstance(chunk, str) else chunk)
+        finally:
+            if options["output"]:
+                output.close()
+
+        if options["output"]:
+            self.stderr.write(
+                self.style.SUCCESS(f"Выгрузка сохранена в {options['output']}.")
+            )
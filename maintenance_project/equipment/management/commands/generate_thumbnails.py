@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand
+
+from equipment.models import Equipment
+from equipment.storage import is_content_addressed
+from equipment.thumbnails import generate_thumbnails
+
+
+class Command(BaseCommand):
+    help = (
+        "Переносит загруженные ранее изображения оборудования в хранилище "
+        "с именами по хэшу содержимого (одинаковые файлы хранятся один раз) "
+        "и строит недостающие миниатюры."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Перестроить миниатюры, даже если они актуальны.",
+        )
+        parser.add_argument(
+            "--delete-originals",
+            action="store_true",
+            help=(
+                "Удалять файлы со старыми именами, на которые больше не "
+                "ссылается оборудование."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        storage = Equipment._meta.get_field("image").storage
+        renamed = generated = failed = 0
+        equipments = (
+            Equipment.objects.exclude(image="")
+            .exclude(image__isnull=True)
+            .order_by("pk")
+            .values_list("pk", "image")
+        )
+        for equipment_id, name in equipments.iterator():
+            try:
+                if not is_content_addressed(name):
+                    with storage.open(name) as file:
+                        new_name = storage.save(name, file)
+                    Equipment.objects.filter(pk=equipment_id).update(image=new_name)
+                    renamed += 1
+                    if (
+                        options["delete_originals"]
+                        and not Equipment.objects.filter(image=name).exists()
+                    ):
+                        storage.delete(name)
+                if generate_thumbnails(equipment_id, force=options["force"]):
+                    generated += 1
+            except OSError as error:
+                failed += 1
+                self.stderr.write(
+                    f"Оборудование {equipment_id} ({name}): {error}"
+                )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Перенесено изображений: {renamed}. "
+                f"Построено миниатюр: {generated}. Ошибок: {failed}."
+            )
+        )
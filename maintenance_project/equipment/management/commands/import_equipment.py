@@ -0,0 +1,94 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from equipment.importing import IMPORT_CHUNK_SIZE, import_equipment
+from equipment.scheduling import SCHEDULE_BATCH_SIZE
+
+from .regenerate_schedules import parse_date
+
+
+# Сколько ошибок строк выводить в отчёте.
+MAX_REPORTED_ERRORS = 100
+
+
+class Command(BaseCommand):
+    help = (
+        "Импортирует оборудование с периодичностями обслуживания из CSV. "
+        "Колонки: inventory_number, name, equipment_type (slug), model, "
+        "manufacturer, serial_number, installation_date, to_periodicity, "
+        "tr_periodicity, kr_periodicity. Оборудование с существующим "
+        "инвентарным номером обновляется."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Путь к CSV-файлу (UTF-8).")
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=IMPORT_CHUNK_SIZE,
+            help="Количество строк в одной транзакции.",
+        )
+        parser.add_argument(
+            "--schedule-until",
+            type=parse_date,
+            help=(
+                "Дополнить график обслуживания импортированного "
+                "оборудования до даты (ГГГГ-ММ-ДД)."
+            ),
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=SCHEDULE_BATCH_SIZE,
+            help="Размер пачки bulk_create для графика.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Только проверить файл, не изменяя БД.",
+        )
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size должен быть больше нуля.")
+
+        try:
+            with open(options["path"], encoding="utf-8-sig", newline="") as file:
+                report = import_equipment(
+                    file,
+                    chunk_size=options["chunk_size"],
+                    schedule_until=options["schedule_until"],
+                    batch_size=options["batch_size"],
+                    dry_run=options["dry_run"],
+                )
+        except OSError as error:
+            raise CommandError(f"Не удалось открыть файл: {error}.")
+        except ValidationError as error:
+            raise CommandError(" ".join(error.messages))
+
+        for line, message in report.errors[:MAX_REPORTED_ERRORS]:
+            self.stderr.write(f"Строка {line}: {message}")
+        if len(report.errors) > MAX_REPORTED_ERRORS:
+            self.stderr.write(
+                f"... и ещё {len(report.errors) - MAX_REPORTED_ERRORS} ошибок."
+            )
+
+        self.stdout.write(
+            f"Строк: {report.rows}, ошибок: {len(report.errors)}, "
+            f"время: {report.elapsed:.2f} с "
+            f"({report.rows_per_second:.0f} строк/с)."
+        )
+        if options["dry_run"]:
+            self.stdout.write(self.style.SUCCESS("Проверка завершена."))
+            return
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Создано: {report.created}, обновлено: {report.updated}."
+            )
+        )
+        if options["schedule_until"]:
+            self.stdout.write(
+                f"График: создано записей {report.schedule.created}, "
+                f"удалено {report.schedule.deleted}."
+            )
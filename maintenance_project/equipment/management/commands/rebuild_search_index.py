@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from equipment.search import install_search_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Создаёт недостающие таблицу и триггеры полнотекстового индекса "
+        "оборудования и перестраивает индекс по текущим данным. Нужна после "
+        "миграций, пересоздающих таблицу оборудования в SQLite."
+    )
+
+    def handle(self, *args, **options):
+        install_search_index()
+        self.stdout.write(self.style.SUCCESS("Поисковый индекс перестроен."))
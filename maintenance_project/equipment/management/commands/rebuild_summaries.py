@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from equipment.summaries import rebuild_summaries
+
+
+class Command(BaseCommand):
+    help = (
+        "Полностью пересчитывает сводки обслуживания оборудования "
+        "(ближайшие работы, просрочки, последняя выполненная работа)."
+    )
+
+    def handle(self, *args, **options):
+        refreshed = rebuild_summaries()
+        self.stdout.write(
+            self.style.SUCCESS(f"Сводок обновлено: {refreshed}.")
+        )
@@ -0,0 +1,240 @@
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from equipment.scheduling import (
+    SCHEDULE_BATCH_SIZE,
+    ScheduleStats,
+    chunked,
+    compute_rows,
+    count_planned_windows,
+    diff_schedule,
+    iter_fleet_plans,
+    write_schedule,
+    write_schedule_incremental,
+)
+
+
+DEFAULT_STATE_FILE = settings.BASE_DIR / ".regenerate_schedules.json"
+
+
+def parse_date(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f"Неверный формат даты: {value} (ожидается ГГГГ-ММ-ДД).")
+
+
+class Command(BaseCommand):
+    help = (
+        "Перестраивает график обслуживания для всего парка оборудования. "
+        "Плановые даты вычисляются в пуле процессов по шардам, "
+        "запись в БД выполняется пачками в основном процессе."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--until",
+            required=True,
+            type=parse_date,
+            help="Дата окончания графика (ГГГГ-ММ-ДД).",
+        )
+        parser.add_argument(
+            "--from",
+            dest="start_date",
+            type=parse_date,
+            help=(
+                "Дата начала графика (ГГГГ-ММ-ДД); по умолчанию дата ввода "
+                "оборудования в эксплуатацию."
+            ),
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Количество процессов для вычисления графика.",
+        )
+        parser.add_argument(
+            "--shard-size",
+            type=int,
+            default=500,
+            help="Количество единиц оборудования в одном шарде.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=SCHEDULE_BATCH_SIZE,
+            help="Размер пачки bulk_create.",
+        )
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help=(
+                "Не пересоздавать график: добавить недостающие записи и "
+                "удалить только устаревшие запланированные."
+            ),
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Только посчитать записи, не изменяя БД.",
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Продолжить прерванный запуск с последнего записанного шарда.",
+        )
+        parser.add_argument(
+            "--state-file",
+            default=str(DEFAULT_STATE_FILE),
+            help="Файл с состоянием для возобновления.",
+        )
+
+    def handle(self, *args, **options):
+        if options["workers"] < 1 or options["shard_size"] < 1:
+            raise CommandError("--workers и --shard-size должны быть больше нуля.")
+
+        self.state_file = options["state_file"]
+        self.run_params = {
+            "until": options["until"].isoformat(),
+            "from": (
+                options["start_date"].isoformat()
+                if options["start_date"]
+                else None
+            ),
+            "incremental": options["incremental"],
+        }
+
+        last_equipment_id = 0
+        if options["resume"]:
+            last_equipment_id = self.load_state()
+
+        plans = [
+            plan
+            for plan in iter_fleet_plans(
+                options["until"], start_date=options["start_date"]
+            )
+            if plan.equipment_id > last_equipment_id
+        ]
+        shards = list(chunked(plans, options["shard_size"]))
+        if not shards:
+            self.stdout.write("Нет оборудования для обработки.")
+            return
+
+        self.stdout.write(
+            f"Оборудование: {len(plans)}, шардов: {len(shards)}, "
+            f"процессов: {options['workers']}"
+            + (" (пробный запуск)" if options["dry_run"] else "")
+        )
+
+        write = (
+            write_schedule_incremental
+            if options["incremental"]
+            else write_schedule
+        )
+        total = ScheduleStats()
+        processed = 0
+        for shard, rows in self.compute_shards(shards, options["workers"]):
+            if options["dry_run"]:
+                stats = self.count_changes(shard, rows, options["incremental"])
+            else:
+                stats = write(shard, rows, batch_size=options["batch_size"])
+                self.save_state(shard[-1].equipment_id)
+
+            total += stats
+            processed += len(shard)
+            self.stdout.write(
+                f"[{processed}/{len(plans)}] создано: {total.created}, "
+                f"удалено: {total.deleted}"
+            )
+
+        if not options["dry_run"]:
+            self.clear_state()
+
+        verb = "Будет" if options["dry_run"] else "Итого"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{verb} создано записей: {total.created}, "
+                f"удалено записей: {total.deleted}."
+            )
+        )
+
+    def count_changes(self, shard, rows, incremental):
+        if incremental:
+            missing, stale_ids = diff_schedule(shard, rows)
+            return ScheduleStats(created=len(missing), deleted=len(stale_ids))
+        return ScheduleStats(
+            created=len(rows), deleted=count_planned_windows(shard)
+        )
+
+    def compute_shards(self, shards, workers):
+        """
+        Вычисляет записи шардов и отдаёт их в исходном порядке.
+
+        В работе держится не больше 2 * workers шардов, чтобы память
+        не росла, если запись в БД отстаёт от вычислений.
+        """
+        if workers == 1:
+            for shard in shards:
+                yield shard, compute_rows(shard)
+            return
+
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=django.setup
+        ) as executor:
+            pending = deque()
+            shard_iterator = iter(shards)
+            for shard in shard_iterator:
+                pending.append((shard, executor.submit(compute_rows, shard)))
+                if len(pending) >= 2 * workers:
+                    break
+
+            while pending:
+                shard, future = pending.popleft()
+                next_shard = next(shard_iterator, None)
+                if next_shard is not None:
+                    pending.append(
+                        (next_shard, executor.submit(compute_rows, next_shard))
+                    )
+                yield shard, future.result()
+
+    def load_state(self):
+        try:
+            with open(self.state_file, encoding="utf-8") as file:
+                state = json.load(file)
+        except FileNotFoundError:
+            self.stdout.write("Сохранённое состояние не найдено, начинаем сначала.")
+            return 0
+
+        if state.get("params") != self.run_params:
+            raise CommandError(
+                "Параметры сохранённого запуска не совпадают с текущими: "
+                f"{state.get('params')}."
+            )
+        self.stdout.write(
+            "Продолжаем после оборудования "
+            f"с id={state['last_equipment_id']}."
+        )
+        return state["last_equipment_id"]
+
+    def save_state(self, last_equipment_id):
+        with open(self.state_file, "w", encoding="utf-8") as file:
+            json.dump(
+                {
+                    "params": self.run_params,
+                    "last_equipment_id": last_equipment_id,
+                },
+                file,
+            )
+
+    def clear_state(self):
+        try:
+            os.remove(self.state_file)
+        except FileNotFoundError:
+            pass
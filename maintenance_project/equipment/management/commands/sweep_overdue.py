@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from equipment.sweeper import (
+    DEFAULT_SWEEP_INTERVAL,
+    OverdueSweeper,
+    sweep_overdue,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Переводит просроченные запланированные работы в статус "
+        "\"Просрочено\". Запускается по расписанию раз в сутки или "
+        "в режиме --loop как постоянный процесс."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Работать постоянно, обновляя статусы при смене суток.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=DEFAULT_SWEEP_INTERVAL,
+            help="Интервал проверки смены суток в режиме --loop (секунды).",
+        )
+
+    def handle(self, *args, **options):
+        if not options["loop"]:
+            updated = sweep_overdue()
+            self.stdout.write(
+                self.style.SUCCESS(f"Просроченных работ обновлено: {updated}.")
+            )
+            return
+
+        sweeper = OverdueSweeper(interval=options["interval"])
+        self.stdout.write("Фоновое обновление статусов запущено.")
+        try:
+            sweeper.run()
+        except KeyboardInterrupt:
+            sweeper.stop()
+            self.stdout.write("Остановлено.")
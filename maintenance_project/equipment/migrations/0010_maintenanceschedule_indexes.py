@@ -0,0 +1,30 @@
+# Generated by Django 5.1.4 on 2026-10-18 00:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0009_alter_maintenanceschedule_maintenance_type_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='maintenanceschedule',
+            name='status',
+            field=models.CharField(choices=[('Запланировано', 'Запланировано'), ('Выполнено', 'Выполнено'), ('Просрочено', 'Просрочено')], default='scheduled', max_length=20, verbose_name='Статус'),
+        ),
+        migrations.AddIndex(
+            model_name='maintenanceschedule',
+            index=models.Index(fields=['planned_date', 'equipment'], name='schedule_date_equipment_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='maintenanceschedule',
+            index=models.Index(fields=['equipment', 'planned_date'], name='schedule_equipment_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='maintenanceschedule',
+            index=models.Index(fields=['status', 'planned_date'], name='schedule_status_date_idx'),
+        ),
+    ]
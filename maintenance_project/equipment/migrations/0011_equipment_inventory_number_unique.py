@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 00:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0010_maintenanceschedule_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='equipment',
+            name='inventory_number',
+            field=models.CharField(max_length=255, unique=True, verbose_name='Инвентарный номер'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.4 on 2026-10-18 00:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0011_equipment_inventory_number_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EquipmentMaintenanceSummary',
+            fields=[
+                ('equipment', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to='equipment.equipment', verbose_name='Оборудование')),
+                ('next_to_date', models.DateField(blank=True, null=True, verbose_name='Следующее ТО')),
+                ('next_tr_date', models.DateField(blank=True, null=True, verbose_name='Следующий ТР')),
+                ('next_kr_date', models.DateField(blank=True, null=True, verbose_name='Следующий КР')),
+                ('overdue_count', models.PositiveIntegerField(default=0, verbose_name='Просрочено работ')),
+                ('last_completed_date', models.DateField(blank=True, null=True, verbose_name='Последняя выполненная работа')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Сводка обслуживания оборудования',
+                'verbose_name_plural': 'Сводки обслуживания оборудования',
+            },
+        ),
+    ]
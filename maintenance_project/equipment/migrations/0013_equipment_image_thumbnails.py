@@ -0,0 +1,24 @@
+# Generated by Django 5.1.4 on 2026-10-18 01:02
+
+import equipment.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0012_equipmentmaintenancesummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipment',
+            name='image_thumbnails',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Заполняется фоновым обработчиком после загрузки изображения.', verbose_name='Миниатюры изображения'),
+        ),
+        migrations.AlterField(
+            model_name='equipment',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=equipment.storage.ContentAddressedStorage(), upload_to='equipment_images/', verbose_name='Изображение'),
+        ),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 5.1.4 on 2026-10-18 01:07
+
+import django.db.models.deletion
+import equipment.models
+from django.db import migrations, models
+
+
+# DDL зафиксирован на момент миграции и не зависит от кода приложения
+# (equipment.search), который может меняться позже.
+SEARCH_INDEX_SQL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS equipment_equipment_fts USING fts5("
+    "name, model, manufacturer, serial_number, inventory_number, description, "
+    "content='equipment_equipment', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS equipment_equipment_fts_ai "
+    "AFTER INSERT ON equipment_equipment BEGIN "
+    "INSERT INTO equipment_equipment_fts(rowid, name, model, manufacturer, "
+    "serial_number, inventory_number, description) VALUES (new.id, new.name, "
+    "new.model, new.manufacturer, new.serial_number, new.inventory_number, "
+    "new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS equipment_equipment_fts_ad "
+    "AFTER DELETE ON equipment_equipment BEGIN "
+    "INSERT INTO equipment_equipment_fts(equipment_equipment_fts, rowid, name, "
+    "model, manufacturer, serial_number, inventory_number, description) "
+    "VALUES ('delete', old.id, old.name, old.model, old.manufacturer, "
+    "old.serial_number, old.inventory_number, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS equipment_equipment_fts_au "
+    "AFTER UPDATE OF name, model, manufacturer, serial_number, inventory_number, "
+    "description ON equipment_equipment BEGIN "
+    "INSERT INTO equipment_equipment_fts(equipment_equipment_fts, rowid, name, "
+    "model, manufacturer, serial_number, inventory_number, description) "
+    "VALUES ('delete', old.id, old.name, old.model, old.manufacturer, "
+    "old.serial_number, old.inventory_number, old.description); "
+    "INSERT INTO equipment_equipment_fts(rowid, name, model, manufacturer, "
+    "serial_number, inventory_number, description) VALUES (new.id, new.name, "
+    "new.model, new.manufacturer, new.serial_number, new.inventory_number, "
+    "new.description); END",
+    "INSERT INTO equipment_equipment_fts(equipment_equipment_fts) VALUES ('rebuild')",
+]
+
+DROP_SEARCH_INDEX_SQL = [
+    "DROP TRIGGER IF EXISTS equipment_equipment_fts_ai",
+    "DROP TRIGGER IF EXISTS equipment_equipment_fts_ad",
+    "DROP TRIGGER IF EXISTS equipment_equipment_fts_au",
+    "DROP TABLE IF EXISTS equipment_equipment_fts",
+]
+
+
+def execute_on_sqlite(statements):
+    # Полнотекстовый индекс есть только в SQLite; на других СУБД поиск
+    # работает через icontains.
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != "sqlite":
+            return
+        for sql in statements:
+            schema_editor.execute(sql)
+
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0013_equipment_image_thumbnails'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EquipmentSearchIndex',
+            fields=[
+                ('equipment', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_index', serialize=False, to='equipment.equipment', verbose_name='Оборудование')),
+                ('document', equipment.models.SearchDocumentField(db_column='equipment_equipment_fts')),
+            ],
+            options={
+                'verbose_name': 'Поисковый индекс оборудования',
+                'verbose_name_plural': 'Поисковый индекс оборудования',
+                'db_table': 'equipment_equipment_fts',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(
+            execute_on_sqlite(SEARCH_INDEX_SQL),
+            execute_on_sqlite(DROP_SEARCH_INDEX_SQL),
+        ),
+    ]
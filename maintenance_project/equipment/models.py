@@ -1,10 +1,16 @@
-from datetime import timedelta
+from collections import defaultdict
 
-from django.db import models
+from django.db import models, transaction
 from django.core.exceptions import ValidationError
+from django.db.models.functions import Mod
+from django.dispatch import Signal
 from django.utils.text import slugify
 from django.utils import timezone
 
+from .caching import invalidate_equipment_versions
+from .storage import ContentAddressedStorage
+from .validators import check_periodicities, check_periodicities_bulk
+
 
 class Displayable(models.Model):
     is_displayed = models.BooleanField(
@@ -58,15 +64,23 @@ class Equipment(Displayable):
     manufacturer = models.CharField(max_length=255, verbose_name="Производитель")
     serial_number = models.CharField(max_length=255, verbose_name="Серийный номер")
     inventory_number = models.CharField(
-        max_length=255, verbose_name="Инвентарный номер"
+        max_length=255, unique=True, verbose_name="Инвентарный номер"
     )
     installation_date = models.DateField(verbose_name="Дата ввода в эксплуатацию")
     image = models.ImageField(
         upload_to="equipment_images/",
+        storage=ContentAddressedStorage(),
         verbose_name="Изображение",
         null=True,
         blank=True,
     )
+    image_thumbnails = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name="Миниатюры изображения",
+        help_text="Заполняется фоновым обработчиком после загрузки изображения.",
+    )
 
     def __str__(self):
         return self.name
@@ -103,7 +117,98 @@ class Equipment(Displayable):
     get_maintenance_types.short_description = "Типы обслуживания"
 
 
+class SearchDocumentField(models.TextField):
+    """
+    Скрытый столбец виртуальной таблицы FTS5 с именем самой таблицы.
+
+    Поддерживает поиск document__match=<запрос FTS5>; столбец передаётся
+    во вспомогательные функции FTS5 (bm25, highlight).
+    """
+
+
+@SearchDocumentField.register_lookup
+class Match(models.Lookup):
+    lookup_name = "match"
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} MATCH {rhs}", [*lhs_params, *rhs_params]
+
+
+class EquipmentSearchIndex(models.Model):
+    """
+    Полнотекстовый индекс оборудования (виртуальная таблица SQLite FTS5).
+
+    Таблица создаётся миграцией и синхронизируется триггерами БД при любых
+    изменениях оборудования, в том числе массовых; Django ею не управляет.
+    Поиск - через equipment.search.search_equipment.
+    """
+
+    equipment = models.OneToOneField(
+        Equipment,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column="rowid",
+        db_constraint=False,
+        related_name="search_index",
+        verbose_name="Оборудование",
+    )
+    document = SearchDocumentField(db_column="equipment_equipment_fts")
+
+    class Meta:
+        managed = False
+        db_table = "equipment_equipment_fts"
+        verbose_name = "Поисковый индекс оборудования"
+        verbose_name_plural = "Поисковый индекс оборудования"
+
+
+class EquipmentMaintenanceManager(models.Manager):
+    def bulk_update_periodicities(self, objs, batch_size=None):
+        """
+        Сохраняет изменённые периодичности пачкой без save() на каждый объект.
+
+        Все объекты проверяются вместе правилами check_periodicities;
+        при любой ошибке ничего не сохраняется.
+
+        Args:
+            objs: Последовательность EquipmentMaintenance.
+            batch_size: Размер пачки bulk_update.
+
+        Returns:
+            Количество обновлённых записей.
+
+        Raises:
+            ValidationError: Со словарём {equipment_id: [сообщение]}
+                             для объектов с ошибками.
+        """
+        objs = list(objs)
+        errors = check_periodicities_bulk(
+            [
+                (obj.to_periodicity, obj.tr_periodicity, obj.kr_periodicity)
+                for obj in objs
+            ]
+        )
+        if errors:
+            raise ValidationError(
+                {
+                    str(objs[index].equipment_id): [message]
+                    for index, message in errors.items()
+                }
+            )
+        equipment_ids = [obj.equipment_id for obj in objs]
+        transaction.on_commit(
+            lambda: invalidate_equipment_versions(equipment_ids)
+        )
+        return self.bulk_update(
+            objs,
+            ["to_periodicity", "tr_periodicity", "kr_periodicity"],
+            batch_size=batch_size,
+        )
+
+
 class EquipmentMaintenance(models.Model):
+    objects = EquipmentMaintenanceManager()
     equipment = models.OneToOneField(
         Equipment,
         on_delete=models.CASCADE,
@@ -122,27 +227,9 @@ class EquipmentMaintenance(models.Model):
         return f"Периодичности обслуживания для {self.equipment.name}"
 
     def clean(self):
-        if self.tr_periodicity:
-            if self.tr_periodicity % self.to_periodicity != 0:
-                raise ValidationError(
-                    "Периодичность 'ТР' должна быть кратна периодичности "
-                    f"ТО ({self.to_periodicity} дн.)."
-                )
-
-        if self.kr_periodicity:
-            if not self.tr_periodicity:
-                raise ValidationError(
-                    "Для задания периодичности 'КР' необходимо указать "
-                    "периодичность 'ТР'."
-                )
-            if (
-                self.kr_periodicity % self.to_periodicity != 0
-                or self.kr_periodicity % self.tr_periodicity != 0
-            ):
-                raise ValidationError(
-                    "Периодичность 'КР' должна быть кратна периодичности "
-                    f"ТО ({self.to_periodicity} дн.) и ТР ({self.tr_periodicity} дн.)."
-                )
+        check_periodicities(
+            self.to_periodicity, self.tr_periodicity, self.kr_periodicity
+        )
 
     def save(self, *args, **kwargs):
         self.full_clean()
@@ -153,14 +240,233 @@ class EquipmentMaintenance(models.Model):
         verbose_name_plural = "Периодичности обслуживания оборудования"
 
 
-class MaintenanceScheduleManager(models.Manager):
-    def update_overdue_status(self):
-        today = timezone.now().date()
+# Размер пачки идентификаторов в условиях IN (...) при массовых изменениях.
+BULK_ID_CHUNK_SIZE = 500
+
+# Отправляется после массового изменения или удаления записей графика
+# без save() и delete(); items - пары (equipment_id, planned_date)
+# затронутых записей.
+schedules_bulk_updated = Signal()
+
+
+class MaintenanceScheduleQuerySet(models.QuerySet):
+    def annotate_effective_status(self, name="current_status", today=None):
+        """
+        Добавляет статус с учётом просрочки на текущую дату (см. effective_status).
+        """
+        if today is None:
+            today = timezone.now().date()
+        scheduled_status, _ = MaintenanceSchedule.STATUS_CHOICES[0]
+        overdue_status, _ = MaintenanceSchedule.STATUS_CHOICES[2]
+        return self.annotate(
+            **{
+                name: models.Case(
+                    models.When(
+                        status=scheduled_status,
+                        planned_date__lt=today,
+                        then=models.Value(overdue_status),
+                    ),
+                    default=models.F("status"),
+                    output_field=models.CharField(),
+                )
+            }
+        )
+
+    def filter_effective_status(self, status, today=None):
+        """Фильтрует записи по статусу с учётом просрочки на текущую дату."""
+        if today is None:
+            today = timezone.now().date()
+        scheduled_status, _ = MaintenanceSchedule.STATUS_CHOICES[0]
+        overdue_status, _ = MaintenanceSchedule.STATUS_CHOICES[2]
+        if status == scheduled_status:
+            return self.filter(status=status, planned_date__gte=today)
+        if status == overdue_status:
+            return self.filter(
+                models.Q(status=overdue_status)
+                | models.Q(status=scheduled_status, planned_date__lt=today)
+            )
+        return self.filter(status=status)
+
+
+class MaintenanceScheduleManager(
+    models.Manager.from_queryset(MaintenanceScheduleQuerySet)
+):
+    def update_overdue_status(self, today=None):
+        """
+        Переводит просроченные запланированные работы в статус "Просрочено".
+
+        Returns:
+            Количество обновлённых записей.
+        """
+        if today is None:
+            today = timezone.now().date()
         overdue_status = MaintenanceSchedule.STATUS_CHOICES[2][0]
-        self.filter(planned_date__lt=today, status="Запланировано").update(
+        return self.filter(planned_date__lt=today, status="Запланировано").update(
             status=overdue_status
         )
 
+    def bulk_transition(self, changes, today=None):
+        """
+        Массово меняет статусы записей графика.
+
+        Переходы проверяются по MaintenanceSchedule.STATUS_TRANSITIONS;
+        записи с одинаковыми статусом и фактической датой обновляются
+        одним UPDATE. При любой ошибке ничего не изменяется.
+
+        Args:
+            changes: Тройки (id, новый статус, фактическая дата). Для статуса
+                     "Выполнено" без даты сохраняется уже записанная
+                     фактическая дата выполненной работы, иначе ставится
+                     today; для остальных статусов фактическая дата
+                     сбрасывается.
+            today: Текущая дата.
+
+        Returns:
+            Отсортированный список id изменённых записей.
+
+        Raises:
+            ValidationError: Со словарём {id: [сообщение]}.
+        """
+        if today is None:
+            today = timezone.now().date()
+        completed_status = MaintenanceSchedule.STATUS_CHOICES[1][0]
+
+        targets = {}
+        errors = {}
+        for pk, status, actual_date in changes:
+            if pk in targets:
+                errors[str(pk)] = ["Запись указана несколько раз."]
+                continue
+            targets[pk] = (status, actual_date)
+
+        with transaction.atomic():
+            ids = list(targets)
+            rows = {}
+            for start in range(0, len(ids), BULK_ID_CHUNK_SIZE):
+                rows.update(
+                    (pk, row)
+                    for pk, *row in (
+                        self.select_for_update()
+                        .filter(pk__in=ids[start:start + BULK_ID_CHUNK_SIZE])
+                        .values_list(
+                            "pk",
+                            "status",
+                            "equipment_id",
+                            "planned_date",
+                            "actual_date",
+                        )
+                    )
+                )
+
+            groups = defaultdict(list)
+            for pk, (status, actual_date) in targets.items():
+                if pk not in rows:
+                    errors[str(pk)] = ["Запись графика не найдена."]
+                    continue
+                current_status, _, _, current_date = rows[pk]
+                if status not in MaintenanceSchedule.STATUS_TRANSITIONS.get(
+                    current_status, ()
+                ):
+                    errors[str(pk)] = [
+                        f"Недопустимый переход статуса: {current_status} → {status}."
+                    ]
+                elif status != completed_status:
+                    groups[(status, None)].append(pk)
+                elif actual_date is None and current_status == completed_status:
+                    groups[(status, current_date or today)].append(pk)
+                else:
+                    groups[(status, actual_date or today)].append(pk)
+            if errors:
+                raise ValidationError(errors)
+
+            for (status, actual_date), group_ids in groups.items():
+                for start in range(0, len(group_ids), BULK_ID_CHUNK_SIZE):
+                    self.filter(
+                        pk__in=group_ids[start:start + BULK_ID_CHUNK_SIZE]
+                    ).update(status=status, actual_date=actual_date)
+
+            schedules_bulk_updated.send(
+                sender=self.model,
+                items=[(row[1], row[2]) for row in rows.values()],
+            )
+        return sorted(targets)
+
+    def delete_dominated(self, dry_run=False):
+        """
+        Удаляет работы, совпадающие по дню с более крупной работой.
+
+        Правило то же, что у scheduling.get_recurrences: работа уступает
+        только ближайшему более крупному виду работ с заданной
+        периодичностью оборудования и только если его периодичность кратна
+        периодичности этой работы. Так ТО в день ТР удаляется при ТО через
+        7 и ТР через 28 дней, но остаётся при ТР через 30 дней: иначе
+        инкрементальная генерация в режиме доминирующего вида работ
+        создала бы его снова. Удаляются только запланированные записи без
+        фактической даты и заметок. Записи удаляются пачками без загрузки
+        объектов, сводки и календари обновляются сигналом
+        schedules_bulk_updated.
+
+        Returns:
+            Количество удалённых (при dry_run - подлежащих удалению) записей.
+        """
+        scheduled_status = MaintenanceSchedule.STATUS_CHOICES[0][0]
+        # Виды работ в choices перечислены по возрастанию объёма.
+        levels = [value for value, _ in MaintenanceSchedule.MAINTENANCE_TYPE_CHOICES]
+
+        def periodicity(maintenance_type):
+            return f"equipment__maintenance__{maintenance_type}_periodicity"
+
+        rows = []
+        for index, maintenance_type in enumerate(levels[:-1]):
+            for larger_index in range(index + 1, len(levels)):
+                larger_type = levels[larger_index]
+                # Промежуточные виды работ без периодичности пропускаются,
+                # как в get_periodicities.
+                nearest = models.Q()
+                for skipped in levels[index + 1:larger_index]:
+                    nearest &= models.Q(
+                        **{f"{periodicity(skipped)}__isnull": True}
+                    ) | models.Q(**{f"{periodicity(skipped)}__lte": 0})
+                dominant = self.filter(
+                    equipment_id=models.OuterRef("equipment_id"),
+                    planned_date=models.OuterRef("planned_date"),
+                    maintenance_type=larger_type,
+                )
+                rows.extend(
+                    self.filter(
+                        nearest,
+                        models.Exists(dominant),
+                        models.lookups.Exact(
+                            Mod(
+                                models.F(periodicity(larger_type)),
+                                models.F(periodicity(maintenance_type)),
+                            ),
+                            0,
+                        ),
+                        maintenance_type=maintenance_type,
+                        status=scheduled_status,
+                        actual_date__isnull=True,
+                        notes="",
+                        **{
+                            f"{periodicity(maintenance_type)}__gt": 0,
+                            f"{periodicity(larger_type)}__gt": 0,
+                        },
+                    ).values_list("pk", "equipment_id", "planned_date")
+                )
+        if dry_run or not rows:
+            return len(rows)
+
+        with transaction.atomic():
+            for start in range(0, len(rows), BULK_ID_CHUNK_SIZE):
+                ids = [row[0] for row in rows[start:start + BULK_ID_CHUNK_SIZE]]
+                # У записей графика нет сигналов удаления и зависимых
+                # моделей, поэтому delete() выполняет один DELETE на пачку.
+                self.filter(pk__in=ids).delete()
+            schedules_bulk_updated.send(
+                sender=self.model, items=[(row[1], row[2]) for row in rows]
+            )
+        return len(rows)
+
 
 class MaintenanceSchedule(models.Model):
     MAINTENANCE_TYPE_CHOICES = (
@@ -174,6 +480,14 @@ class MaintenanceSchedule(models.Model):
         ("Выполнено", "Выполнено"),
         ("Просрочено", "Просрочено"),
     )
+
+    # Допустимые переходы статусов при ручном изменении. Выполненную работу
+    # можно вернуть в план, если она была отмечена по ошибке.
+    STATUS_TRANSITIONS = {
+        "Запланировано": ("Выполнено",),
+        "Просрочено": ("Выполнено",),
+        "Выполнено": ("Выполнено", "Запланировано"),
+    }
     objects = MaintenanceScheduleManager()
     equipment = models.ForeignKey(
         Equipment,
@@ -196,6 +510,22 @@ class MaintenanceSchedule(models.Model):
     )
     notes = models.TextField(blank=True, verbose_name="Заметки")
 
+    @property
+    def effective_status(self):
+        """
+        Статус с учётом просрочки на текущую дату.
+
+        Запланированная работа с прошедшей датой считается просроченной,
+        даже если фоновое обновление статусов ещё не выполнялось.
+        """
+        scheduled_status = self.STATUS_CHOICES[0][0]
+        if (
+            self.status == scheduled_status
+            and self.planned_date < timezone.now().date()
+        ):
+            return self.STATUS_CHOICES[2][0]
+        return self.status
+
     def __str__(self):
         return (
             f"{self.equipment.name} - {self.get_maintenance_type_display()} -"
@@ -205,40 +535,61 @@ class MaintenanceSchedule(models.Model):
     class Meta:
         verbose_name = "График обслуживания"
         verbose_name_plural = "Графики обслуживания"
-
-
-def generate_schedule(equipment, start_date=None, end_date=None):
-    """
-    Функция для создания записей в графике обслуживания.
+        indexes = [
+            # Календарь и список всего парка: диапазон дат.
+            models.Index(
+                fields=["planned_date", "equipment"],
+                name="schedule_date_equipment_idx",
+            ),
+            # Календарь оборудования: оборудование + диапазон дат.
+            models.Index(
+                fields=["equipment", "planned_date"],
+                name="schedule_equipment_date_idx",
+            ),
+            # Обновление просроченных: статус + дата.
+            models.Index(
+                fields=["status", "planned_date"],
+                name="schedule_status_date_idx",
+            ),
+        ]
+
+
+class EquipmentMaintenanceSummary(models.Model):
     """
-    if not hasattr(equipment, "maintenance"):
-        return
+    Сводка по графику обслуживания оборудования (одна строка на единицу).
 
-    if start_date is None:
-        start_date = timezone.now().date()
-
-    if end_date is None:
-        end_date = start_date + timedelta(days=365)
+    Денормализованная проекция MaintenanceSchedule для карточек и админки;
+    пересчитывается для затронутого оборудования при изменении графика
+    и при обновлении просроченных работ (см. equipment.summaries).
+    """
 
-    MaintenanceSchedule.objects.filter(
-        equipment=equipment, planned_date__gte=start_date, planned_date__lte=end_date
-    ).delete()
+    equipment = models.OneToOneField(
+        Equipment,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        verbose_name="Оборудование",
+        related_name="summary",
+    )
+    next_to_date = models.DateField(
+        null=True, blank=True, verbose_name="Следующее ТО"
+    )
+    next_tr_date = models.DateField(
+        null=True, blank=True, verbose_name="Следующий ТР"
+    )
+    next_kr_date = models.DateField(
+        null=True, blank=True, verbose_name="Следующий КР"
+    )
+    overdue_count = models.PositiveIntegerField(
+        default=0, verbose_name="Просрочено работ"
+    )
+    last_completed_date = models.DateField(
+        null=True, blank=True, verbose_name="Последняя выполненная работа"
+    )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Обновлено")
 
-    periodicity_map = {
-        "to": equipment.maintenance.to_periodicity,
-        "tr": equipment.maintenance.tr_periodicity,
-        "kr": equipment.maintenance.kr_periodicity,
-    }
+    def __str__(self):
+        return f"Сводка обслуживания для {self.equipment_id}"
 
-    for maintenance_type, periodicity in periodicity_map.items():
-        if periodicity:
-            current_date = start_date
-            while current_date <= end_date:
-                scheduled_status = MaintenanceSchedule.STATUS_CHOICES[0][0]
-                MaintenanceSchedule.objects.create(
-                    equipment=equipment,
-                    maintenance_type=maintenance_type,
-                    planned_date=current_date,
-                    status=scheduled_status,
-                )
-                current_date += timedelta(days=periodicity)
+    class Meta:
+        verbose_name = "Сводка обслуживания оборудования"
+        verbose_name_plural = "Сводки обслуживания оборудования"
@@ -0,0 +1,217 @@
+import base64
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+# Время жизни закэшированного приблизительного количества записей.
+APPROXIMATE_COUNT_TIMEOUT = 5 * 60
+
+FORWARD = "f"
+BACKWARD = "b"
+LAST = "l"
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPage:
+    """Страница курсорной пагинации; повторяет интерфейс Page Django."""
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if not self._has_next:
+            return None
+        return self.paginator.encode_cursor(FORWARD, self.object_list[-1])
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous:
+            return None
+        return self.paginator.encode_cursor(BACKWARD, self.object_list[0])
+
+    @property
+    def last_cursor(self):
+        return self.paginator.encode_cursor(LAST)
+
+    @property
+    def approximate_count(self):
+        return self.paginator.approximate_count
+
+
+class KeysetPaginator:
+    """
+    Курсорная (keyset) пагинация по уникальному набору полей сортировки.
+
+    Вместо OFFSET страница выбирается условием "после ключа последней
+    записи", поэтому время выборки не зависит от номера страницы, а COUNT(*)
+    выполняется только для приблизительного количества и кэшируется.
+
+    Args:
+        queryset: Исходный queryset.
+        ordering: Поля сортировки, например ("planned_date", "id") или
+                  ("-installation_date", "-id"); последнее поле должно
+                  делать ключ уникальным.
+        per_page: Количество записей на странице.
+        with_count: Вычислять ли приблизительное общее количество.
+    """
+
+    def __init__(self, queryset, ordering, per_page, with_count=False):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.per_page = per_page
+        self.with_count = with_count
+        self.fields = [field.lstrip("-") for field in self.ordering]
+        self.descending = [field.startswith("-") for field in self.ordering]
+
+    def encode_cursor(self, direction, obj=None):
+        values = (
+            [getattr(obj, field) for field in self.fields] if obj is not None else []
+        )
+        payload = json.dumps([direction, values], cls=DjangoJSONEncoder)
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, cursor):
+        try:
+            payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            direction, values = json.loads(payload)
+        except (ValueError, TypeError):
+            raise InvalidCursor("Неверный курсор страницы.")
+
+        if direction == LAST:
+            return direction, []
+        if (
+            direction not in (FORWARD, BACKWARD)
+            or not isinstance(values, list)
+            or len(values) != len(self.fields)
+            # Ключ записи состоит только из непустых скалярных значений.
+            or not all(isinstance(value, (str, int, float)) for value in values)
+        ):
+            raise InvalidCursor("Неверный курсор страницы.")
+        return direction, [
+            self.to_python(field, value) for field, value in zip(self.fields, values)
+        ]
+
+    def to_python(self, field, value):
+        try:
+            model_field = self.queryset.model._meta.get_field(field)
+        except FieldDoesNotExist:
+            # Аннотации (например, ранг поиска) хранятся как есть.
+            return value
+        try:
+            return model_field.to_python(value)
+        except (ValidationError, TypeError, ValueError):
+            raise InvalidCursor("Неверный курсор страницы.")
+
+    def keyset_filter(self, values, backward):
+        """
+        Условие "строго после ключа values" в порядке сортировки.
+
+        Для fields (a, b, c) это a > x OR (a = x AND b > y) OR
+        (a = x AND b = y AND c > z) с учётом направления каждого поля.
+        """
+        condition = Q()
+        for index, field in enumerate(self.fields):
+            greater = self.descending[index] == backward
+            lookup = "gt" if greater else "lt"
+            term = Q(**{f"{field}__{lookup}": values[index]})
+            for previous in range(index):
+                term &= Q(**{self.fields[previous]: values[previous]})
+            condition |= term
+        return condition
+
+    def reversed_ordering(self):
+        return [
+            field if descending else f"-{field}"
+            for field, descending in zip(self.fields, self.descending)
+        ]
+
+    def get_page_queryset(self, cursor):
+        """
+        Возвращает направление, ключ курсора и запрос страницы
+        (на одну запись больше per_page, чтобы узнать о следующей).
+        """
+        direction, values = (FORWARD, []) if not cursor else self.decode_cursor(cursor)
+        backward = direction in (BACKWARD, LAST)
+
+        queryset = self.queryset.order_by(
+            *(self.reversed_ordering() if backward else self.ordering)
+        )
+        if values:
+            queryset = queryset.filter(self.keyset_filter(values, backward))
+        return direction, values, queryset[:self.per_page + 1]
+
+    def page(self, cursor=None):
+        direction, values, queryset = self.get_page_queryset(cursor)
+        return self.make_page(direction, values, list(queryset))
+
+    async def apage(self, cursor=None):
+        """Асинхронный вариант page() для async-представлений."""
+        direction, values, queryset = self.get_page_queryset(cursor)
+        return self.make_page(direction, values, [obj async for obj in queryset])
+
+    def make_page(self, direction, values, object_list):
+        backward = direction in (BACKWARD, LAST)
+        has_more = len(object_list) > self.per_page
+        object_list = object_list[:self.per_page]
+
+        if backward:
+            object_list.reverse()
+            return KeysetPage(
+                object_list,
+                self,
+                has_next=direction == BACKWARD,
+                has_previous=has_more,
+            )
+        return KeysetPage(
+            object_list, self, has_next=has_more, has_previous=bool(values)
+        )
+
+    @property
+    def approximate_count(self):
+        """
+        Количество записей, закэшированное на APPROXIMATE_COUNT_TIMEOUT.
+
+        Returns:
+            Число или None, если подсчёт отключён.
+        """
+        if not self.with_count:
+            return None
+        sql, params = self.queryset.query.sql_with_params()
+        key = "equipment:approximate_count:" + hashlib.md5(
+            repr((sql, params)).encode()
+        ).hexdigest()
+        count = cache.get(key)
+        if count is None:
+            count = self.queryset.count()
+            cache.set(key, count, APPROXIMATE_COUNT_TIMEOUT)
+        return count
@@ -0,0 +1,105 @@
+import heapq
+from datetime import timedelta
+from operator import attrgetter
+
+from .models import MaintenanceSchedule
+from .scheduling import get_recurrences
+
+
+def iter_projected_dates(anchor, periodicity, start_date, end_date):
+    """
+    Генерирует даты работ с шагом periodicity дней от даты anchor.
+
+    Вычисляется только окно [start_date, end_date], поэтому стоимость
+    пропорциональна числу дат в окне, а не расстоянию от anchor.
+    """
+    first = max(0, -(-(start_date - anchor).days // periodicity))
+    step = timedelta(days=periodicity)
+    planned_date = anchor + step * first
+    while planned_date <= end_date:
+        yield planned_date
+        planned_date += step
+
+
+def iter_plan_occurrences(plan, start_date, end_date, dominant=None):
+    """
+    Генерирует плановые работы задания в окне дат.
+
+    Даты отсчитываются от plan.start_date (дата ввода в эксплуатацию),
+    plan.end_date не ограничивает проекцию. Серии дат и режим dominant -
+    как в get_recurrences.
+
+    Yields:
+        Кортежи (planned_date, equipment_id, maintenance_type) по возрастанию.
+    """
+
+    def occurrences(maintenance_type, offset, interval):
+        for planned_date in iter_projected_dates(
+            plan.start_date + timedelta(days=offset),
+            interval,
+            start_date,
+            end_date,
+        ):
+            yield planned_date, plan.equipment_id, maintenance_type
+
+    return heapq.merge(
+        *(
+            occurrences(*recurrence)
+            for recurrence in get_recurrences(plan.periodicities, dominant)
+        )
+    )
+
+
+def iter_projection(plans, start_date, end_date):
+    """
+    Генерирует плановые работы набора заданий в окне дат без обращения к БД.
+
+    Yields:
+        Кортежи (planned_date, equipment_id, maintenance_type) по возрастанию.
+    """
+    return heapq.merge(
+        *(
+            iter_plan_occurrences(plan, start_date, end_date)
+            for plan in plans
+            if plan is not None
+        )
+    )
+
+
+def merge_projection(stored, plans, start_date, end_date):
+    """
+    Объединяет сохранённые записи графика с проекцией по периодичностям.
+
+    Сохраняются только работы с состоянием (выполненные, с заметками,
+    перенесённые), остальные вычисляются при чтении. Сохранённая запись
+    заменяет работу проекции с тем же оборудованием, видом и датой.
+
+    Args:
+        stored: Записи графика окна в порядке плановой даты.
+        plans: Задания SchedulePlan оборудования окна.
+        start_date: Начало окна.
+        end_date: Конец окна.
+
+    Returns:
+        Итератор записей MaintenanceSchedule в порядке плановой даты;
+        работы проекции - несохранённые записи (pk равен None).
+    """
+    stored = list(stored)
+    stored_keys = {
+        (item.equipment_id, item.maintenance_type, item.planned_date)
+        for item in stored
+    }
+    scheduled_status = MaintenanceSchedule.STATUS_CHOICES[0][0]
+    projected = (
+        MaintenanceSchedule(
+            equipment_id=equipment_id,
+            maintenance_type=maintenance_type,
+            planned_date=planned_date,
+            status=scheduled_status,
+        )
+        for planned_date, equipment_id, maintenance_type in iter_projection(
+            plans, start_date, end_date
+        )
+        if (equipment_id, maintenance_type, planned_date) not in stored_keys
+    )
+    return heapq.merge(stored, projected, key=attrgetter("planned_date"))
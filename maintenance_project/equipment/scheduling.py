@@ -0,0 +1,400 @@
+from collections import defaultdict, namedtuple
+from dataclasses import dataclass
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .caching import invalidate_equipment_calendars
+from .models import EquipmentMaintenance, MaintenanceSchedule
+from .summaries import refresh_summaries
+
+
+# Размер пачки для bulk_create.
+SCHEDULE_BATCH_SIZE = 1000
+
+# Размер пачки идентификаторов в условиях IN (...): SQLite ограничивает
+# число параметров одного запроса.
+ID_CHUNK_SIZE = 500
+
+# Горизонт планирования по умолчанию.
+DEFAULT_HORIZON = timedelta(days=365)
+
+# Задание на построение графика для одной единицы оборудования;
+# periodicities - кортеж пар (тип обслуживания, периодичность в днях).
+SchedulePlan = namedtuple(
+    "SchedulePlan", ["equipment_id", "start_date", "end_date", "periodicities"]
+)
+
+
+@dataclass
+class ScheduleStats:
+    """Статистика записи графика обслуживания."""
+
+    created: int = 0
+    deleted: int = 0
+
+    def __add__(self, other):
+        return ScheduleStats(
+            created=self.created + other.created,
+            deleted=self.deleted + other.deleted,
+        )
+
+
+def chunked(items, size):
+    """Разбивает итерируемый набор на списки длиной не больше size."""
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def get_periodicities(to_periodicity, tr_periodicity=None, kr_periodicity=None):
+    """
+    Возвращает кортеж пар (тип обслуживания, периодичность).
+
+    Пустые и неположительные периодичности пропускаются.
+    """
+    return tuple(
+        (maintenance_type, periodicity)
+        for maintenance_type, periodicity in (
+            ("to", to_periodicity),
+            ("tr", tr_periodicity),
+            ("kr", kr_periodicity),
+        )
+        if periodicity and periodicity > 0
+    )
+
+
+def dominant_work_type_enabled():
+    """Включён ли режим доминирующего вида работ (см. get_recurrences)."""
+    return getattr(settings, "MAINTENANCE_DOMINANT_WORK_TYPE", False)
+
+
+def get_recurrences(periodicities, dominant=None):
+    """
+    Раскладывает периодичности на серии плановых дат.
+
+    Серия - тройка (вид работ, сдвиг, шаг) в днях от даты начала графика.
+    Без режима доминирующего вида работ на каждый вид приходится одна
+    серия со сдвигом 0. В этом режиме даты, на которые приходится более
+    крупная работа (КР включает ТР и ТО, ТР включает ТО), из серии
+    исключаются: ТО через 7 дней при ТР через 28 дней даёт серии ТО
+    со сдвигами 7, 14 и 21 и шагом 28. Если шаг более крупной работы
+    не кратен шагу меньшей, даты не исключаются.
+
+    Args:
+        periodicities: Пары (вид работ, периодичность) по возрастанию
+                       объёма работ (см. get_periodicities).
+        dominant: Режим доминирующего вида работ; по умолчанию берётся
+                  из настройки MAINTENANCE_DOMINANT_WORK_TYPE.
+
+    Returns:
+        Кортеж серий.
+    """
+    if dominant is None:
+        dominant = dominant_work_type_enabled()
+
+    recurrences = []
+    for index, (maintenance_type, periodicity) in enumerate(periodicities):
+        larger = periodicities[index + 1:]
+        if dominant and larger and larger[0][1] % periodicity == 0:
+            step = larger[0][1]
+            recurrences.extend(
+                (maintenance_type, offset, step)
+                for offset in range(periodicity, step, periodicity)
+            )
+        else:
+            recurrences.append((maintenance_type, 0, periodicity))
+    return tuple(recurrences)
+
+
+def make_plan(equipment, start_date=None, end_date=None):
+    """
+    Создаёт задание на построение графика для оборудования.
+
+    Returns:
+        SchedulePlan или None, если у оборудования не заданы периодичности.
+    """
+    if not hasattr(equipment, "maintenance"):
+        return None
+
+    if start_date is None:
+        start_date = timezone.now().date()
+
+    if end_date is None:
+        end_date = start_date + DEFAULT_HORIZON
+
+    maintenance = equipment.maintenance
+    return SchedulePlan(
+        equipment_id=equipment.pk,
+        start_date=start_date,
+        end_date=end_date,
+        periodicities=get_periodicities(
+            maintenance.to_periodicity,
+            maintenance.tr_periodicity,
+            maintenance.kr_periodicity,
+        ),
+    )
+
+
+def iter_fleet_plans(end_date, start_date=None, equipment_ids=None):
+    """
+    Генерирует задания для всего парка оборудования одним запросом.
+
+    Args:
+        end_date: Дата окончания графика.
+        start_date: Дата начала графика; если не указана, используется
+                    дата ввода оборудования в эксплуатацию.
+        equipment_ids: Опциональный список идентификаторов оборудования.
+
+    Yields:
+        SchedulePlan в порядке возрастания идентификатора оборудования.
+    """
+    maintenances = EquipmentMaintenance.objects.order_by("equipment_id")
+    if equipment_ids is not None:
+        maintenances = maintenances.filter(equipment_id__in=equipment_ids)
+
+    rows = maintenances.values_list(
+        "equipment_id",
+        "equipment__installation_date",
+        "to_periodicity",
+        "tr_periodicity",
+        "kr_periodicity",
+    )
+    for equipment_id, installation_date, to, tr, kr in rows.iterator():
+        yield SchedulePlan(
+            equipment_id=equipment_id,
+            start_date=start_date or installation_date,
+            end_date=end_date,
+            periodicities=get_periodicities(to, tr, kr),
+        )
+
+
+def compute_planned_dates(plan, dominant=None):
+    """
+    Вычисляет все плановые даты задания без обращения к БД.
+
+    Args:
+        plan: SchedulePlan.
+        dominant: Режим доминирующего вида работ (см. get_recurrences).
+
+    Yields:
+        Кортежи (equipment_id, maintenance_type, planned_date).
+    """
+    span = (plan.end_date - plan.start_date).days
+    for maintenance_type, offset, interval in get_recurrences(
+        plan.periodicities, dominant
+    ):
+        if span < offset:
+            continue
+        first = plan.start_date + timedelta(days=offset)
+        step = timedelta(days=interval)
+        for index in range((span - offset) // interval + 1):
+            yield (plan.equipment_id, maintenance_type, first + step * index)
+
+
+def compute_rows(plans, dominant=None):
+    """Вычисляет плановые записи для набора заданий одним списком."""
+    return [
+        row for plan in plans for row in compute_planned_dates(plan, dominant)
+    ]
+
+
+def iter_window_querysets(plans):
+    """
+    Генерирует querysets записей графика в окнах [start_date, end_date].
+
+    Задания группируются по окну, поэтому для оборудования с общим окном
+    формируется один запрос на пачку идентификаторов.
+    """
+    windows = defaultdict(list)
+    for plan in plans:
+        windows[(plan.start_date, plan.end_date)].append(plan.equipment_id)
+
+    for (start_date, end_date), equipment_ids in windows.items():
+        for ids in chunked(equipment_ids, ID_CHUNK_SIZE):
+            yield MaintenanceSchedule.objects.filter(
+                equipment_id__in=ids,
+                planned_date__gte=start_date,
+                planned_date__lte=end_date,
+            )
+
+
+def count_planned_windows(plans):
+    """Считает записи графика, которые будут заменены заданиями."""
+    return sum(queryset.count() for queryset in iter_window_querysets(plans))
+
+
+def delete_planned_windows(plans):
+    """
+    Удаляет записи графика в окнах заданий.
+
+    Returns:
+        Количество удалённых записей.
+    """
+    deleted = 0
+    for queryset in iter_window_querysets(plans):
+        count, _ = queryset.delete()
+        deleted += count
+    return deleted
+
+
+def bulk_insert_rows(rows, batch_size=SCHEDULE_BATCH_SIZE):
+    """
+    Записывает плановые записи пачками через bulk_create.
+
+    Args:
+        rows: Итерируемый набор кортежей
+              (equipment_id, maintenance_type, planned_date).
+
+    Returns:
+        Количество созданных записей.
+    """
+    scheduled_status = MaintenanceSchedule.STATUS_CHOICES[0][0]
+    created = 0
+    for batch in chunked(rows, batch_size):
+        MaintenanceSchedule.objects.bulk_create(
+            [
+                MaintenanceSchedule(
+                    equipment_id=equipment_id,
+                    maintenance_type=maintenance_type,
+                    planned_date=planned_date,
+                    status=scheduled_status,
+                )
+                for equipment_id, maintenance_type, planned_date in batch
+            ],
+            batch_size=batch_size,
+        )
+        created += len(batch)
+    return created
+
+
+def invalidate_plans_on_commit(plans):
+    """Сбрасывает кэш календарей оборудования заданий после коммита."""
+    equipment_ids = [plan.equipment_id for plan in plans]
+    transaction.on_commit(lambda: invalidate_equipment_calendars(equipment_ids))
+
+
+def refresh_plan_summaries(plans):
+    """Пересчитывает сводки обслуживания оборудования заданий."""
+    refresh_summaries(plan.equipment_id for plan in plans)
+
+
+def write_schedule(plans, rows, batch_size=SCHEDULE_BATCH_SIZE):
+    """
+    Заменяет график в окнах заданий вычисленными записями.
+
+    Удаление и вставка выполняются в одной транзакции.
+    """
+    with transaction.atomic():
+        invalidate_plans_on_commit(plans)
+        deleted = delete_planned_windows(plans)
+        created = bulk_insert_rows(rows, batch_size=batch_size)
+        refresh_plan_summaries(plans)
+    return ScheduleStats(created=created, deleted=deleted)
+
+
+def diff_schedule(plans, rows):
+    """
+    Сравнивает вычисленные записи с уже сохранёнными в окнах заданий.
+
+    Ключ записи - (equipment_id, maintenance_type, planned_date).
+
+    Returns:
+        Пару (записи для вставки, id устаревших записей). Устаревшими
+        считаются только записи со статусом "Запланировано" без
+        фактической даты и заметок, которых нет среди вычисленных;
+        выполненные и отредактированные записи не трогаются.
+    """
+    scheduled_status = MaintenanceSchedule.STATUS_CHOICES[0][0]
+    existing_keys = set()
+    stale_ids = []
+    desired = set(rows)
+
+    for queryset in iter_window_querysets(plans):
+        existing = queryset.values_list(
+            "id",
+            "equipment_id",
+            "maintenance_type",
+            "planned_date",
+            "status",
+            "actual_date",
+            "notes",
+        )
+        for pk, *key, status, actual_date, notes in existing:
+            key = tuple(key)
+            existing_keys.add(key)
+            if (
+                key not in desired
+                and status == scheduled_status
+                and actual_date is None
+                and not notes
+            ):
+                stale_ids.append(pk)
+
+    missing = []
+    for row in rows:
+        if row not in existing_keys:
+            existing_keys.add(row)
+            missing.append(row)
+    return missing, stale_ids
+
+
+def write_schedule_incremental(plans, rows, batch_size=SCHEDULE_BATCH_SIZE):
+    """
+    Приводит график в окнах заданий к вычисленному набору записей.
+
+    Вставляются только недостающие записи и удаляются только устаревшие
+    запланированные, поэтому фактические даты, заметки и выполненные
+    работы сохраняются.
+    """
+    with transaction.atomic():
+        invalidate_plans_on_commit(plans)
+        missing, stale_ids = diff_schedule(plans, rows)
+        deleted = 0
+        for ids in chunked(stale_ids, ID_CHUNK_SIZE):
+            count, _ = MaintenanceSchedule.objects.filter(pk__in=ids).delete()
+            deleted += count
+        created = bulk_insert_rows(missing, batch_size=batch_size)
+        refresh_plan_summaries(plans)
+    return ScheduleStats(created=created, deleted=deleted)
+
+
+def generate_schedules(
+    plans, batch_size=SCHEDULE_BATCH_SIZE, incremental=False, dominant=None
+):
+    """
+    Строит график обслуживания для набора заданий.
+
+    Все плановые даты вычисляются в памяти, затем записываются пачками
+    в одной транзакции.
+
+    Args:
+        plans: Итерируемый набор SchedulePlan.
+        batch_size: Размер пачки bulk_create.
+        incremental: Если True, график не пересоздаётся, а дополняется
+                     недостающими записями с удалением устаревших.
+        dominant: Режим доминирующего вида работ (см. get_recurrences).
+
+    Returns:
+        ScheduleStats с количеством созданных и удалённых записей.
+    """
+    plans = [plan for plan in plans if plan is not None]
+    rows = compute_rows(plans, dominant)
+    write = write_schedule_incremental if incremental else write_schedule
+    return write(plans, rows, batch_size=batch_size)
+
+
+def generate_schedule(equipment, start_date=None, end_date=None, incremental=False):
+    """
+    Функция для создания записей в графике обслуживания.
+    """
+    plan = make_plan(equipment, start_date=start_date, end_date=end_date)
+    if plan is None:
+        return ScheduleStats()
+    return generate_schedules([plan], incremental=incremental)
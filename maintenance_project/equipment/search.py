@@ -0,0 +1,186 @@
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.models import F, FloatField, Func, Q, Value
+
+from .models import Equipment, EquipmentSearchIndex
+
+
+SEARCH_TABLE = EquipmentSearchIndex._meta.db_table
+
+# Поля поиска и их веса в ранжировании bm25 (совпадение в названии или
+# номерах важнее совпадения в описании).
+SEARCH_FIELDS = {
+    "name": 10.0,
+    "model": 5.0,
+    "manufacturer": 3.0,
+    "serial_number": 5.0,
+    "inventory_number": 5.0,
+    "description": 1.0,
+}
+
+# Результаты ранжируются, только если совпадений не больше этого числа:
+# bm25 вычисляется для каждого совпадения, и на очень общих запросах
+# (например, "насос" по парку насосов) сортировка по рангу стоит дороже,
+# чем обычный порядок списка, а смысла почти не имеет.
+SEARCH_RANK_MAX_MATCHES = 1000
+
+# Аннотация ранга и порядок ранжированных результатов (меньше - лучше).
+SEARCH_RANK_FIELD = "search_rank"
+SEARCH_RANK_ORDERING = (SEARCH_RANK_FIELD, "-id")
+
+TERM_RE = re.compile(r"\w+")
+
+
+def get_search_index_sql():
+    """
+    Возвращает DDL индекса: таблицу FTS5 над таблицей оборудования
+    (external content) и триггеры, синхронизирующие её с оборудованием.
+
+    Индекс хранит префиксы из 2 и 3 символов для быстрого поиска по началу
+    слова; регистр и диакритика латиницы не учитываются.
+    """
+    table = Equipment._meta.db_table
+    columns = ", ".join(SEARCH_FIELDS)
+    new = ", ".join(f"new.{column}" for column in SEARCH_FIELDS)
+    old = ", ".join(f"old.{column}" for column in SEARCH_FIELDS)
+    delete_old = (
+        f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, {columns}) "
+        f"VALUES ('delete', old.id, {old});"
+    )
+    insert_new = (
+        f"INSERT INTO {SEARCH_TABLE}(rowid, {columns}) VALUES (new.id, {new});"
+    )
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+        f"{columns}, content='{table}', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        f"CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_ai AFTER INSERT ON {table} "
+        f"BEGIN {insert_new} END",
+        f"CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_ad AFTER DELETE ON {table} "
+        f"BEGIN {delete_old} END",
+        f"CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_au "
+        f"AFTER UPDATE OF {columns} ON {table} "
+        f"BEGIN {delete_old} {insert_new} END",
+    ]
+
+
+def install_search_index(using_connection=None):
+    """
+    Создаёт недостающие таблицу и триггеры индекса и перестраивает его.
+
+    Операция идемпотентна. Миграции, которые пересоздают таблицу
+    оборудования в SQLite, теряют триггеры, поэтому после каждого migrate
+    она повторяется автоматически (reinstall_search_index). На других СУБД
+    ничего не делает: поиск работает через icontains.
+    """
+    using_connection = using_connection or connection
+    if using_connection.vendor != "sqlite":
+        return
+    with using_connection.cursor() as cursor:
+        for sql in get_search_index_sql():
+            cursor.execute(sql)
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')"
+        )
+
+
+def reinstall_search_index(using=DEFAULT_DB_ALIAS, **kwargs):
+    """
+    Обработчик post_migrate: восстанавливает триггеры индекса.
+
+    Ничего не делает, если таблицы индекса нет (миграция индекса ещё не
+    применена или отменена).
+    """
+    using_connection = connections[using]
+    if using_connection.vendor != "sqlite":
+        return
+    if SEARCH_TABLE not in using_connection.introspection.table_names():
+        return
+    install_search_index(using_connection)
+
+
+def drop_search_index(using_connection=None):
+    using_connection = using_connection or connection
+    if using_connection.vendor != "sqlite":
+        return
+    with using_connection.cursor() as cursor:
+        for suffix in ("ai", "ad", "au"):
+            cursor.execute(f"DROP TRIGGER IF EXISTS {SEARCH_TABLE}_{suffix}")
+        cursor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+
+
+def get_search_terms(text):
+    """Слова строки поиска; слова, разделённые знаками ("INV-12"), - фразой."""
+    terms = []
+    for word in (text or "").split():
+        parts = TERM_RE.findall(word)
+        if parts:
+            terms.append(" ".join(parts))
+    return terms
+
+
+def build_match_query(text):
+    """
+    Переводит строку пользователя в запрос FTS5.
+
+    Каждое слово ищется по началу ("нас" находит "насос"), все слова
+    должны встретиться в записи; номера вида "INV-12" ищутся фразой.
+    Слова берутся в кавычки, поэтому операторы FTS5 во вводе пользователя
+    не интерпретируются.
+
+    Returns:
+        Строку запроса или None, если в тексте нет слов.
+    """
+    terms = get_search_terms(text)
+    if not terms:
+        return None
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def search_equipment(queryset, text):
+    """
+    Оставляет в queryset оборудования записи, подходящие под строку поиска.
+
+    Поиск идёт по названию, модели, производителю, серийному
+    и инвентарному номерам и описанию. Если совпадений не больше
+    SEARCH_RANK_MAX_MATCHES, записи получают аннотацию search_rank
+    (bm25 с весами SEARCH_FIELDS; меньше - релевантнее) для сортировки
+    SEARCH_RANK_ORDERING; иначе остаётся обычный порядок списка.
+
+    Args:
+        queryset: QuerySet объектов Equipment.
+        text: Строка поиска; пустая строка не фильтрует записи.
+
+    Returns:
+        Отфильтрованный QuerySet (см. is_ranked).
+    """
+    match = build_match_query(text)
+    if match is None:
+        return queryset
+    if connection.vendor != "sqlite":
+        for term in TERM_RE.findall(text):
+            condition = Q()
+            for field in SEARCH_FIELDS:
+                condition |= Q(**{f"{field}__icontains": term})
+            queryset = queryset.filter(condition)
+        return queryset
+
+    matches = EquipmentSearchIndex.objects.filter(document__match=match)
+    if matches[:SEARCH_RANK_MAX_MATCHES + 1].count() > SEARCH_RANK_MAX_MATCHES:
+        return queryset.filter(pk__in=matches.values("pk"))
+    return queryset.filter(search_index__document__match=match).annotate(
+        **{
+            SEARCH_RANK_FIELD: Func(
+                F("search_index__document"),
+                *(Value(weight) for weight in SEARCH_FIELDS.values()),
+                function="bm25",
+                output_field=FloatField(),
+            )
+        }
+    )
+
+
+def is_ranked(queryset):
+    """Проверяет, что результаты поиска нужно сортировать по рангу."""
+    return SEARCH_RANK_FIELD in queryset.query.annotations
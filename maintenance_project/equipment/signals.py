@@ -0,0 +1,132 @@
+from weakref import WeakKeyDictionary
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .caching import (
+    invalidate_calendar_months,
+    invalidate_equipment_versions,
+    invalidate_type_versions,
+)
+from .models import (
+    Equipment,
+    EquipmentMaintenance,
+    EquipmentType,
+    MaintenanceSchedule,
+    schedules_bulk_updated,
+)
+from .summaries import refresh_summaries
+from .thumbnails import enqueue_thumbnails, thumbnails_outdated
+
+
+CALENDAR_FIELDS = {"equipment", "equipment_id", "planned_date"}
+
+
+@receiver(pre_save, sender=MaintenanceSchedule)
+def remember_schedule_month(sender, instance, update_fields=None, **kwargs):
+    """Запоминает месяц записи до сохранения, если он может измениться."""
+    instance._previous_calendar_key = None
+    if instance.pk is None:
+        return
+    if update_fields is not None and not CALENDAR_FIELDS & set(update_fields):
+        return
+    instance._previous_calendar_key = (
+        MaintenanceSchedule.objects.filter(pk=instance.pk)
+        .values_list("equipment_id", "planned_date")
+        .first()
+    )
+
+
+# Накопленные элементы обработчиков on_commit_batched по подключению к БД.
+commit_batches = WeakKeyDictionary()
+
+
+def on_commit_batched(handler, items):
+    """
+    Вызывает handler один раз после коммита для items всей транзакции.
+
+    Элементы всех вызовов накапливаются в общем наборе подключения:
+    первый обработчик on_commit после коммита забирает весь набор,
+    остальные находят его пустым. Так сохранение тысячи записей графика
+    в цикле пересчитывает сводки одним проходом, а не тысячей. Обработчики
+    отменённых откатом вызовов снимает Django; их элементы достаются
+    следующему коммиту, что лишь повторяет пересчёт. Вне транзакции
+    handler вызывается сразу.
+    """
+    connection = transaction.get_connection()
+    batches = commit_batches.setdefault(connection, {})
+    batches.setdefault(handler, set()).update(items)
+
+    def flush():
+        pending = batches.pop(handler, None)
+        if pending:
+            handler(pending)
+
+    transaction.on_commit(flush)
+
+
+def refresh_schedule_items(items):
+    """Пересчитывает сводки и сбрасывает календари изменённых записей."""
+    refresh_summaries({equipment_id for equipment_id, _ in items})
+    invalidate_calendar_months(items)
+
+
+@receiver(post_save, sender=MaintenanceSchedule)
+def refresh_on_schedule_save(sender, instance, **kwargs):
+    # Удаления записей графика сигналов не отправляют: post_delete
+    # отключил бы быстрое удаление Django в массовых операциях, поэтому
+    # массовые пути сами пересчитывают сводки и сбрасывают календари
+    # (schedules_bulk_updated, invalidate_plans_on_commit).
+    items = {(instance.equipment_id, instance.planned_date)}
+    previous = getattr(instance, "_previous_calendar_key", None)
+    if previous:
+        items.add(tuple(previous))
+    on_commit_batched(refresh_schedule_items, items)
+
+
+@receiver(post_save, sender=Equipment)
+def create_summary(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        equipment_ids = [instance.pk]
+        transaction.on_commit(lambda: refresh_summaries(equipment_ids))
+
+
+@receiver(post_save, sender=Equipment)
+def update_thumbnails(sender, instance, raw=False, **kwargs):
+    """Ставит построение миниатюр в очередь после смены изображения."""
+    if raw or not thumbnails_outdated(instance):
+        return
+    equipment_id = instance.pk
+    transaction.on_commit(lambda: enqueue_thumbnails(equipment_id))
+
+
+@receiver(schedules_bulk_updated, sender=MaintenanceSchedule)
+def refresh_after_bulk_update(sender, items, **kwargs):
+    """Пересчитывает сводки и сбрасывает календари после массового изменения."""
+    items = set(items)
+    refresh_summaries(equipment_id for equipment_id, _ in items)
+    transaction.on_commit(lambda: invalidate_calendar_months(items))
+
+
+@receiver(post_save, sender=Equipment)
+@receiver(post_delete, sender=Equipment)
+def invalidate_equipment_on_change(sender, instance, **kwargs):
+    equipment_ids = [instance.pk]
+    transaction.on_commit(lambda: invalidate_equipment_versions(equipment_ids))
+
+
+@receiver(post_save, sender=EquipmentMaintenance)
+@receiver(post_delete, sender=EquipmentMaintenance)
+def invalidate_maintenance_on_change(sender, instance, **kwargs):
+    equipment_ids = [instance.equipment_id]
+    transaction.on_commit(lambda: invalidate_equipment_versions(equipment_ids))
+
+
+@receiver(post_save, sender=EquipmentType)
+@receiver(post_delete, sender=EquipmentType)
+def invalidate_type_on_change(sender, instance, **kwargs):
+    # Тип входит в данные каждой единицы оборудования этого типа; версия
+    # типа сбрасывает их все без перебора оборудования.
+    equipment_type_ids = [instance.pk]
+    transaction.on_commit(lambda: invalidate_type_versions(equipment_type_ids))
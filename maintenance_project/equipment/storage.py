@@ -0,0 +1,48 @@
+import hashlib
+import posixpath
+import re
+
+from django.core.files.storage import FileSystemStorage
+
+
+# Имя файла в хранилище: <каталог>/<2 символа хэша>/<sha256><расширение>.
+CONTENT_NAME_RE = re.compile(r"(?:^|/)([0-9a-f]{2})/(\1[0-9a-f]{62})(\.\w+)?$")
+
+
+def file_digest(content):
+    """Возвращает SHA-256 содержимого файла, не меняя позицию чтения."""
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+def is_content_addressed(name):
+    """Проверяет, что имя файла уже построено по хэшу содержимого."""
+    return bool(name) and CONTENT_NAME_RE.search(name) is not None
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Файловое хранилище, называющее файлы по хэшу содержимого.
+
+    Каталог из исходного имени сохраняется, а имя файла заменяется на
+    SHA-256 содержимого с исходным расширением. Повторная загрузка того же
+    файла не создаёт копию: возвращается имя уже сохранённого файла.
+    Перезапись разрешена, так как файл с тем же именем имеет то же
+    содержимое.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault("allow_overwrite", True)
+        super().__init__(**kwargs)
+
+    def _save(self, name, content):
+        digest = file_digest(content)
+        directory, filename = posixpath.split(name.replace("\\", "/"))
+        extension = posixpath.splitext(filename)[1].lower()
+        name = posixpath.join(directory, digest[:2], digest + extension)
+        if self.exists(name):
+            return name
+        return super()._save(name, content)
@@ -0,0 +1,119 @@
+from django.db.models import Count, Max, Min, Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Equipment, EquipmentMaintenanceSummary, MaintenanceSchedule
+
+
+# Количество единиц оборудования, пересчитываемых одним запросом.
+SUMMARY_CHUNK_SIZE = 500
+
+SUMMARY_FIELDS = (
+    "next_to_date",
+    "next_tr_date",
+    "next_kr_date",
+    "overdue_count",
+    "last_completed_date",
+)
+
+
+def summary_annotations(today):
+    """Агрегаты сводки по записям графика оборудования на дату today."""
+    scheduled_status, _ = MaintenanceSchedule.STATUS_CHOICES[0]
+    completed_status, _ = MaintenanceSchedule.STATUS_CHOICES[1]
+    overdue_status, _ = MaintenanceSchedule.STATUS_CHOICES[2]
+
+    def next_date(maintenance_type):
+        return Min(
+            "maintenance_schedules__planned_date",
+            filter=Q(
+                maintenance_schedules__maintenance_type=maintenance_type,
+                maintenance_schedules__status=scheduled_status,
+                maintenance_schedules__planned_date__gte=today,
+            ),
+        )
+
+    return {
+        "next_to_date": next_date("to"),
+        "next_tr_date": next_date("tr"),
+        "next_kr_date": next_date("kr"),
+        "overdue_count": Count(
+            "maintenance_schedules",
+            filter=Q(maintenance_schedules__status=overdue_status),
+        ),
+        "last_completed_date": Max(
+            Coalesce(
+                "maintenance_schedules__actual_date",
+                "maintenance_schedules__planned_date",
+            ),
+            filter=Q(maintenance_schedules__status=completed_status),
+        ),
+    }
+
+
+def refresh_summaries(equipment_ids, today=None):
+    """
+    Пересчитывает сводки обслуживания для указанного оборудования.
+
+    Для каждой пачки выполняется один агрегирующий запрос и одна вставка
+    с обновлением при конфликте. Удалённое оборудование пропускается.
+
+    Args:
+        equipment_ids: Идентификаторы оборудования.
+        today: Дата, от которой ищутся следующие работы.
+
+    Returns:
+        Количество обновлённых сводок.
+    """
+    if today is None:
+        today = timezone.now().date()
+    equipment_ids = sorted(set(equipment_ids))
+    annotations = summary_annotations(today)
+
+    refreshed = 0
+    for start in range(0, len(equipment_ids), SUMMARY_CHUNK_SIZE):
+        ids = equipment_ids[start:start + SUMMARY_CHUNK_SIZE]
+        rows = (
+            Equipment.objects.filter(pk__in=ids)
+            .order_by()
+            .annotate(**annotations)
+            .values_list("pk", *SUMMARY_FIELDS)
+        )
+        summaries = [
+            EquipmentMaintenanceSummary(
+                equipment_id=row[0], **dict(zip(SUMMARY_FIELDS, row[1:]))
+            )
+            for row in rows
+        ]
+        EquipmentMaintenanceSummary.objects.bulk_create(
+            summaries,
+            update_conflicts=True,
+            unique_fields=["equipment"],
+            update_fields=SUMMARY_FIELDS + ("updated_at",),
+        )
+        refreshed += len(summaries)
+    return refreshed
+
+
+def rebuild_summaries(today=None):
+    """
+    Полностью пересчитывает сводки для всего парка оборудования.
+
+    Returns:
+        Количество обновлённых сводок.
+    """
+    equipment_ids = Equipment.objects.order_by("pk").values_list("pk", flat=True)
+    return refresh_summaries(equipment_ids.iterator(), today=today)
+
+
+def pending_overdue_equipment_ids(today):
+    """Оборудование, у которого есть работы для перевода в просроченные."""
+    scheduled_status, _ = MaintenanceSchedule.STATUS_CHOICES[0]
+    return list(
+        MaintenanceSchedule.objects.filter(
+            status=scheduled_status, planned_date__lt=today
+        )
+        .order_by()
+        .values_list("equipment_id", flat=True)
+        .distinct()
+    )
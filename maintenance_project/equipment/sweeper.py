@@ -0,0 +1,91 @@
+import logging
+import threading
+
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .caching import invalidate_equipment_calendars
+from .models import MaintenanceSchedule
+from .summaries import pending_overdue_equipment_ids, refresh_summaries
+
+
+logger = logging.getLogger(__name__)
+
+# Как часто фоновый поток проверяет смену суток (в секундах).
+DEFAULT_SWEEP_INTERVAL = 60
+
+
+def sweep_overdue(today=None):
+    """
+    Переводит просроченные запланированные работы в статус "Просрочено".
+
+    Сводки затронутого оборудования пересчитываются в той же транзакции,
+    его календари и зависящие от них фрагменты сбрасываются после неё.
+
+    Returns:
+        Количество обновлённых записей.
+    """
+    if today is None:
+        today = timezone.now().date()
+    with transaction.atomic():
+        equipment_ids = pending_overdue_equipment_ids(today)
+        updated = MaintenanceSchedule.objects.update_overdue_status(today)
+        refresh_summaries(equipment_ids, today=today)
+        transaction.on_commit(
+            lambda: invalidate_equipment_calendars(equipment_ids)
+        )
+    return updated
+
+
+class OverdueSweeper(threading.Thread):
+    """
+    Фоновый поток, обновляющий просроченные статусы раз в сутки.
+
+    Поток раз в interval секунд проверяет текущую дату и выполняет
+    обновление только при смене суток, поэтому запросы на чтение
+    не выполняют записей в БД.
+    """
+
+    def __init__(self, interval=DEFAULT_SWEEP_INTERVAL):
+        super().__init__(name="overdue-sweeper", daemon=True)
+        self.interval = interval
+        self.last_sweep_date = None
+        self._stop_event = threading.Event()
+
+    def run_pending(self):
+        """Выполняет обновление, если за текущие сутки его ещё не было."""
+        today = timezone.now().date()
+        if today == self.last_sweep_date:
+            return None
+
+        close_old_connections()
+        try:
+            updated = sweep_overdue(today)
+        finally:
+            close_old_connections()
+        self.last_sweep_date = today
+        logger.info("Просроченных работ обновлено: %s", updated)
+        return updated
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.run_pending()
+            except Exception:
+                logger.exception("Ошибка при обновлении просроченных работ")
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+
+
+_sweeper = None
+
+
+def start_overdue_sweeper(interval=DEFAULT_SWEEP_INTERVAL):
+    """Запускает фоновый поток обновления статусов (один на процесс)."""
+    global _sweeper
+    if _sweeper is None or not _sweeper.is_alive():
+        _sweeper = OverdueSweeper(interval=interval)
+        _sweeper.start()
+    return _sweeper
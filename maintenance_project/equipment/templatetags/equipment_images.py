@@ -0,0 +1,25 @@
+from django import template
+
+from ..thumbnails import get_picture
+
+
+register = template.Library()
+
+
+@register.inclusion_tag("includes/equipment_picture.html")
+def equipment_picture(equipment, height):
+    """
+    Выводит изображение оборудования тегом <picture> с миниатюрами.
+
+    Использование::
+
+        {% equipment_picture equipment 200 %}
+
+    Браузер выбирает WebP или JPEG нужной плотности из srcset и загружает
+    изображение лениво (loading="lazy").
+    """
+    return {
+        "equipment": equipment,
+        "max_height": height,
+        "picture": get_picture(equipment, height),
+    }
@@ -0,0 +1,51 @@
+from django import template
+
+from ..caching import FRAGMENT_VERSION_KEYS, get_fragment
+
+
+register = template.Library()
+
+
+class FragmentCacheNode(template.Node):
+    def __init__(self, nodelist, name, args):
+        self.nodelist = nodelist
+        self.name = name
+        self.args = args
+
+    def render(self, context):
+        name = self.name.resolve(context)
+        if name not in FRAGMENT_VERSION_KEYS:
+            raise template.TemplateSyntaxError(
+                f"Неизвестный фрагмент '{name}' в теге fragment_cache."
+            )
+        args = [arg.resolve(context) or None for arg in self.args]
+        return get_fragment(name, args, lambda: self.nodelist.render(context))
+
+
+@register.tag
+def fragment_cache(parser, token):
+    """
+    Кэширует фрагмент шаблона с ключом по версиям связанных данных.
+
+    Использование::
+
+        {% fragment_cache "equipment_card" equipment.pk equipment.equipment_type_id %}
+            ...
+        {% endfragment_cache %}
+
+    Имя фрагмента выбирает ключи версий из FRAGMENT_VERSION_KEYS, остальные
+    аргументы передаются функции ключей; пустые значения передаются как None
+    (например, календарь всего парка без оборудования).
+    """
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(
+            f"Тег '{bits[0]}' требует имя фрагмента."
+        )
+    nodelist = parser.parse(("endfragment_cache",))
+    parser.delete_first_token()
+    return FragmentCacheNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        [parser.compile_filter(bit) for bit in bits[2:]],
+    )
@@ -0,0 +1,1652 @@
+import base64
+import csv
+import json
+import random
+import shutil
+import tempfile
+import zipfile
+from datetime import date, timedelta
+from io import BytesIO, StringIO
+from unittest import mock
+from xml.etree import ElementTree
+
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.core.management.sql import emit_post_migrate_signal
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, reverse
+from django.utils import timezone
+import numpy as np
+from PIL import Image
+
+from . import urls
+from .caching import get_fragment_stats, invalidate_equipment_versions
+from .forecast import compute_forecast, get_forecast
+from .importing import import_equipment
+from .models import (
+    Equipment,
+    EquipmentMaintenance,
+    EquipmentMaintenanceSummary,
+    EquipmentType,
+    MaintenanceSchedule,
+)
+from .pagination import InvalidCursor, KeysetPaginator
+from .projection import merge_projection
+from .scheduling import (
+    DEFAULT_HORIZON,
+    SchedulePlan,
+    ScheduleStats,
+    compute_planned_dates,
+    generate_schedule,
+    generate_schedules,
+    get_periodicities,
+    get_recurrences,
+    iter_fleet_plans,
+    make_plan,
+)
+from .summaries import refresh_summaries
+from .sweeper import OverdueSweeper, sweep_overdue
+from .validators import (
+    check_periodicities,
+    check_periodicities_bulk,
+    find_invalid_periodicities,
+)
+
+
+SCHEDULE_TABLE = MaintenanceSchedule._meta.db_table
+
+
+def explain(sql, params=()):
+    """Возвращает план запроса SQLite (EXPLAIN QUERY PLAN) одной строкой."""
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        return "\n".join(row[-1] for row in cursor.fetchall())
+
+
+def schedule_plans(queries):
+    """Планы всех перехваченных запросов к таблице графика обслуживания."""
+    return [
+        explain(query["sql"])
+        for query in queries
+        if f'FROM "{SCHEDULE_TABLE}"' in query["sql"]
+        or f'UPDATE "{SCHEDULE_TABLE}"' in query["sql"]
+    ]
+
+
+class ScheduleFixtureMixin:
+    """Несколько единиц оборудования с записями графика на 2024 год."""
+
+    @classmethod
+    def setUpTestData(cls):
+        equipment_type = EquipmentType.objects.create(name="Насосы", slug="pumps")
+        cls.equipments = []
+        for index in range(3):
+            equipment = Equipment.objects.create(
+                equipment_type=equipment_type,
+                name=f"Насос {index}",
+                model="Н-1",
+                manufacturer="Завод",
+                serial_number=f"SN-{index}",
+                inventory_number=f"INV-{index}",
+                installation_date=date(2024, 1, 1),
+            )
+            EquipmentMaintenance.objects.create(
+                equipment=equipment, to_periodicity=7, tr_periodicity=28
+            )
+            cls.equipments.append(equipment)
+
+        MaintenanceSchedule.objects.bulk_create(
+            MaintenanceSchedule(
+                equipment=equipment,
+                maintenance_type="to",
+                planned_date=date(2024, 1, 1) + timedelta(days=day),
+                status="Запланировано",
+            )
+            for equipment in cls.equipments
+            for day in range(0, 365, 7)
+        )
+
+
+class ScheduleGenerationTests(ScheduleFixtureMixin, TestCase):
+    """График пересоздаётся пачками только в окне задания."""
+
+    def stored_keys(self, equipment, start_date, end_date):
+        return set(
+            equipment.maintenance_schedules.filter(
+                planned_date__gte=start_date, planned_date__lte=end_date
+            ).values_list("equipment_id", "maintenance_type", "planned_date")
+        )
+
+    def test_window_replaced_with_computed_rows(self):
+        equipment = Equipment.objects.select_related("maintenance").get(
+            pk=self.equipments[0].pk
+        )
+        plan = make_plan(
+            equipment, start_date=date(2024, 3, 4), end_date=date(2024, 3, 31)
+        )
+        outside = set(equipment.maintenance_schedules.values_list("pk", flat=True))
+        outside -= set(
+            equipment.maintenance_schedules.filter(
+                planned_date__gte=plan.start_date, planned_date__lte=plan.end_date
+            ).values_list("pk", flat=True)
+        )
+        others = MaintenanceSchedule.objects.exclude(equipment=equipment).count()
+
+        stats = generate_schedules([plan, None])
+
+        self.assertEqual(
+            self.stored_keys(equipment, plan.start_date, plan.end_date),
+            set(compute_planned_dates(plan)),
+        )
+        self.assertEqual(stats, ScheduleStats(created=5, deleted=4))
+        self.assertTrue(
+            outside <= set(equipment.maintenance_schedules.values_list("pk", flat=True))
+        )
+        self.assertEqual(
+            MaintenanceSchedule.objects.exclude(equipment=equipment).count(), others
+        )
+
+    def test_default_plan_window_starts_today(self):
+        equipment = Equipment.objects.select_related("maintenance").get(
+            pk=self.equipments[0].pk
+        )
+        plan = make_plan(equipment)
+        self.assertEqual(plan.start_date, timezone.now().date())
+        self.assertEqual(plan.end_date, plan.start_date + DEFAULT_HORIZON)
+        self.assertEqual(plan.periodicities, (("to", 7), ("tr", 28)))
+
+        bare = Equipment.objects.create(
+            name="Без периодичностей",
+            model="Б-1",
+            manufacturer="Завод",
+            serial_number="SN-B",
+            inventory_number="INV-B",
+            installation_date=date(2024, 1, 1),
+        )
+        self.assertIsNone(make_plan(bare))
+        self.assertEqual(generate_schedule(bare), ScheduleStats())
+
+    def test_regeneration_over_existing_rows_deletes_in_bulk(self):
+        plans = list(
+            iter_fleet_plans(end_date=date(2024, 12, 31), start_date=date(2024, 1, 1))
+        )
+        existing = MaintenanceSchedule.objects.count()
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                stats = generate_schedules(plans)
+
+        self.assertEqual(stats.deleted, existing)
+        statements = [query["sql"].split(None, 1)[0] for query in queries]
+        # Один DELETE на пачку окон, без выборки удаляемых записей по одной.
+        self.assertEqual(statements.count("DELETE"), 1)
+        self.assertLessEqual(len(queries), 10)
+        self.assertEqual(len(callbacks), 1)
+
+
+class IncrementalScheduleTests(ScheduleFixtureMixin, TestCase):
+    """Инкрементальная перестройка не трогает выполненные и изменённые записи."""
+
+    def regenerate(self):
+        return generate_schedules(
+            iter_fleet_plans(date(2024, 12, 31), equipment_ids=[self.equipment.pk]),
+            incremental=True,
+        )
+
+    def setUp(self):
+        self.equipment = self.equipments[0]
+        schedule = self.equipment.maintenance_schedules.filter(maintenance_type="to")
+        # 8 и 22 января выпадут из графика при ТО раз в 14 дней.
+        schedule.filter(planned_date=date(2024, 1, 8)).update(
+            status="Выполнено", actual_date=date(2024, 1, 9)
+        )
+        schedule.filter(planned_date=date(2024, 1, 22)).update(notes="Перенести")
+        maintenance = self.equipment.maintenance
+        maintenance.to_periodicity = 14
+        maintenance.save()
+
+    def test_only_stale_planned_rows_deleted(self):
+        stats = self.regenerate()
+        schedule = self.equipment.maintenance_schedules
+        # ТО на нечётных неделях 2024 года, кроме двух сохраняемых, и все ТР.
+        self.assertEqual(stats, ScheduleStats(created=14, deleted=24))
+        self.assertTrue(
+            schedule.filter(
+                planned_date=date(2024, 1, 8), actual_date=date(2024, 1, 9)
+            ).exists()
+        )
+        self.assertTrue(
+            schedule.filter(planned_date=date(2024, 1, 22), notes="Перенести").exists()
+        )
+        self.assertFalse(schedule.filter(planned_date=date(2024, 2, 5)).exists())
+        self.assertTrue(
+            schedule.filter(
+                planned_date=date(2024, 1, 29), maintenance_type="to"
+            ).exists()
+        )
+
+    def test_second_run_changes_nothing(self):
+        self.regenerate()
+        rows = set(self.equipment.maintenance_schedules.values_list("pk", flat=True))
+        self.assertEqual(self.regenerate(), ScheduleStats())
+        self.assertEqual(
+            set(self.equipment.maintenance_schedules.values_list("pk", flat=True)),
+            rows,
+        )
+
+
+class RegenerateSchedulesCommandTests(ScheduleFixtureMixin, TestCase):
+    """Команда перестраивает график парка по шардам с возобновлением."""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.state_file = f"{directory}/state.json"
+
+    def regenerate(self, *args):
+        output = StringIO()
+        call_command(
+            "regenerate_schedules",
+            "--until=2024-02-29",
+            "--workers=1",
+            "--shard-size=2",
+            f"--state-file={self.state_file}",
+            *args,
+            stdout=output,
+        )
+        return output.getvalue()
+
+    def test_dry_run_counts_without_changes(self):
+        before = MaintenanceSchedule.objects.count()
+        output = self.regenerate("--dry-run")
+        # 9 ТО и 3 ТР на единицу; заменяются 9 сохранённых ТО.
+        self.assertIn("Будет создано записей: 36, удалено записей: 27.", output)
+        self.assertEqual(MaintenanceSchedule.objects.count(), before)
+
+    def test_fleet_windows_regenerated(self):
+        after_window = MaintenanceSchedule.objects.filter(
+            planned_date__gt=date(2024, 2, 29)
+        ).count()
+        output = self.regenerate()
+        self.assertIn("Итого создано записей: 36, удалено записей: 27.", output)
+        self.assertIn("[2/3]", output)
+        for equipment in self.equipments:
+            self.assertEqual(
+                equipment.maintenance_schedules.filter(
+                    maintenance_type="tr", planned_date__lte=date(2024, 2, 29)
+                ).count(),
+                3,
+            )
+        self.assertEqual(
+            MaintenanceSchedule.objects.filter(
+                planned_date__gt=date(2024, 2, 29)
+            ).count(),
+            after_window,
+        )
+
+    def test_resume_requires_same_parameters(self):
+        with open(self.state_file, "w", encoding="utf-8") as file:
+            file.write(
+                '{"params": {"until": "2025-01-01", "from": null, '
+                '"incremental": false}, "last_equipment_id": 1}'
+            )
+        with self.assertRaises(CommandError):
+            self.regenerate("--resume")
+
+
+class OverdueSweepTests(ScheduleFixtureMixin, TestCase):
+    """Просрочка вычисляется при чтении и сохраняется фоновым обновлением."""
+
+    def test_effective_status_before_sweep(self):
+        today = timezone.now().date()
+        item = MaintenanceSchedule.objects.filter(planned_date__lt=today).first()
+        self.assertEqual(item.status, "Запланировано")
+        self.assertEqual(item.effective_status, "Просрочено")
+        annotated = MaintenanceSchedule.objects.annotate_effective_status(
+            today=date(2024, 3, 1)
+        )
+        self.assertEqual(
+            annotated.filter(current_status="Просрочено").count(), 3 * 9
+        )
+        self.assertEqual(
+            MaintenanceSchedule.objects.filter_effective_status(
+                "Запланировано", today=date(2024, 3, 1)
+            ).count(),
+            3 * (53 - 9),
+        )
+
+    def test_sweep_updates_statuses_and_summaries(self):
+        self.assertEqual(sweep_overdue(today=date(2024, 3, 1)), 3 * 9)
+        self.assertEqual(
+            MaintenanceSchedule.objects.filter(status="Просрочено").count(), 3 * 9
+        )
+        summary = EquipmentMaintenanceSummary.objects.get(
+            equipment=self.equipments[0]
+        )
+        self.assertEqual(summary.overdue_count, 9)
+        self.assertEqual(sweep_overdue(today=date(2024, 3, 1)), 0)
+
+    def test_sweeper_runs_once_per_day(self):
+        sweeper = OverdueSweeper()
+        self.assertGreater(sweeper.run_pending(), 0)
+        self.assertIsNone(sweeper.run_pending())
+
+
+class MaintenanceScheduleIndexTests(ScheduleFixtureMixin, TestCase):
+    """Запросы календарей и обновления статусов используют индексы."""
+
+    def assert_plans_use_index(self, plans, index_name):
+        self.assertTrue(plans, "Запросы к графику обслуживания не выполнялись.")
+        for plan in plans:
+            self.assertIn(f"INDEX {index_name}", plan)
+
+    def test_schedule_view_uses_date_index(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse("equipment:schedule"), {"year": 2024, "month": 3}
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assert_plans_use_index(
+            schedule_plans(queries), "schedule_date_equipment_idx"
+        )
+
+    def test_equipment_detail_uses_equipment_date_index(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse(
+                    "equipment:equipment_detail",
+                    kwargs={"equipment_id": self.equipments[0].pk},
+                ),
+                {"year": 2024, "month": 3},
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assert_plans_use_index(
+            schedule_plans(queries), "schedule_equipment_date_idx"
+        )
+
+    def test_overdue_sweep_uses_status_index(self):
+        with CaptureQueriesContext(connection) as queries:
+            updated = sweep_overdue(today=date(2024, 6, 1))
+        self.assertGreater(updated, 0)
+        self.assert_plans_use_index(
+            schedule_plans(queries), "schedule_status_date_idx"
+        )
+
+
+class QueryBudgetMixin:
+    """
+    Проверка бюджета запросов для view.
+
+    View объявляет максимальное число запросов атрибутом query_budget;
+    проверка выполняется с пустым кэшем, то есть в худшем случае.
+    """
+
+    def assert_query_budget(self, url, budget, params=None):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+            if response.streaming:
+                # Потоковые ответы выполняют запросы при чтении содержимого.
+                b"".join(response.streaming_content)
+        self.assertEqual(response.status_code, 200, url)
+        self.assertLessEqual(
+            len(queries),
+            budget,
+            f"{url}: {len(queries)} запросов при бюджете {budget}:\n"
+            + "\n".join(query["sql"] for query in queries),
+        )
+        return response
+
+
+class EquipmentViewQueryBudgetTests(
+    QueryBudgetMixin, ScheduleFixtureMixin, TestCase
+):
+    """Все view приложения укладываются в объявленный бюджет запросов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.user = User.objects.create_user(username="planner")
+
+    def url_arguments(self):
+        """Аргументы URL и GET-параметры для проверки view по имени маршрута."""
+        return {
+            "index": ({}, None),
+            "equipment_type": ({"type_slug": "pumps"}, None),
+            "equipment_detail": (
+                {"equipment_id": self.equipments[0].pk},
+                {"year": 2024, "month": 3},
+            ),
+            "schedule": ({}, {"year": 2024, "month": 3}),
+            "profile": ({"username": self.user.username}, None),
+            "api_equipment_list": ({}, None),
+            "api_equipment_detail": (
+                {"equipment_id": self.equipments[0].pk},
+                None,
+            ),
+            "api_type_list": ({}, None),
+            "api_schedule": ({}, {"from": "2024-03-01", "to": "2024-05-31"}),
+            "api_calendar": ({}, {"year": 2024, "month": 3}),
+            "equipment_ics": ({"equipment_id": self.equipments[0].pk}, None),
+            "equipment_type_ics": ({"type_slug": "pumps"}, None),
+            "forecast": ({}, {"weeks": 52}),
+            "api_forecast": ({}, {"weeks": 52}),
+        }
+
+    def test_views_stay_within_query_budget(self):
+        arguments = self.url_arguments()
+        checked = 0
+        for pattern in urls.urlpatterns:
+            if not isinstance(pattern, URLPattern):
+                continue
+            budget = getattr(pattern.callback, "view_class", None)
+            budget = getattr(budget, "query_budget", None)
+            if budget is None:
+                continue
+            self.assertIn(
+                pattern.name,
+                arguments,
+                f"Нет аргументов для проверки бюджета маршрута {pattern.name}.",
+            )
+            kwargs, params = arguments[pattern.name]
+            with self.subTest(view=pattern.name):
+                self.assert_query_budget(
+                    reverse(f"equipment:{pattern.name}", kwargs=kwargs),
+                    budget,
+                    params,
+                )
+            checked += 1
+        self.assertEqual(checked, len(arguments))
+
+
+class RangeCalendarTests(ScheduleFixtureMixin, TestCase):
+    """Календарь диапазона месяцев и ссылки на соседние диапазоны."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_fleet_range_counts_by_day(self):
+        response = self.client.get(
+            reverse("equipment:schedule"), {"from": "2024-01", "to": "2024-03"}
+        )
+        self.assertEqual(response.status_code, 200)
+        months = response.context["calendar_months"]
+        self.assertEqual(
+            [(month["year"], month["month"]) for month in months],
+            [(2024, 1), (2024, 2), (2024, 3)],
+        )
+        self.assertEqual(
+            response.context["prev_range_url"], "?from=2023-10&to=2023-12"
+        )
+        self.assertEqual(
+            response.context["next_range_url"], "?from=2024-04&to=2024-06"
+        )
+
+    def test_equipment_range_lists_projected_rows(self):
+        response = self.client.get(
+            reverse(
+                "equipment:equipment_detail",
+                kwargs={"equipment_id": self.equipments[0].pk},
+            ),
+            {"from": "2024-02", "to": "2024-03"},
+        )
+        self.assertEqual(response.status_code, 200)
+        schedule = response.context["range_schedule"]
+        self.assertEqual(
+            [item.maintenance_type for item in schedule].count("to"), 8
+        )
+        self.assertEqual(
+            [item.maintenance_type for item in schedule].count("tr"), 2
+        )
+
+    def test_navigation_stops_at_date_limits(self):
+        url = reverse("equipment:schedule")
+        response = self.client.get(url, {"from": "0001-01", "to": "0001-03"})
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context["prev_range_url"])
+        self.assertEqual(
+            response.context["next_range_url"], "?from=0001-04&to=0001-06"
+        )
+
+        response = self.client.get(url, {"from": "9999-11", "to": "9999-12"})
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context["next_range_url"])
+
+    def test_invalid_ranges_not_found(self):
+        url = reverse("equipment:schedule")
+        for params in (
+            {"from": "2024-03", "to": "2024-01"},
+            {"from": "2024-01", "to": "2026-01"},
+            {"from": "2024-01"},
+            {"from": "2024-13", "to": "2025-01"},
+            {"year": 0, "month": 1},
+            {"year": 10000, "month": 1},
+        ):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(url, params).status_code, 404)
+
+
+class ScheduleExportTests(ScheduleFixtureMixin, TestCase):
+    """Выгрузка графика в CSV и XLSX с фильтрами и статусом просрочки."""
+
+    params = {"date_from": "2024-03-01", "date_to": "2024-03-31"}
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user(username="planner"))
+        MaintenanceSchedule.objects.filter(planned_date=date(2024, 3, 4)).update(
+            status="Выполнено", actual_date=date(2024, 3, 5), notes="Замена\x01 фильтра"
+        )
+
+    def export(self, **params):
+        response = self.client.get(
+            reverse("equipment:schedule_export"), {**self.params, **params}
+        )
+        self.assertEqual(response.status_code, 200)
+        return b"".join(response.streaming_content)
+
+    def test_csv_columns_and_filters(self):
+        content = self.export(format="csv", status="Выполнено").decode("utf-8-sig")
+        rows = list(csv.reader(StringIO(content), delimiter=";"))
+        self.assertEqual(
+            rows[0],
+            [
+                "Плановая дата",
+                "Фактическая дата",
+                "Вид работ",
+                "Статус",
+                "Оборудование",
+                "Инвентарный номер",
+                "Серийный номер",
+                "Тип оборудования",
+                "Заметки",
+            ],
+        )
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(
+            rows[1],
+            [
+                "2024-03-04",
+                "2024-03-05",
+                "ТО",
+                "Выполнено",
+                "Насос 0",
+                "INV-0",
+                "SN-0",
+                "Насосы",
+                "Замена\x01 фильтра",
+            ],
+        )
+
+    def test_xlsx_is_valid_workbook(self):
+        with zipfile.ZipFile(BytesIO(self.export(format="xlsx"))) as archive:
+            self.assertIsNone(archive.testzip())
+            sheet = ElementTree.fromstring(archive.read("xl/worksheets/sheet1.xml"))
+        namespace = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+        rows = [
+            [cell.findtext(f"{namespace}is/{namespace}t") for cell in row]
+            for row in sheet.iter(f"{namespace}row")
+        ]
+        # Четыре понедельника марта у трёх единиц оборудования.
+        self.assertEqual(len(rows), 1 + 4 * 3)
+        self.assertEqual(rows[1][:4], ["2024-03-04", "2024-03-05", "ТО", "Выполнено"])
+        self.assertEqual(rows[1][-1], "Замена фильтра")
+        self.assertEqual(rows[-1][3], "Просрочено")
+
+    def test_invalid_filters_rejected(self):
+        response = self.client.get(
+            reverse("equipment:schedule_export"), {"format": "pdf"}
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class EquipmentImportTests(ScheduleFixtureMixin, TestCase):
+    """Импорт CSV сопоставляет оборудование по инвентарному номеру."""
+
+    csv = (
+        "inventory_number;name;equipment_type;model;manufacturer;"
+        "serial_number;installation_date;to_periodicity;tr_periodicity\n"
+        "INV-0;Насос главный;pumps;Н-2;Завод;SN-0;2024-01-01;7;28\n"
+        "INV-10;Насос резервный;pumps;Н-1;Завод;SN-10;2024-06-03;7;\n"
+        "INV-11;Котёл;boilers;К-1;Завод;SN-11;2024-01-01;7;\n"
+        "INV-12;Насос;pumps;Н-1;Завод;SN-12;2024-01-01;7;10\n"
+        "INV-13;Насос;pumps;Н-1;Завод;SN-13;01.01.2024;7;\n"
+        "INV-10;Насос резервный;pumps;Н-1;Завод;SN-10;2024-06-03;14;\n"
+    )
+
+    def test_upsert_by_inventory_number(self):
+        count = Equipment.objects.count()
+        report = import_equipment(
+            StringIO(self.csv), chunk_size=2, schedule_until=date(2024, 6, 30)
+        )
+        # INV-10 создаётся в первой пачке и обновляется в третьей.
+        self.assertEqual((report.rows, report.created, report.updated), (6, 1, 2))
+        self.assertEqual([line for line, _ in report.errors], [4, 5, 6])
+        self.assertIn("boilers", report.errors[0][1])
+        self.assertIn("кратна", report.errors[1][1])
+
+        self.assertEqual(Equipment.objects.count(), count + 1)
+        updated = Equipment.objects.get(inventory_number="INV-0")
+        self.assertEqual(
+            (updated.pk, updated.name), (self.equipments[0].pk, "Насос главный")
+        )
+        created = Equipment.objects.select_related("maintenance").get(
+            inventory_number="INV-10"
+        )
+        self.assertEqual(created.maintenance.to_periodicity, 14)
+        self.assertEqual(
+            list(
+                created.maintenance_schedules.values_list("planned_date", flat=True)
+            ),
+            [date(2024, 6, 3), date(2024, 6, 17)],
+        )
+        self.assertTrue(
+            EquipmentMaintenanceSummary.objects.filter(equipment=created).exists()
+        )
+
+    def test_dry_run_and_missing_columns(self):
+        count = Equipment.objects.count()
+        report = import_equipment(StringIO(self.csv), dry_run=True)
+        # В одной пачке повтор номера попадает в отчёт, берётся последняя строка.
+        self.assertEqual([line for line, _ in report.errors], [4, 5, 6, 7])
+        self.assertEqual(Equipment.objects.count(), count)
+        with self.assertRaises(ValidationError):
+            import_equipment(StringIO("inventory_number,name\nINV-1,Насос\n"))
+
+
+class PeriodicityValidationTests(ScheduleFixtureMixin, TestCase):
+    """Векторная проверка периодичностей совпадает с построчной."""
+
+    def test_bulk_matches_scalar_check(self):
+        rng = random.Random(12)
+        values = [None, -7, 0, 1, 2, 3, 5, 7, 14, 15, 28, 30, 56, 84, 90, 365]
+        triples = [
+            (
+                rng.choice(values[1:]),
+                rng.choice(values),
+                rng.choice(values),
+            )
+            for _ in range(3000)
+        ]
+        expected = {}
+        for index, triple in enumerate(triples):
+            try:
+                check_periodicities(*triple)
+            except ValidationError as error:
+                expected[index] = " ".join(error.messages)
+        self.assertTrue(0 < len(expected) < len(triples))
+        self.assertEqual(
+            find_invalid_periodicities(*zip(*triples)).tolist(), sorted(expected)
+        )
+        self.assertEqual(check_periodicities_bulk(triples), expected)
+        self.assertEqual(
+            check_periodicities_bulk([(None, 28, None)]),
+            {0: "Не указана периодичность 'ТО'."},
+        )
+
+    def test_bulk_update_all_or_nothing(self):
+        maintenances = list(
+            EquipmentMaintenance.objects.filter(
+                equipment__in=self.equipments
+            ).order_by("equipment_id")
+        )
+        for maintenance in maintenances:
+            maintenance.to_periodicity = 14
+        maintenances[1].tr_periodicity = 30
+
+        with self.assertRaises(ValidationError) as context:
+            EquipmentMaintenance.objects.bulk_update_periodicities(maintenances)
+        self.assertEqual(
+            list(context.exception.message_dict), [str(self.equipments[1].pk)]
+        )
+        self.assertFalse(
+            EquipmentMaintenance.objects.filter(to_periodicity=14).exists()
+        )
+
+        maintenances[1].tr_periodicity = 28
+        with self.captureOnCommitCallbacks() as callbacks:
+            updated = EquipmentMaintenance.objects.bulk_update_periodicities(
+                maintenances
+            )
+        self.assertEqual(updated, 3)
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(
+            EquipmentMaintenance.objects.filter(to_periodicity=14).count(), 3
+        )
+
+
+class KeysetPaginationTests(ScheduleFixtureMixin, TestCase):
+    """Курсоры проходят все записи в обе стороны и не принимают подделок."""
+
+    ordering = ("planned_date", "-equipment_id", "id")
+
+    def setUp(self):
+        self.queryset = MaintenanceSchedule.objects.filter(
+            planned_date__lt=date(2024, 3, 1)
+        )
+        self.expected = list(
+            self.queryset.order_by(*self.ordering).values_list("pk", flat=True)
+        )
+        self.paginator = KeysetPaginator(self.queryset, self.ordering, 4)
+
+    def walk(self, cursor, step):
+        pages = []
+        while True:
+            page = self.paginator.page(cursor)
+            pages.append([item.pk for item in page])
+            cursor = step(page)
+            if cursor is None:
+                return pages
+
+    def test_forward_pages_cover_ordering(self):
+        pages = self.walk(None, lambda page: page.next_cursor)
+        self.assertEqual([pk for page in pages for pk in page], self.expected)
+        self.assertEqual([len(page) for page in pages], [4] * 6 + [3])
+        self.assertFalse(self.paginator.page().has_previous())
+
+    def test_backward_pages_from_last(self):
+        last = self.paginator.page().last_cursor
+        pages = self.walk(last, lambda page: page.previous_cursor)
+        self.assertEqual(
+            [pk for page in reversed(pages) for pk in page], self.expected
+        )
+        self.assertEqual(pages[0], self.expected[-4:])
+        self.assertFalse(self.paginator.page(last).has_next())
+        self.assertEqual(len(pages[-1]), 3)
+
+    def test_invalid_cursors_rejected(self):
+        def encode(payload):
+            return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+        for cursor in (
+            "не курсор",
+            encode(["x", []]),
+            encode(["f", ["2024-01-01", 1]]),
+            encode(["f", ["not-a-date", 1, 1]]),
+            encode({"f": 1}),
+            encode(["f", 5]),
+            encode(["f", [5, 1, 1]]),
+            encode(["f", [None, 1, 1]]),
+            encode(["f", [["2024-01-01"], 1, 1]]),
+        ):
+            with self.subTest(cursor=cursor):
+                with self.assertRaises(InvalidCursor):
+                    self.paginator.page(cursor)
+
+    def test_views_reject_tampered_cursors(self):
+        def encode(payload):
+            return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+        requests = [
+            (reverse("equipment:schedule"), {"year": 2024, "month": 1}, value)
+            for value in (["2024", 1, 1], [5, 1, 1], [None, 1, 1])
+        ] + [
+            (reverse("equipment:index"), {}, value)
+            for value in ([5, 1], [None, 1], [{"id": 1}, 1])
+        ]
+        for url, params, values in requests:
+            with self.subTest(url=url, values=values):
+                response = self.client.get(
+                    url, {**params, "cursor": encode(["f", values])}
+                )
+                self.assertEqual(response.status_code, 400)
+
+
+class MaintenanceSummaryTests(ScheduleFixtureMixin, TestCase):
+    """Сводки пересчитываются один раз на транзакцию, без сигналов удаления."""
+
+    def test_saves_in_transaction_refresh_once(self):
+        items = MaintenanceSchedule.objects.filter(planned_date__lte=date(2024, 1, 8))
+        with mock.patch(
+            "equipment.signals.refresh_summaries", wraps=refresh_summaries
+        ) as refresh:
+            with self.captureOnCommitCallbacks(execute=True):
+                for item in items:
+                    item.status = "Выполнено"
+                    item.save()
+        # Сводки и календари обновляются одним проходом на транзакцию.
+        refresh.assert_called_once()
+        summary = EquipmentMaintenanceSummary.objects.get(
+            equipment=self.equipments[0]
+        )
+        self.assertEqual(summary.last_completed_date, date(2024, 1, 8))
+
+    def test_rolled_back_saves_do_not_swallow_later_ones(self):
+        first, second = MaintenanceSchedule.objects.filter(
+            equipment=self.equipments[0]
+        ).order_by("planned_date")[:2]
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    first.status = "Выполнено"
+                    first.save()
+                    raise ValueError
+            except ValueError:
+                pass
+            with transaction.atomic():
+                second.status = "Выполнено"
+                second.save()
+        summary = EquipmentMaintenanceSummary.objects.get(
+            equipment=self.equipments[0]
+        )
+        self.assertEqual(summary.last_completed_date, second.planned_date)
+
+    def test_admin_delete_refreshes_summaries(self):
+        self.client.force_login(User.objects.create_superuser(username="admin"))
+        MaintenanceSchedule.objects.filter(planned_date=date(2024, 1, 8)).update(
+            status="Выполнено"
+        )
+        ids = list(
+            MaintenanceSchedule.objects.filter(
+                status="Выполнено"
+            ).values_list("pk", flat=True)
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse("admin:equipment_maintenanceschedule_changelist"),
+                {"action": "delete_selected", "_selected_action": ids, "post": "yes"},
+            )
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(
+            EquipmentMaintenanceSummary.objects.exclude(
+                last_completed_date=None
+            ).exists()
+        )
+
+
+class StatusTransitionTests(ScheduleFixtureMixin, TestCase):
+    """Массовая смена статусов проверяет переходы и бережёт фактические даты."""
+
+    today = date(2024, 6, 1)
+
+    def setUp(self):
+        self.items = list(
+            MaintenanceSchedule.objects.filter(
+                equipment=self.equipments[0]
+            ).order_by("planned_date")[:3]
+        )
+
+    def set_status(self, item, status, actual_date=None):
+        MaintenanceSchedule.objects.filter(pk=item.pk).update(
+            status=status, actual_date=actual_date
+        )
+
+    def test_transition_matrix(self):
+        statuses = [choice for choice, _ in MaintenanceSchedule.STATUS_CHOICES]
+        item = self.items[0]
+        for current in statuses:
+            for target in statuses:
+                with self.subTest(current=current, target=target):
+                    self.set_status(item, current)
+                    allowed = target in MaintenanceSchedule.STATUS_TRANSITIONS.get(
+                        current, ()
+                    )
+                    if allowed:
+                        MaintenanceSchedule.objects.bulk_transition(
+                            [(item.pk, target, None)], today=self.today
+                        )
+                        item.refresh_from_db()
+                        self.assertEqual(item.status, target)
+                    else:
+                        with self.assertRaises(ValidationError):
+                            MaintenanceSchedule.objects.bulk_transition(
+                                [(item.pk, target, None)], today=self.today
+                            )
+
+    def test_invalid_change_rolls_back_whole_batch(self):
+        valid, invalid, _ = self.items
+        with self.assertRaises(ValidationError) as error:
+            MaintenanceSchedule.objects.bulk_transition(
+                [
+                    (valid.pk, "Выполнено", None),
+                    (invalid.pk, "Просрочено", None),
+                    (0, "Выполнено", None),
+                ],
+                today=self.today,
+            )
+        self.assertEqual(set(error.exception.message_dict), {str(invalid.pk), "0"})
+        self.assertFalse(
+            MaintenanceSchedule.objects.filter(status="Выполнено").exists()
+        )
+
+    def test_actual_dates(self):
+        planned, completed, dated = self.items
+        self.set_status(completed, "Выполнено", date(2024, 1, 9))
+
+        updated = MaintenanceSchedule.objects.bulk_transition(
+            [
+                (planned.pk, "Выполнено", None),
+                (completed.pk, "Выполнено", None),
+                (dated.pk, "Выполнено", date(2024, 1, 16)),
+            ],
+            today=self.today,
+        )
+
+        self.assertEqual(updated, sorted(item.pk for item in self.items))
+        actual_dates = dict(
+            MaintenanceSchedule.objects.filter(
+                pk__in=updated
+            ).values_list("pk", "actual_date")
+        )
+        # Повторная отметка без даты не затирает записанную дату выполнения.
+        self.assertEqual(
+            actual_dates,
+            {
+                planned.pk: self.today,
+                completed.pk: date(2024, 1, 9),
+                dated.pk: date(2024, 1, 16),
+            },
+        )
+
+        MaintenanceSchedule.objects.bulk_transition(
+            [(completed.pk, "Запланировано", None)], today=self.today
+        )
+        completed.refresh_from_db()
+        self.assertIsNone(completed.actual_date)
+
+    def test_admin_mark_completed_keeps_recorded_date(self):
+        self.client.force_login(User.objects.create_superuser(username="admin"))
+        completed = self.items[0]
+        self.set_status(completed, "Выполнено", date(2024, 1, 2))
+        response = self.client.post(
+            reverse("admin:equipment_maintenanceschedule_changelist"),
+            {
+                "action": "mark_completed",
+                "_selected_action": [item.pk for item in self.items],
+            },
+        )
+        self.assertEqual(response.status_code, 302)
+        completed.refresh_from_db()
+        self.assertEqual(completed.actual_date, date(2024, 1, 2))
+        self.assertEqual(
+            MaintenanceSchedule.objects.filter(
+                pk__in=[item.pk for item in self.items], status="Выполнено"
+            ).count(),
+            3,
+        )
+
+
+class AdminChangelistQueryBudgetTests(
+    QueryBudgetMixin, ScheduleFixtureMixin, TestCase
+):
+    """Списки админки выполняют число запросов, не зависящее от строк."""
+
+    # Сессия, пользователь, страница, количество и фильтр.
+    query_budget = 6
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.admin = User.objects.create_superuser(username="admin")
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def test_equipment_changelist(self):
+        url = reverse("admin:equipment_equipment_changelist")
+        for params in (None, {"o": "5"}, {"q": "Насос"}):
+            with self.subTest(params=params):
+                self.assert_query_budget(url, self.query_budget, params)
+
+    def test_schedule_changelist(self):
+        url = reverse("admin:equipment_maintenanceschedule_changelist")
+        for params in (None, {"equipment": self.equipments[0].pk}):
+            with self.subTest(params=params):
+                self.assert_query_budget(url, self.query_budget, params)
+
+
+class ApiConditionalGetTests(ScheduleFixtureMixin, TestCase):
+    """ETag API меняется вместе с данными, а 304 отдаётся без запросов к БД."""
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, url, params=None, etag=None):
+        headers = {"if_none_match": etag} if etag else {}
+        return self.client.get(url, params, headers=headers)
+
+    def assert_not_modified_without_queries(self, url, params=None):
+        response = self.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            cached = self.get(url, params, response["ETag"])
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(len(queries), 0)
+        return response["ETag"]
+
+    def test_schedule_etag_changes_with_month(self):
+        url = reverse("equipment:api_schedule")
+        params = {"from": "2024-03-01", "to": "2024-03-31", "fields": "id,status"}
+        etag = self.assert_not_modified_without_queries(url, params)
+
+        item = MaintenanceSchedule.objects.filter(
+            planned_date__month=3, planned_date__year=2024
+        ).first()
+        item.notes = "Заменён фильтр"
+        with self.captureOnCommitCallbacks(execute=True):
+            item.save()
+
+        self.assertEqual(self.get(url, params, etag).status_code, 200)
+
+    def test_equipment_etag_changes_with_periodicities(self):
+        equipment = self.equipments[0]
+        url = reverse(
+            "equipment:api_equipment_detail",
+            kwargs={"equipment_id": equipment.pk},
+        )
+        etag = self.assert_not_modified_without_queries(url)
+
+        equipment.maintenance.to_periodicity = 14
+        equipment.maintenance.tr_periodicity = 28
+        with self.captureOnCommitCallbacks(execute=True):
+            equipment.maintenance.save()
+
+        response = self.get(url, etag=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["periodicities"]["to"], 14)
+
+    def test_etag_same_for_freshly_seeded_versions(self):
+        # Другой процесс с пустым кэшем строит тот же ETag.
+        url = reverse("equipment:api_equipment_list")
+        etag = self.get(url)["ETag"]
+        cache.clear()
+        self.assertEqual(self.get(url)["ETag"], etag)
+
+    def test_equipment_etag_changes_with_type(self):
+        equipment = self.equipments[0]
+        url = reverse(
+            "equipment:api_equipment_detail",
+            kwargs={"equipment_id": equipment.pk},
+        )
+        etag = self.assert_not_modified_without_queries(url)
+
+        equipment_type = equipment.equipment_type
+        equipment_type.slug = "pumps-main"
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True):
+                equipment_type.save()
+        # Версия типа сбрасывается без перебора оборудования типа.
+        self.assertEqual(len(queries), 1)
+
+        response = self.get(url, etag=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["type"], "pumps-main")
+
+
+class ScheduleFeedTests(ScheduleFixtureMixin, TestCase):
+    """Лента ICS объединяет записи графика с правилами повторения."""
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse(
+            "equipment:equipment_ics",
+            kwargs={"equipment_id": self.equipments[0].pk},
+        )
+
+    def get_feed(self, etag=None):
+        headers = {"if_none_match": etag} if etag else {}
+        response = self.client.get(self.url, headers=headers)
+        if response.streaming:
+            # Строки длиннее 75 байт перенесены (RFC 5545).
+            content = b"".join(response.streaming_content).decode()
+            response.lines = content.replace("\r\n ", "").split("\r\n")
+        return response
+
+    def test_feed_excludes_stored_dates_from_rules(self):
+        lines = self.get_feed().lines
+        stored = MaintenanceSchedule.objects.filter(equipment=self.equipments[0])
+
+        self.assertEqual(lines.count("BEGIN:VEVENT"), stored.count() + 2)
+        self.assertIn("RRULE:FREQ=DAILY;INTERVAL=7", lines)
+        self.assertIn("RRULE:FREQ=DAILY;INTERVAL=28", lines)
+        exdates = [line for line in lines if line.startswith("EXDATE")]
+        self.assertEqual(len(exdates), 1)
+        self.assertEqual(
+            exdates[0].split(":")[1].split(","),
+            [item.planned_date.strftime("%Y%m%d") for item in stored],
+        )
+
+    def test_feed_not_modified_until_schedule_changes(self):
+        etag = self.get_feed()["ETag"]
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.get_feed(etag).status_code, 304)
+        self.assertEqual(len(queries), 0)
+
+        item = MaintenanceSchedule.objects.filter(
+            equipment=self.equipments[0]
+        ).last()
+        item.notes = "Перенесено"
+        with self.captureOnCommitCallbacks(execute=True):
+            item.save()
+
+        self.assertEqual(self.get_feed(etag).status_code, 200)
+
+
+class ScheduleProjectionTests(ScheduleFixtureMixin, TestCase):
+    """Проекция дополняет сохранённые записи работами по периодичностям."""
+
+    def merge(self, start_date, end_date):
+        equipment = Equipment.objects.select_related("maintenance").get(
+            pk=self.equipments[0].pk
+        )
+        stored = equipment.maintenance_schedules.filter(
+            planned_date__gte=start_date, planned_date__lte=end_date
+        ).order_by("planned_date")
+        plan = make_plan(equipment, start_date=equipment.installation_date)
+        return list(merge_projection(stored, [plan], start_date, end_date))
+
+    def test_stored_rows_replace_projected_occurrences(self):
+        items = self.merge(date(2024, 3, 1), date(2024, 3, 31))
+        self.assertEqual(
+            [(item.planned_date.day, item.maintenance_type) for item in items],
+            [(4, "to"), (11, "to"), (18, "to"), (25, "to"), (25, "tr")],
+        )
+        self.assertTrue(all(item.pk for item in items[:4]))
+        self.assertIsNone(items[4].pk)
+
+    def test_projection_beyond_stored_schedule(self):
+        items = self.merge(date(2030, 1, 1), date(2030, 1, 31))
+        self.assertTrue(items)
+        self.assertTrue(all(item.pk is None for item in items))
+        for item in items:
+            periodicity = 7 if item.maintenance_type == "to" else 28
+            days = (item.planned_date - date(2024, 1, 1)).days
+            self.assertEqual(days % periodicity, 0)
+
+    def test_editing_projected_occurrence_stores_it(self):
+        self.client.force_login(User.objects.create_user(username="planner"))
+        url = reverse(
+            "equipment:maintenance_occurrence_edit",
+            kwargs={
+                "equipment_id": self.equipments[0].pk,
+                "maintenance_type": "tr",
+                "planned_date": "2030-01-21",
+            },
+        )
+        self.assertEqual(self.client.get(url).status_code, 200)
+        response = self.client.post(
+            url, {"status": "Запланировано", "notes": "Заказать запчасти"}
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(
+            MaintenanceSchedule.objects.filter(
+                equipment=self.equipments[0],
+                maintenance_type="tr",
+                planned_date=date(2030, 1, 21),
+                notes="Заказать запчасти",
+            ).exists()
+        )
+
+        off_grid = url.replace("2030-01-21", "2030-01-22")
+        self.assertEqual(self.client.get(off_grid).status_code, 404)
+
+
+class DominantWorkTypeTests(ScheduleFixtureMixin, TestCase):
+    """В режиме доминирующего вида работ на день остаётся только самая крупная."""
+
+    def test_coinciding_dates_keep_largest_work(self):
+        plan = SchedulePlan(
+            equipment_id=1,
+            start_date=date(2024, 1, 1),
+            end_date=date(2024, 12, 30),
+            periodicities=(("to", 7), ("tr", 28), ("kr", 364)),
+        )
+        all_rows = list(compute_planned_dates(plan, dominant=False))
+        rows = list(compute_planned_dates(plan, dominant=True))
+
+        dates = [planned_date for _, _, planned_date in rows]
+        self.assertEqual(len(dates), len(set(dates)))
+        self.assertEqual(
+            set(dates), {planned_date for _, _, planned_date in all_rows}
+        )
+        counts = {
+            maintenance_type: sum(1 for row in rows if row[1] == maintenance_type)
+            for maintenance_type in ("to", "tr", "kr")
+        }
+        self.assertEqual(counts, {"to": 39, "tr": 12, "kr": 2})
+
+    def test_delete_dominated_keeps_rows_with_state(self):
+        equipment = self.equipments[0]
+        MaintenanceSchedule.objects.bulk_create(
+            MaintenanceSchedule(
+                equipment=equipment,
+                maintenance_type="tr",
+                planned_date=date(2024, 1, 1) + timedelta(days=day),
+                status="Запланировано",
+            )
+            for day in range(0, 365, 28)
+        )
+        MaintenanceSchedule.objects.filter(
+            equipment=equipment, maintenance_type="to", planned_date=date(2024, 1, 1)
+        ).update(notes="Совместить с ТР")
+
+        self.assertEqual(MaintenanceSchedule.objects.delete_dominated(dry_run=True), 13)
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(MaintenanceSchedule.objects.delete_dominated(), 13)
+        statements = [query["sql"].split(None, 1)[0] for query in queries]
+        self.assertEqual(statements.count("DELETE"), 1)
+
+        remaining = MaintenanceSchedule.objects.filter(
+            equipment=equipment, maintenance_type="to"
+        )
+        self.assertEqual(remaining.count(), 53 - 13)
+        self.assertTrue(remaining.filter(planned_date=date(2024, 1, 1)).exists())
+        self.assertEqual(MaintenanceSchedule.objects.delete_dominated(), 0)
+
+    def test_compaction_matches_dominant_regeneration(self):
+        # ТР через 30 дней не кратен ТО через 7: совпадающие ТО остаются.
+        EquipmentMaintenance.objects.filter(equipment=self.equipments[1]).update(
+            tr_periodicity=30
+        )
+        plans = list(
+            iter_fleet_plans(end_date=date(2024, 12, 30), start_date=date(2024, 1, 1))
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            generate_schedules(plans, dominant=False)
+            MaintenanceSchedule.objects.delete_dominated()
+            stats = generate_schedules(plans, incremental=True, dominant=True)
+
+        self.assertEqual(stats, ScheduleStats())
+        self.assertTrue(
+            MaintenanceSchedule.objects.filter(
+                equipment=self.equipments[1],
+                maintenance_type="to",
+                planned_date=date(2024, 1, 1) + timedelta(days=210),
+            ).exists()
+        )
+
+
+class FragmentCacheTests(ScheduleFixtureMixin, TestCase):
+    """Карточки и календари отдаются из кэша, пока не изменились данные."""
+
+    def setUp(self):
+        cache.clear()
+
+    def card_stats(self):
+        return get_fragment_stats()["equipment_card"]
+
+    def test_cards_cached_until_equipment_changes(self):
+        url = reverse("equipment:index")
+        self.client.get(url)
+        self.assertEqual(self.card_stats(), {"hits": 0, "misses": 3})
+        self.client.get(url)
+        self.assertEqual(self.card_stats(), {"hits": 3, "misses": 3})
+
+        equipment = self.equipments[0]
+        equipment.name = "Насос главный"
+        with self.captureOnCommitCallbacks(execute=True):
+            equipment.save()
+
+        response = self.client.get(url)
+        self.assertContains(response, "Насос главный")
+        self.assertEqual(self.card_stats(), {"hits": 5, "misses": 4})
+
+    def test_cards_refreshed_after_type_change(self):
+        url = reverse("equipment:index")
+        self.client.get(url)
+
+        equipment_type = self.equipments[0].equipment_type
+        equipment_type.name = "Насосы питательные"
+        with self.captureOnCommitCallbacks(execute=True):
+            equipment_type.save()
+
+        self.client.get(url)
+        self.assertEqual(self.card_stats(), {"hits": 0, "misses": 6})
+
+    def test_cards_follow_changes_from_another_process(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        shared = {
+            "default": {
+                "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                "LOCATION": location,
+            }
+        }
+        url = reverse("equipment:index")
+        with override_settings(CACHES=shared):
+            self.client.get(url)
+            # Команда в другом процессе меняет данные и сбрасывает версии
+            # через собственное подключение к тому же кэшу.
+            equipment = self.equipments[0]
+            Equipment.objects.filter(pk=equipment.pk).update(name="Насос резервный")
+            with mock.patch(
+                "equipment.caching.cache", caches.create_connection("default")
+            ):
+                invalidate_equipment_versions([equipment.pk])
+
+            self.assertContains(self.client.get(url), "Насос резервный")
+
+    def test_calendar_refreshed_after_schedule_change(self):
+        url = reverse(
+            "equipment:equipment_detail",
+            kwargs={"equipment_id": self.equipments[0].pk},
+        )
+        params = {"year": 2024, "month": 3}
+        self.client.get(url, params)
+        item = MaintenanceSchedule.objects.filter(
+            equipment=self.equipments[0], planned_date=date(2024, 3, 4)
+        ).get()
+        item.status = "Выполнено"
+        with self.captureOnCommitCallbacks(execute=True):
+            item.save()
+
+        self.assertContains(self.client.get(url, params), "bg-success")
+        self.assertEqual(
+            get_fragment_stats()["equipment_calendar"], {"hits": 0, "misses": 2}
+        )
+
+    def test_stats_view_is_staff_only(self):
+        url = reverse("equipment:fragment_stats")
+        self.client.force_login(User.objects.create_user(username="planner"))
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.force_login(
+            User.objects.create_user(username="admin", is_staff=True)
+        )
+        self.assertIn("equipment_card", self.client.get(url).json())
+
+
+def make_photo(name="photo.jpg", size=(1600, 1200)):
+    buffer = BytesIO()
+    Image.new("RGB", size, (40, 120, 200)).save(buffer, "JPEG")
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/jpeg")
+
+
+class ThumbnailTests(ScheduleFixtureMixin, TestCase):
+    """Изображения хранятся по хэшу содержимого, карточки получают миниатюры."""
+
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root, THUMBNAIL_WORKER_THREAD=False
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def upload(self, equipment, photo):
+        equipment.image = photo
+        with self.captureOnCommitCallbacks(execute=True):
+            equipment.save()
+        equipment.refresh_from_db()
+
+    def test_same_photo_stored_once(self):
+        first, second = self.equipments[:2]
+        self.upload(first, make_photo("first.jpg"))
+        self.upload(second, make_photo("second.JPG"))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(first.image.name, r"^equipment_images/\w{2}/\w{64}\.jpg$")
+        self.assertEqual(first.image_thumbnails, second.image_thumbnails)
+
+    def test_card_uses_lazy_thumbnails(self):
+        equipment = self.equipments[0]
+        self.upload(equipment, make_photo())
+        sizes = equipment.image_thumbnails["sizes"]
+        self.assertEqual(list(sizes), ["200", "300", "400", "600"])
+        self.assertEqual((sizes["200"]["width"], sizes["200"]["height"]), (267, 200))
+        self.assertTrue(equipment.image.storage.exists(sizes["400"]["webp"]))
+
+        response = self.client.get(reverse("equipment:index"))
+        storage = equipment.image.storage
+        self.assertContains(response, 'loading="lazy"')
+        self.assertContains(
+            response,
+            f'srcset="{storage.url(sizes["200"]["webp"])} 1x, '
+            f'{storage.url(sizes["400"]["webp"])} 2x"',
+        )
+        self.assertNotContains(response, f'src="{equipment.image.url}"')
+
+
+class EquipmentSearchTests(QueryBudgetMixin, ScheduleFixtureMixin, TestCase):
+    """Поиск по индексу FTS5 встроен в списки оборудования."""
+
+    def found(self, query, url=None, budget=3):
+        # Бюджет списка, счётчики фасетов и подсчёт совпадений в индексе.
+        response = self.assert_query_budget(
+            url or reverse("equipment:index"), budget, {"q": query}
+        )
+        return [equipment.name for equipment in response.context["page_obj"]]
+
+    def test_prefix_search_ranks_matches(self):
+        self.assertEqual(self.found("нас"), ["Насос 2", "Насос 1", "Насос 0"])
+        self.assertEqual(self.found("inv-1"), ["Насос 1"])
+        self.assertEqual(self.found("Насос SN-2 завод"), ["Насос 2"])
+        self.assertEqual(self.found("компрессор"), [])
+        type_url = reverse(
+            "equipment:equipment_type", kwargs={"type_slug": "pumps"}
+        )
+        self.assertEqual(self.found("sn-0", type_url, budget=4), ["Насос 0"])
+
+    def test_index_follows_equipment_changes(self):
+        equipment = self.equipments[0]
+        equipment.description = "Резервный агрегат котельной"
+        equipment.save()
+        Equipment.objects.filter(pk=self.equipments[1].pk).update(
+            manufacturer="Котельный завод"
+        )
+        self.assertEqual(self.found("котел"), ["Насос 1", "Насос 0"])
+        Equipment.objects.filter(pk=equipment.pk).delete()
+        self.assertEqual(self.found("котел"), ["Насос 1"])
+
+    def test_migrate_restores_lost_triggers(self):
+        # Так теряются триггеры, когда миграция пересоздаёт таблицу в SQLite.
+        with connection.cursor() as cursor:
+            for suffix in ("ai", "ad", "au"):
+                cursor.execute(f"DROP TRIGGER equipment_equipment_fts_{suffix}")
+
+        emit_post_migrate_signal(0, False, connection.alias)
+
+        Equipment.objects.filter(pk=self.equipments[2].pk).update(
+            description="Подпитка котельной"
+        )
+        self.assertEqual(self.found("котел"), ["Насос 2"])
+
+
+class EquipmentFacetTests(QueryBudgetMixin, ScheduleFixtureMixin, TestCase):
+    """Фасеты списков считаются одним запросом и кэшируются."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        compressors = EquipmentType.objects.create(
+            name="Компрессоры", slug="compressors"
+        )
+        Equipment.objects.create(
+            equipment_type=compressors,
+            name="Компрессор",
+            model="К-1",
+            manufacturer="Компрессормаш",
+            serial_number="SN-K",
+            inventory_number="INV-K",
+            installation_date=date(2022, 6, 1),
+        )
+        EquipmentMaintenanceSummary.objects.create(
+            equipment=cls.equipments[0], overdue_count=2
+        )
+
+    def facets(self, response):
+        return {
+            block["name"]: {
+                option["label"]: (option["count"], option["selected"])
+                for option in block["options"]
+            }
+            for block in response.context["facet_blocks"]
+        }
+
+    def test_counts_exclude_own_facet_selection(self):
+        url = reverse("equipment:index")
+        response = self.assert_query_budget(url, 2, {"year": "2024"})
+        facets = self.facets(response)
+        self.assertEqual(len(response.context["page_obj"]), 3)
+        self.assertEqual(response.context["facet_total"], 3)
+        self.assertEqual(facets["year"], {"2024": (3, True), "2022": (1, False)})
+        self.assertEqual(facets["type"], {"Насосы": (3, False)})
+        self.assertEqual(
+            facets["overdue"],
+            {
+                "Есть просроченные работы": (1, False),
+                "Нет просроченных работ": (2, False),
+            },
+        )
+
+        response = self.client.get(url, {"year": "2024", "overdue": "1"})
+        self.assertEqual(
+            [equipment.name for equipment in response.context["page_obj"]],
+            ["Насос 0"],
+        )
+        self.assertEqual(
+            self.facets(response)["manufacturer"], {"Завод": (1, False)}
+        )
+
+    def test_invalid_years_ignored(self):
+        url = reverse("equipment:index")
+        for year in ("99999999999999999999", "0", "10000", "²"):
+            with self.subTest(year=year):
+                response = self.client.get(url, {"year": [year, "2022"]})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(
+                    [equipment.name for equipment in response.context["page_obj"]],
+                    ["Компрессор"],
+                )
+
+    def test_counts_cached_until_catalog_changes(self):
+        url = reverse("equipment:equipment_type", kwargs={"type_slug": "pumps"})
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(len(queries), 2)
+        self.assertNotIn("type", self.facets(response))
+
+        equipment = self.equipments[1]
+        equipment.manufacturer = "Насосмаш"
+        with self.captureOnCommitCallbacks(execute=True):
+            equipment.save()
+        self.assertEqual(
+            self.facets(self.client.get(url))["manufacturer"],
+            {"Завод": (2, False), "Насосмаш": (1, False)},
+        )
+
+
+class ForecastTests(ScheduleFixtureMixin, TestCase):
+    """Прогноз загрузки совпадает с построенным графиком и кэшируется."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        compressors = EquipmentType.objects.create(
+            name="Компрессоры", slug="compressors"
+        )
+        compressor = Equipment.objects.create(
+            equipment_type=compressors,
+            name="Компрессор",
+            model="К-1",
+            manufacturer="Компрессормаш",
+            serial_number="SN-K",
+            inventory_number="INV-K",
+            installation_date=date(2024, 4, 10),
+        )
+        EquipmentMaintenance.objects.create(
+            equipment=compressor,
+            to_periodicity=30,
+            tr_periodicity=90,
+            kr_periodicity=360,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_counts_match_materialized_schedule(self):
+        weeks = 60
+        for dominant in (False, True):
+            forecast = get_forecast(weeks, today=date(2024, 3, 6), dominant=dominant)
+            self.assertEqual(forecast["start"], date(2024, 3, 4))
+            end_date = forecast["start"] + timedelta(weeks=weeks, days=-1)
+            expected = {}
+            for plan in iter_fleet_plans(end_date):
+                slug = Equipment.objects.get(pk=plan.equipment_id).equipment_type.slug
+                for _, maintenance_type, planned_date in compute_planned_dates(
+                    plan, dominant
+                ):
+                    if planned_date >= forecast["start"]:
+                        week = (planned_date - forecast["start"]).days // 7
+                        counts = expected.setdefault(
+                            slug, {kind: [0] * weeks for kind in ("to", "tr", "kr")}
+                        )
+                        counts[maintenance_type][week] += 1
+            with self.subTest(dominant=dominant):
+                self.assertEqual(
+                    {
+                        equipment_type["slug"]: equipment_type["counts"]
+                        for equipment_type in forecast["types"]
+                    },
+                    expected,
+                )
+
+    def test_large_periodicities_match_brute_force(self):
+        start_date = date(2024, 3, 4)
+        weeks = 52
+        # Простые периодичности около 2 000 000 дней: произведение диапазонов
+        # ключа группы больше 2**63, а крупные работы не поглощают мелкие.
+        large = (1999993, 2000003, 2000029, 2000039, 2000081, 2000083, 2000093)
+        generator = random.Random(25)
+        rows = []
+        for _ in range(60):
+            periodicities = [
+                generator.choice(
+                    [None, generator.randint(7, 400)] + [generator.choice(large)] * 2
+                )
+                for _ in range(3)
+            ]
+            periodicities[0] = periodicities[0] or 7
+            installation_date = start_date - timedelta(
+                days=generator.randint(0, 3000)
+            )
+            rows.append(
+                (generator.randint(1, 3), installation_date, *periodicities, 1)
+            )
+
+        for dominant in (False, True):
+            expected = np.zeros((3, 3, weeks), dtype=np.int64)
+            for type_id, installation_date, to, tr, kr, units in rows:
+                first = (installation_date - start_date).days
+                for maintenance_type, offset, step in get_recurrences(
+                    get_periodicities(to, tr, kr), dominant
+                ):
+                    day = first + offset
+                    if day < 0:
+                        day += (step - 1 - day) // step * step
+                    while day < weeks * 7:
+                        kind = ("to", "tr", "kr").index(maintenance_type)
+                        expected[type_id - 1, kind, day // 7] += units
+                        day += step
+
+            type_ids, counts = compute_forecast(
+                rows, start_date, weeks, dominant=dominant
+            )
+            with self.subTest(dominant=dominant):
+                self.assertEqual(type_ids, [1, 2, 3])
+                self.assertEqual(counts.tolist(), expected.tolist())
+
+    def test_api_cached_per_horizon(self):
+        url = reverse("equipment:api_forecast")
+        data = self.client.get(url, {"weeks": 4}).json()
+        self.assertEqual(len(data["week_starts"]), 4)
+        self.assertEqual(
+            [equipment_type["name"] for equipment_type in data["types"]],
+            ["Компрессоры", "Насосы"],
+        )
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url, {"weeks": 4}).json(), data)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(len(self.client.get(url).json()["week_starts"]), 156)
+        self.assertEqual(self.client.get(url, {"weeks": 0}).status_code, 400)
+
+        maintenance = self.equipments[0].maintenance
+        maintenance.to_periodicity = 14
+        with self.captureOnCommitCallbacks(execute=True):
+            maintenance.save()
+        self.assertNotEqual(self.client.get(url, {"weeks": 4}).json(), data)
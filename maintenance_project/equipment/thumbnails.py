@@ -0,0 +1,228 @@
+import logging
+import queue
+import threading
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+from .caching import invalidate_equipment_versions
+from .models import Equipment
+
+
+logger = logging.getLogger(__name__)
+
+# Высоты миниатюр в пикселях: 200 и 300 - карточка и страница оборудования,
+# 400 и 600 - те же места на экранах с двойной плотностью пикселей.
+THUMBNAIL_HEIGHTS = (200, 300, 400, 600)
+
+# Миниатюра не шире высоты, умноженной на это число (панорамные снимки).
+THUMBNAIL_MAX_ASPECT = 3
+
+THUMBNAIL_DIR = "equipment_images/thumbs/"
+JPEG_QUALITY = 85
+WEBP_QUALITY = 80
+
+
+def thumbnails_outdated(equipment):
+    """Проверяет, что миниатюры не соответствуют текущему изображению."""
+    source = equipment.image_thumbnails.get("source", "")
+    return (equipment.image.name or "") != source
+
+
+def save_image(storage, image, image_format, **params):
+    buffer = BytesIO()
+    image.save(buffer, image_format, **params)
+    return storage.save(
+        f"{THUMBNAIL_DIR}thumb.{image_format.lower()}", ContentFile(buffer.getvalue())
+    )
+
+
+def render_thumbnails(name, storage):
+    """
+    Строит миниатюры изображения всех размеров THUMBNAIL_HEIGHTS.
+
+    Каждая миниатюра сохраняется в WebP и в запасном формате (JPEG, для
+    изображений с прозрачностью - PNG). Хранилище называет файлы по хэшу
+    содержимого, поэтому у одинаковых изображений общие миниатюры.
+    Изображение не увеличивается: размеры больше исходного пропускаются.
+
+    Args:
+        name: Имя исходного файла в хранилище.
+        storage: Хранилище изображений.
+
+    Returns:
+        Словарь для Equipment.image_thumbnails: исходный файл, его размеры
+        и миниатюры по высоте.
+    """
+    with storage.open(name) as file:
+        with Image.open(file) as original:
+            original = ImageOps.exif_transpose(original)
+            has_alpha = original.mode in ("RGBA", "LA", "PA") or (
+                original.mode == "P" and "transparency" in original.info
+            )
+            original = original.convert("RGBA" if has_alpha else "RGB")
+
+    sizes = {}
+    for height in THUMBNAIL_HEIGHTS:
+        if height > original.height and sizes:
+            break
+        image = original.copy()
+        image.thumbnail(
+            (height * THUMBNAIL_MAX_ASPECT, height), Image.Resampling.LANCZOS
+        )
+        if has_alpha:
+            fallback = save_image(storage, image, "PNG", optimize=True)
+        else:
+            fallback = save_image(
+                storage,
+                image,
+                "JPEG",
+                quality=JPEG_QUALITY,
+                optimize=True,
+                progressive=True,
+            )
+        sizes[str(height)] = {
+            "width": image.width,
+            "height": image.height,
+            "image": fallback,
+            "webp": save_image(storage, image, "WEBP", quality=WEBP_QUALITY),
+        }
+    return {
+        "source": name,
+        "width": original.width,
+        "height": original.height,
+        "sizes": sizes,
+    }
+
+
+def generate_thumbnails(equipment_id, force=False):
+    """
+    Строит миниатюры изображения оборудования и сохраняет их описание.
+
+    Описание записывается только если изображение не сменилось за время
+    обработки; фрагменты с оборудованием сбрасываются после записи.
+
+    Args:
+        equipment_id: Идентификатор оборудования.
+        force: Перестроить миниатюры, даже если они актуальны.
+
+    Returns:
+        True, если описание миниатюр изменилось.
+    """
+    equipment = Equipment.objects.filter(pk=equipment_id).only(
+        "image", "image_thumbnails"
+    ).first()
+    if equipment is None or not (force or thumbnails_outdated(equipment)):
+        return False
+
+    thumbnails = {}
+    if equipment.image:
+        thumbnails = render_thumbnails(equipment.image.name, equipment.image.storage)
+    updated = Equipment.objects.filter(
+        pk=equipment_id, image=equipment.image.name or ""
+    ).update(image_thumbnails=thumbnails)
+    if updated:
+        equipment_ids = [equipment_id]
+        transaction.on_commit(lambda: invalidate_equipment_versions(equipment_ids))
+    return bool(updated)
+
+
+def get_picture(equipment, height):
+    """
+    Возвращает данные тега <picture> изображения оборудования.
+
+    Args:
+        equipment: Оборудование с изображением.
+        height: Высота показа в CSS-пикселях; в srcset попадают миниатюры
+                этой высоты и вдвое большей (1x и 2x).
+
+    Returns:
+        Словарь с src, srcset, webp_srcset, width и height. Пока миниатюры
+        не построены, src указывает на исходное изображение, а srcset пусты.
+    """
+    picture = {
+        "src": equipment.image.url,
+        "srcset": "",
+        "webp_srcset": "",
+        "width": None,
+        "height": None,
+    }
+    if thumbnails_outdated(equipment):
+        return picture
+
+    storage = equipment.image.storage
+    sizes = equipment.image_thumbnails["sizes"]
+    candidates = []
+    for density, target in ((1, height), (2, height * 2)):
+        # Ближайшая миниатюра не ниже нужной, иначе самая крупная.
+        size = next(
+            (sizes[key] for key in sorted(sizes, key=int) if int(key) >= target),
+            sizes[max(sizes, key=int)],
+        )
+        if not candidates or candidates[-1][1] is not size:
+            candidates.append((density, size))
+    first = candidates[0][1]
+    picture.update(
+        src=storage.url(first["image"]),
+        srcset=", ".join(
+            f"{storage.url(size['image'])} {density}x" for density, size in candidates
+        ),
+        webp_srcset=", ".join(
+            f"{storage.url(size['webp'])} {density}x" for density, size in candidates
+        ),
+        width=first["width"],
+        height=first["height"],
+    )
+    return picture
+
+
+class ThumbnailWorker(threading.Thread):
+    """
+    Фоновый поток, строящий миниатюры из очереди идентификаторов.
+
+    Очередь живёт в памяти процесса: задания, не выполненные до его
+    остановки, восстанавливаются командой generate_thumbnails.
+    """
+
+    def __init__(self):
+        super().__init__(name="thumbnail-worker", daemon=True)
+        self.queue = queue.Queue()
+
+    def run(self):
+        while True:
+            equipment_id = self.queue.get()
+            close_old_connections()
+            try:
+                generate_thumbnails(equipment_id)
+            except Exception:
+                logger.exception(
+                    "Ошибка при построении миниатюр оборудования %s", equipment_id
+                )
+            finally:
+                close_old_connections()
+                self.queue.task_done()
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def enqueue_thumbnails(equipment_id):
+    """
+    Ставит построение миниатюр оборудования в очередь фонового потока.
+
+    При выключенной настройке THUMBNAIL_WORKER_THREAD миниатюры строятся
+    сразу в текущем потоке.
+    """
+    global _worker
+    if not getattr(settings, "THUMBNAIL_WORKER_THREAD", True):
+        generate_thumbnails(equipment_id)
+        return
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = ThumbnailWorker()
+            _worker.start()
+    _worker.queue.put(equipment_id)
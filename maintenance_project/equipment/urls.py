@@ -1,6 +1,6 @@
 from django.urls import path
 
-from . import views
+from . import api, views
 
 
 app_name = "equipment"
@@ -19,15 +19,65 @@ urlpatterns = [
         views.EquipmentTypeListView.as_view(),
         name="equipment_type",
     ),
+    path(
+        "type/<slug:type_slug>/schedule.ics",
+        views.EquipmentTypeScheduleFeedView.as_view(),
+        name="equipment_type_ics",
+    ),
     path(
         "equipment/<int:equipment_id>",
         views.EquipmentDetailView.as_view(),
         name="equipment_detail",
     ),
+    path(
+        "equipment/<int:equipment_id>/schedule.ics",
+        views.EquipmentScheduleFeedView.as_view(),
+        name="equipment_ics",
+    ),
     path("schedule/", views.ScheduleView.as_view(), name="schedule"),
+    path(
+        "schedule/export/",
+        views.ScheduleExportView.as_view(),
+        name="schedule_export",
+    ),
+    path(
+        "schedule/transition/",
+        views.ScheduleTransitionView.as_view(),
+        name="schedule_transition",
+    ),
     path(
         "maintenance/<int:maintenance_id>/edit/",
         views.MaintenanceScheduleUpdateView.as_view(),
         name="maintenance_edit",
     ),
+    path(
+        "equipment/<int:equipment_id>/plan/<str:maintenance_type>/"
+        "<str:planned_date>/edit/",
+        views.MaintenanceOccurrenceEditView.as_view(),
+        name="maintenance_occurrence_edit",
+    ),
+    path(
+        "api/equipment/",
+        api.EquipmentListApiView.as_view(),
+        name="api_equipment_list",
+    ),
+    path(
+        "api/equipment/<int:equipment_id>/",
+        api.EquipmentDetailApiView.as_view(),
+        name="api_equipment_detail",
+    ),
+    path(
+        "api/types/",
+        api.EquipmentTypeListApiView.as_view(),
+        name="api_type_list",
+    ),
+    path(
+        "stats/fragments/",
+        views.FragmentCacheStatsView.as_view(),
+        name="fragment_stats",
+    ),
+    path("api/schedule/", api.ScheduleApiView.as_view(), name="api_schedule"),
+    path("api/calendar/", api.CalendarApiView.as_view(), name="api_calendar"),
+    path("forecast/", views.ForecastView.as_view(), name="forecast"),
+    path("api/forecast/", api.ForecastApiView.as_view(), name="api_forecast"),
 ]
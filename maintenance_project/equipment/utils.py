@@ -1,71 +1,71 @@
 from django.utils import timezone
-from calendar import monthrange
 
+from .caching import get_month_skeleton, group_by_day
+from .search import search_equipment
 
-def prepare_calendar_data(year, month, schedule_items):
+
+def prepare_calendar_data(
+    year, month, schedule_items=(), schedule_by_day=None, counts_by_day=None
+):
     """
     Подготавливает данные для отображения календаря.
 
+    Сетка месяца берётся из кэша, на каждый запрос заново вычисляются
+    только записи дней и отметка текущего дня.
+
     Args:
         year: Год.
         month: Номер месяца.
-        schedule_items: Queryset или список объектов с атрибутом planned_date.
+        schedule_items: Итерируемый набор объектов с атрибутом planned_date:
+                        queryset, список или поток merge_projection.
+        schedule_by_day: Уже сгруппированные записи {день: [записи]};
+                         если передан, schedule_items не используется.
+        counts_by_day: Опциональные количества работ по дням
+                       {день: [(тип обслуживания, количество)]}.
 
     Returns:
         Список недель, каждая из которых является списком словарей с данными дня.
     """
-    days_in_month = monthrange(year, month)[1]
-    first_day_weekday = timezone.datetime(year, month, 1).weekday()
-
-    calendar_data = []
-    week = []
+    if schedule_by_day is None:
+        schedule_by_day = group_by_day(schedule_items)
 
-    # Заполняем пустые дни в начале месяца
-    for _ in range(first_day_weekday):
-        week.append({"day": None, "items": []})
-
-    schedule_by_day = {}
-    for item in schedule_items:
-        day = item.planned_date.day
-        if day not in schedule_by_day:
-            schedule_by_day[day] = []
-        schedule_by_day[day].append(item)
+    today = timezone.now().date()
+    today_day = today.day if (today.year, today.month) == (year, month) else None
+    if counts_by_day is None:
+        counts_by_day = {}
 
-    # Заполняем календарь
-    for day in range(1, days_in_month + 1):
-        current_date = timezone.datetime(year, month, day)
-        is_today = current_date.date() == timezone.now().date()
-        week.append(
-            {
-                "day": day,
-                "items": schedule_by_day.get(day, []),
-                "is_today": is_today,
-                "is_weekend": current_date.weekday() in (5, 6),
-            }
+    calendar_data = []
+    for week in get_month_skeleton(year, month):
+        calendar_data.append(
+            [
+                {
+                    "day": day,
+                    "items": schedule_by_day.get(day, []),
+                    "counts": counts_by_day.get(day, []),
+                    "is_today": day == today_day,
+                    "is_weekend": is_weekend,
+                }
+                if day
+                else {"day": None, "items": []}
+                for day, is_weekend in week
+            ]
         )
-        if len(week) == 7:
-            calendar_data.append(week)
-            week = []
-
-    # Заполняем пустые дни в конце месяца
-    while len(week) < 7:
-        week.append({"day": None, "items": []})
-    if week:
-        calendar_data.append(week)
 
     return calendar_data
 
 
-def filter_equipment(equipments):
+def filter_equipment(equipments, search=None):
     """
     Фильтрует переданный queryset оборудования по следующим критериям:
 
     1. is_displayed у EquipmentType = True
     2. is_displayed у Equipment = True
     3. installation_date <= текущей даты
+    4. совпадение со строкой поиска, если она передана (search_equipment)
 
     Args:
         equipments: QuerySet объектов Equipment.
+        search: Строка полнотекстового поиска.
 
     Returns:
         QuerySet объектов Equipment, отфильтрованный по заданным критериям.
@@ -76,4 +76,6 @@ def filter_equipment(equipments):
         is_displayed=True,
         installation_date__lte=today,
     )
+    if search:
+        equipments = search_equipment(equipments, search)
     return equipments
\ No newline at end of file
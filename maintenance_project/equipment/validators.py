@@ -0,0 +1,118 @@
+import numpy as np
+from django.core.exceptions import ValidationError
+
+
+def check_periodicities(to_periodicity, tr_periodicity=None, kr_periodicity=None):
+    """
+    Проверяет согласованность периодичностей обслуживания.
+
+    Общие правила для формы оборудования и массового импорта.
+
+    Raises:
+        ValidationError: Если периодичности не положительны или не кратны
+                         друг другу.
+    """
+    for periodicity, label in (
+        (to_periodicity, "ТО"),
+        (tr_periodicity, "ТР"),
+        (kr_periodicity, "КР"),
+    ):
+        if periodicity is not None and periodicity <= 0:
+            raise ValidationError(
+                f"Периодичность '{label}' должна быть больше нуля."
+            )
+
+    if tr_periodicity:
+        if tr_periodicity % to_periodicity != 0:
+            raise ValidationError(
+                "Периодичность 'ТР' должна быть кратна периодичности "
+                f"ТО ({to_periodicity} дн.)."
+            )
+
+    if kr_periodicity:
+        if not tr_periodicity:
+            raise ValidationError(
+                "Для задания периодичности 'КР' необходимо указать "
+                "периодичность 'ТР'."
+            )
+        if (
+            kr_periodicity % to_periodicity != 0
+            or kr_periodicity % tr_periodicity != 0
+        ):
+            raise ValidationError(
+                "Периодичность 'КР' должна быть кратна периодичности "
+                f"ТО ({to_periodicity} дн.) и ТР ({tr_periodicity} дн.)."
+            )
+
+
+def _as_array(values):
+    """Массив периодичностей и маска заполненных значений (None - пусто)."""
+    present = np.fromiter(
+        (value is not None for value in values), dtype=bool, count=len(values)
+    )
+    array = np.fromiter(
+        (value or 0 for value in values), dtype=np.int64, count=len(values)
+    )
+    return array, present
+
+
+def find_invalid_periodicities(to_periodicities, tr_periodicities, kr_periodicities):
+    """
+    Векторно находит строки с нарушением правил check_periodicities.
+
+    Args:
+        to_periodicities: Последовательность периодичностей ТО.
+        tr_periodicities: Последовательность периодичностей ТР (None - нет).
+        kr_periodicities: Последовательность периодичностей КР (None - нет).
+
+    Returns:
+        Массив индексов строк с ошибками.
+    """
+    to, to_present = _as_array(to_periodicities)
+    tr, tr_present = _as_array(tr_periodicities)
+    kr, kr_present = _as_array(kr_periodicities)
+
+    invalid = ~to_present | (to <= 0)
+    invalid |= tr_present & (tr <= 0)
+    invalid |= kr_present & (kr <= 0)
+
+    # Делители заменяются единицей там, где строка уже признана ошибочной
+    # или значение отсутствует, чтобы не делить на ноль.
+    safe_to = np.where(invalid, 1, to)
+    safe_tr = np.where(tr > 0, tr, 1)
+    has_tr = tr != 0
+    has_kr = kr != 0
+    invalid |= has_tr & (tr % safe_to != 0)
+    invalid |= has_kr & ~has_tr
+    invalid |= has_kr & ((kr % safe_to != 0) | (kr % safe_tr != 0))
+    return np.flatnonzero(invalid)
+
+
+def check_periodicities_bulk(triples):
+    """
+    Проверяет набор периодичностей (ТО, ТР, КР) за один проход.
+
+    Правила те же, что у check_periodicities: нарушения находятся
+    операциями над массивами, а сообщения формируются только для
+    ошибочных строк.
+
+    Args:
+        triples: Последовательность троек (to, tr, kr).
+
+    Returns:
+        Словарь {индекс строки: сообщение об ошибке}; пустой, если
+        ошибок нет.
+    """
+    if not triples:
+        return {}
+    to, tr, kr = zip(*triples)
+    errors = {}
+    for index in find_invalid_periodicities(to, tr, kr).tolist():
+        if triples[index][0] is None:
+            errors[index] = "Не указана периодичность 'ТО'."
+            continue
+        try:
+            check_periodicities(*triples[index])
+        except ValidationError as error:
+            errors[index] = " ".join(error.messages)
+    return errors
@@ -1,32 +1,80 @@
+import json
 from calendar import monthrange
-
-from django.http import Http404
+from datetime import MAXYEAR, MINYEAR, date, datetime
+from urllib.parse import urlencode
+
+from django.core.exceptions import BadRequest, ValidationError
+from django.db.models import Count
+from django.http import (
+    Http404,
+    HttpResponseBadRequest,
+    JsonResponse,
+    StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404, redirect
 from django.utils.formats import date_format
+from django.utils.http import quote_etag, url_has_allowed_host_and_scheme
 from django.urls import reverse, reverse_lazy
-from django.views.generic import ListView, DetailView, CreateView, UpdateView
+from django.views.decorators.http import condition
+from django.views.generic import (
+    ListView,
+    DetailView,
+    CreateView,
+    UpdateView,
+    TemplateView,
+    View,
+)
 from django.utils import timezone
 from django.contrib import messages
 from django.contrib.auth.forms import UserCreationForm
-from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.auth.models import User
 
+from .caching import (
+    catalog_key,
+    equipment_version_keys,
+    get_fragment_stats,
+    get_month_buckets,
+    remember_equipment_type,
+    schedule_key,
+    versions_etag,
+)
+from .export import EXPORT_FORMATS, get_export_queryset, iter_export
+from .ics import ICS_CONTENT_TYPE, get_feed_equipment, iter_ics
+from .pagination import InvalidCursor, KeysetPaginator
+from .facets import (
+    FACETS,
+    apply_facets,
+    build_facet_blocks,
+    get_facet_counts,
+    parse_facet_selection,
+)
+from .forecast import FORECAST_WEEKS, MAINTENANCE_TYPES, get_forecast
 from .forms import (
     MaintenanceScheduleEditForm,
+    ForecastForm,
     ProfileEditForm,
     GenerateScheduleForm,
+    ScheduleExportForm,
+    ScheduleTransitionForm,
 )
 from .models import (
     Equipment,
+    EquipmentMaintenance,
     EquipmentType,
     MaintenanceSchedule,
-    generate_schedule,
 )
+from .projection import iter_projection, merge_projection
+from .scheduling import generate_schedule, make_plan
+from .search import SEARCH_RANK_ORDERING, is_ranked
 from .utils import filter_equipment, prepare_calendar_data
 
 
 PAGES = 3
 
+# Максимальная длина диапазона календаря (в месяцах).
+MAX_RANGE_MONTHS = 24
+
 
 class CalendarMixin:
     def get_current_year_month(self):
@@ -41,6 +89,8 @@ class CalendarMixin:
 
         if not 1 <= month <= 12:
             raise Http404("Неверный номер месяца.")
+        if not MINYEAR <= year <= MAXYEAR:
+            raise Http404("Неверный год.")
         return year, month
 
     def get_previous_month_and_year(self, month, year):
@@ -59,7 +109,29 @@ class CalendarMixin:
             next_year += 1
         return next_month, next_year
 
-    def get_calendar_data(self, year, month, queryset):
+    def get_projection_plans(self, start_date, end_date):
+        """
+        Возвращает задания для проекции графика по периодичностям.
+
+        None - календарь показывает только сохранённые записи.
+        """
+        return None
+
+    def merge_schedule(self, queryset, start_date, end_date):
+        """Дополняет записи окна работами проекции (см. merge_projection)."""
+        plans = self.get_projection_plans(start_date, end_date)
+        if plans is None:
+            return queryset
+        return merge_projection(queryset, plans, start_date, end_date)
+
+    def get_calendar_data(self, year, month, queryset, equipment_id=None):
+        """
+        Возвращает сетку календаря и список записей месяца.
+
+        Записи месяца вместе с работами проекции, сгруппированные по дням,
+        берутся из кэша календаря оборудования equipment_id (None -
+        календарь всего парка).
+        """
         start_date = timezone.datetime(year, month, 1).date()
         days_in_month = monthrange(year, month)[1]
         end_date = timezone.datetime(year, month, days_in_month).date()
@@ -68,9 +140,165 @@ class CalendarMixin:
             planned_date__gte=start_date, planned_date__lte=end_date
         ).order_by("planned_date")
 
-        calendar_data = prepare_calendar_data(year, month, schedule)
+        schedule_by_day = get_month_buckets(
+            year,
+            month,
+            lambda: list(self.merge_schedule(schedule, start_date, end_date)),
+            equipment_id=equipment_id,
+        )
+        calendar_data = prepare_calendar_data(
+            year, month, schedule_by_day=schedule_by_day
+        )
+        schedule = [
+            item for day in sorted(schedule_by_day) for item in schedule_by_day[day]
+        ]
         return calendar_data, schedule
 
+    def get_month_range(self):
+        """
+        Возвращает диапазон месяцев из параметров ?from=ГГГГ-ММ&to=ГГГГ-ММ.
+
+        Returns:
+            Пару (первый день первого месяца, количество месяцев) или None,
+            если диапазон не задан.
+        """
+        date_from = self.request.GET.get("from")
+        date_to = self.request.GET.get("to")
+        if not date_from and not date_to:
+            return None
+        try:
+            start = datetime.strptime(date_from, "%Y-%m").date()
+            end = datetime.strptime(date_to, "%Y-%m").date()
+        except (TypeError, ValueError):
+            raise Http404("Неверный формат диапазона месяцев.")
+
+        months = (end.year - start.year) * 12 + end.month - start.month + 1
+        if not 1 <= months <= MAX_RANGE_MONTHS:
+            raise Http404("Неверный диапазон месяцев.")
+        return start, months
+
+    def shift_month(self, start, months):
+        """
+        Первый день месяца, отстоящего от start на months месяцев.
+
+        Raises:
+            ValueError: Месяц вне диапазона дат (годы MINYEAR-MAXYEAR).
+        """
+        index = start.year * 12 + start.month - 1 + months
+        return date(index // 12, index % 12 + 1, 1)
+
+    def get_range_bounds(self, start, months):
+        last_month = self.shift_month(start, months - 1)
+        days_in_month = monthrange(last_month.year, last_month.month)[1]
+        return start, last_month.replace(day=days_in_month)
+
+    def get_range_calendar_data(self, start, months, queryset, with_items=True):
+        """
+        Возвращает календари всех месяцев диапазона.
+
+        С with_items все записи диапазона выбираются одним запросом
+        и раскладываются по месяцам и дням за один проход. Без него
+        по дням выводятся только количества работ каждого типа,
+        посчитанные в БД через GROUP BY, - так дёшево для всего парка.
+
+        Returns:
+            Пару (список месяцев, список записей диапазона).
+        """
+        start_date, end_date = self.get_range_bounds(start, months)
+        in_range = queryset.filter(
+            planned_date__gte=start_date, planned_date__lte=end_date
+        )
+
+        buckets = {}
+        counts = {}
+        schedule = []
+        if with_items:
+            schedule = list(
+                self.merge_schedule(
+                    in_range.order_by("planned_date"), start_date, end_date
+                )
+            )
+            for item in schedule:
+                planned_date = item.planned_date
+                buckets.setdefault(
+                    (planned_date.year, planned_date.month), {}
+                ).setdefault(planned_date.day, []).append(item)
+        else:
+            type_labels = dict(MaintenanceSchedule.MAINTENANCE_TYPE_CHOICES)
+            day_counts = (
+                in_range.order_by()
+                .values("planned_date", "maintenance_type")
+                .annotate(count=Count("id"))
+                .order_by("planned_date", "maintenance_type")
+                .values_list("planned_date", "maintenance_type", "count")
+            )
+            for planned_date, maintenance_type, count in day_counts:
+                counts.setdefault(
+                    (planned_date.year, planned_date.month), {}
+                ).setdefault(planned_date.day, []).append(
+                    (type_labels.get(maintenance_type, maintenance_type), count)
+                )
+
+        calendar_months = []
+        for offset in range(months):
+            month_start = self.shift_month(start, offset)
+            key = (month_start.year, month_start.month)
+            calendar_months.append(
+                {
+                    "year": month_start.year,
+                    "month": month_start.month,
+                    "name": date_format(month_start, "F"),
+                    "weeks": prepare_calendar_data(
+                        month_start.year,
+                        month_start.month,
+                        schedule_by_day=buckets.get(key, {}),
+                        counts_by_day=counts.get(key) if not with_items else None,
+                    ),
+                }
+            )
+        return calendar_months, schedule
+
+    def get_range_navigation_urls(self, start, months):
+        """
+        Ссылки на предыдущий и следующий диапазоны той же длины.
+
+        Ссылка равна None, если диапазон выходит за пределы дат.
+        """
+        urls = []
+        for shift in (-months, months):
+            try:
+                range_start = self.shift_month(start, shift)
+                range_end = self.shift_month(range_start, months - 1)
+            except ValueError:
+                urls.append(None)
+                continue
+            urls.append(
+                f"?from={range_start.year:04d}-{range_start.month:02d}"
+                f"&to={range_end.year:04d}-{range_end.month:02d}"
+            )
+        return urls
+
+    def get_range_context(self, start, months, queryset, with_items=True):
+        calendar_months, schedule = self.get_range_calendar_data(
+            start, months, queryset, with_items=with_items
+        )
+        prev_range_url, next_range_url = self.get_range_navigation_urls(
+            start, months
+        )
+        last_month = self.shift_month(start, months - 1)
+        return {
+            "calendar_months": calendar_months,
+            "range_schedule": schedule,
+            "range_label": (
+                f"{date_format(start, 'F Y')} — {date_format(last_month, 'F Y')}"
+            ),
+            "prev_range_url": prev_range_url,
+            "next_range_url": next_range_url,
+        }
+
+    def get_year_url(self, year):
+        return f"?from={year:04d}-01&to={year:04d}-12"
+
     def get_month_navigation_urls(self, month, year):
         prev_month, prev_year = self.get_previous_month_and_year(month, year)
         next_month, next_year = self.get_next_month_and_year(month, year)
@@ -81,40 +309,150 @@ class CalendarMixin:
         return prev_month_url, next_month_url
 
 
-class EquipmentListView(ListView):
+class KeysetPaginationMixin:
+    """
+    Курсорная пагинация для ListView.
+
+    Порядок записей задаётся keyset_ordering; курсор передаётся
+    в GET-параметре cursor_kwarg, остальные параметры запроса сохраняются
+    в ссылках на соседние страницы.
+    """
+
+    keyset_ordering = None
+    cursor_kwarg = "cursor"
+    with_approximate_count = False
+
+    def get_cursor_query(self, cursor=None):
+        params = self.request.GET.copy()
+        params.pop(self.cursor_kwarg, None)
+        if cursor:
+            params[self.cursor_kwarg] = cursor
+        return params.urlencode()
+
+    def get_keyset_ordering(self, queryset):
+        return self.keyset_ordering
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = KeysetPaginator(
+            queryset,
+            self.get_keyset_ordering(queryset),
+            page_size,
+            with_count=self.with_approximate_count,
+        )
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        except InvalidCursor as error:
+            raise BadRequest(str(error))
+
+        page.first_query = self.get_cursor_query()
+        page.previous_query = self.get_cursor_query(page.previous_cursor)
+        page.next_query = self.get_cursor_query(page.next_cursor)
+        page.last_query = self.get_cursor_query(page.last_cursor)
+        return paginator, page, page.object_list, page.has_other_pages()
+
+
+class EquipmentSearchMixin:
+    """
+    Полнотекстовый поиск по списку оборудования (GET-параметр q).
+
+    Ранжированные результаты (см. search_equipment) идут в порядке
+    релевантности, остальные - в обычном порядке списка.
+    """
+
+    search_kwarg = "q"
+
+    def get_search_query(self):
+        return self.request.GET.get(self.search_kwarg, "").strip()
+
+    def get_keyset_ordering(self, queryset):
+        if is_ranked(queryset):
+            return SEARCH_RANK_ORDERING
+        return super().get_keyset_ordering(queryset)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["search_query"] = self.get_search_query()
+        return context
+
+
+class EquipmentFacetMixin:
+    """
+    Фасетные фильтры списка оборудования со счётчиками значений.
+
+    get_queryset передаёт отфильтрованный список в filter_facets, который
+    запоминает его как базу счётчиков и применяет выбранные значения.
+    Счётчики всех фасетов считаются одним запросом и кэшируются
+    (см. get_facet_counts).
+    """
+
+    facets = tuple(FACETS)
+
+    def get_facet_selection(self):
+        return parse_facet_selection(self.request.GET, self.facets)
+
+    def filter_facets(self, queryset):
+        self.facet_queryset = queryset
+        return apply_facets(queryset, self.get_facet_selection())
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        selection = self.get_facet_selection()
+        result = get_facet_counts(self.facet_queryset, selection, self.facets)
+        context["facet_blocks"] = build_facet_blocks(
+            result, selection, self.request.GET, self.facets
+        )
+        context["facet_total"] = result["total"]
+        return context
+
+
+class EquipmentListView(
+    EquipmentFacetMixin, EquipmentSearchMixin, KeysetPaginationMixin, ListView
+):
     model = Equipment
     template_name = "equipment/index.html"
     context_object_name = "equipment_list"
     paginate_by = PAGES
+    keyset_ordering = ("-installation_date", "-id")
+    # Страница оборудования и счётчики фасетов (при поиске ещё подсчёт
+    # совпадений в индексе).
+    query_budget = 2
 
     def get_queryset(self):
-        queryset = Equipment.objects.all().select_related("equipment_type")
-        queryset = filter_equipment(queryset)
-        return queryset
+        queryset = Equipment.objects.all().select_related(
+            "equipment_type", "summary"
+        )
+        queryset = filter_equipment(queryset, search=self.get_search_query())
+        return self.filter_facets(queryset)
 
 
-class EquipmentTypeListView(ListView):
+class EquipmentTypeListView(
+    EquipmentFacetMixin, EquipmentSearchMixin, KeysetPaginationMixin, ListView
+):
     model = Equipment
     template_name = "equipment/equipment_type.html"
     context_object_name = "equipment_list"
     paginate_by = PAGES
+    keyset_ordering = ("-installation_date", "-id")
+    facets = ("manufacturer", "year", "overdue")
+    # Тип оборудования, страница оборудования и счётчики фасетов (при
+    # поиске ещё подсчёт совпадений в индексе).
+    query_budget = 3
 
     def get_queryset(self):
-        slug = self.kwargs["type_slug"]
-        equipment_type = get_object_or_404(
-            EquipmentType, slug=slug, is_displayed=True
+        self.equipment_type = get_object_or_404(
+            EquipmentType, slug=self.kwargs["type_slug"], is_displayed=True
         )
         queryset = (
-            equipment_type.equipments.all().select_related("equipment_type")
+            self.equipment_type.equipments.all().select_related(
+                "equipment_type", "summary"
+            )
         )
-        queryset = filter_equipment(queryset)
-        return queryset
+        queryset = filter_equipment(queryset, search=self.get_search_query())
+        return self.filter_facets(queryset)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["equipment_type"] = get_object_or_404(
-            EquipmentType, slug=self.kwargs["type_slug"], is_displayed=True
-        )
+        context["equipment_type"] = self.equipment_type
         return context
 
 
@@ -123,14 +461,30 @@ class EquipmentDetailView(CalendarMixin, DetailView):
     template_name = "equipment/detail.html"
     context_object_name = "equipment"
     pk_url_kwarg = "equipment_id"
+    # Оборудование с типом и периодичностями, записи месяца (при промахе
+    # кэша календаря).
+    query_budget = 2
 
     def get_queryset(self):
-        return Equipment.objects.all().prefetch_related("maintenance_schedules")
+        return Equipment.objects.select_related("equipment_type", "maintenance")
+
+    def get_projection_plans(self, start_date, end_date):
+        return [make_plan(self.object, start_date=self.object.installation_date)]
 
     def get_context_data(self, **kwargs):
-        MaintenanceSchedule.objects.update_overdue_status()
         context = super().get_context_data(**kwargs)
-        equipment = self.get_object()
+        equipment = self.object
+
+        month_range = self.get_month_range()
+        if month_range:
+            context.update(
+                self.get_range_context(
+                    *month_range, equipment.maintenance_schedules.all()
+                )
+            )
+            context["schedule"] = context["range_schedule"]
+            context["year_url"] = self.get_year_url(month_range[0].year)
+            return self.add_detail_context(context, equipment)
 
         year, month = self.get_current_year_month()
 
@@ -138,6 +492,7 @@ class EquipmentDetailView(CalendarMixin, DetailView):
             year,
             month,
             equipment.maintenance_schedules.all(),
+            equipment_id=equipment.pk,
         )
 
         prev_month_url, next_month_url = self.get_month_navigation_urls(
@@ -153,11 +508,15 @@ class EquipmentDetailView(CalendarMixin, DetailView):
         )
         context["prev_month_url"] = prev_month_url
         context["next_month_url"] = next_month_url
+        context["year_url"] = self.get_year_url(year)
+        return self.add_detail_context(context, equipment)
+
+    def add_detail_context(self, context, equipment):
         context["form"] = GenerateScheduleForm()
 
         try:
             equipment_maintenance = equipment.maintenance
-        except Equipment.DoesNotExist:
+        except EquipmentMaintenance.DoesNotExist:
             equipment_maintenance = None
 
         context["equipment_maintenance"] = equipment_maintenance
@@ -170,14 +529,17 @@ class EquipmentDetailView(CalendarMixin, DetailView):
         form = GenerateScheduleForm(request.POST)
         if form.is_valid():
             end_date = form.cleaned_data["end_date"]
-            generate_schedule(
+            stats = generate_schedule(
                 equipment,
                 start_date=equipment.installation_date,
                 end_date=end_date,
+                incremental=True,
             )
             messages.success(
                 request,
-                f"Расписание успешно создано до {end_date.strftime('%d.%m.%Y')}.",
+                f"Расписание успешно обновлено до {end_date.strftime('%d.%m.%Y')} "
+                f"(добавлено записей: {stats.created}, "
+                f"удалено: {stats.deleted}).",
             )
             return redirect(
                 reverse(
@@ -192,33 +554,61 @@ class EquipmentDetailView(CalendarMixin, DetailView):
             return self.render_to_response(context)
 
 
-class ScheduleView(CalendarMixin, ListView):
+class ScheduleView(CalendarMixin, KeysetPaginationMixin, ListView):
     model = MaintenanceSchedule
     template_name = "equipment/schedule.html"
     context_object_name = "schedule"
     paginate_by = 10
-
-    def get_queryset(self):
-        MaintenanceSchedule.objects.update_overdue_status()
+    keyset_ordering = ("planned_date", "equipment_id", "id")
+    with_approximate_count = True
+    # Страница записей с оборудованием и типом; при промахе кэша также
+    # приблизительное количество и записи месяца для календаря.
+    query_budget = 3
+
+    def get_schedule_bounds(self):
+        month_range = self.get_month_range()
+        if month_range:
+            return self.get_range_bounds(*month_range)
         year, month = self.get_current_year_month()
         start_date = timezone.datetime(year, month, 1).date()
         days_in_month = monthrange(year, month)[1]
         end_date = timezone.datetime(year, month, days_in_month).date()
+        return start_date, end_date
+
+    def get_queryset(self):
+        start_date, end_date = self.get_schedule_bounds()
         queryset = (
-            MaintenanceSchedule.objects.select_related("equipment")
+            MaintenanceSchedule.objects.select_related(
+                "equipment__equipment_type"
+            )
             .filter(planned_date__gte=start_date, planned_date__lte=end_date)
-            .order_by("planned_date", "equipment")
+            .order_by("planned_date", "equipment_id")
         )
         return queryset
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
+        start_date, end_date = self.get_schedule_bounds()
+        context["export_query"] = urlencode(
+            {"date_from": start_date.isoformat(), "date_to": end_date.isoformat()}
+        )
+
+        month_range = self.get_month_range()
+        if month_range:
+            context.update(
+                self.get_range_context(
+                    *month_range, MaintenanceSchedule.objects.all(), with_items=False
+                )
+            )
+            context["year_url"] = self.get_year_url(month_range[0].year)
+            return context
+
         year, month = self.get_current_year_month()
         calendar_data, _ = self.get_calendar_data(
             year,
             month,
-            self.get_queryset(),
+            MaintenanceSchedule.objects.all(),
         )
 
         prev_month_url, next_month_url = self.get_month_navigation_urls(
@@ -237,10 +627,206 @@ class ScheduleView(CalendarMixin, ListView):
         context["next_month_url"] = (
             next_month_url + f"&edit_id={self.request.GET.get('edit_id', '')}"
         )
+        context["year_url"] = self.get_year_url(year)
 
         return context
 
 
+class ScheduleExportView(LoginRequiredMixin, View):
+    """Потоковая выгрузка графика обслуживания в CSV или XLSX."""
+
+    def get(self, request, *args, **kwargs):
+        form = ScheduleExportForm(request.GET)
+        if not form.is_valid():
+            return HttpResponseBadRequest(
+                " ".join(
+                    error for errors in form.errors.values() for error in errors
+                )
+            )
+
+        data = form.cleaned_data
+        queryset = get_export_queryset(
+            date_from=data["date_from"],
+            date_to=data["date_to"],
+            maintenance_type=data["maintenance_type"],
+            status=data["status"],
+            equipment_type_slug=data["equipment_type"],
+        )
+        export_format = data["format"]
+        response = StreamingHttpResponse(
+            iter_export(queryset, export_format),
+            content_type=EXPORT_FORMATS[export_format],
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="schedule.{export_format}"'
+        )
+        return response
+
+
+class ScheduleFeedView(View):
+    """
+    Лента графика обслуживания в формате iCalendar для подписки.
+
+    ETag вычисляется по версиям графика и справочника в кэше, поэтому
+    календарные приложения, периодически опрашивающие ленту, получают
+    304 без обращения к БД, пока данные не изменились.
+    """
+
+    http_method_names = ["get", "head", "options"]
+
+    def get_version_keys(self):
+        """
+        Возвращает ключи версий ленты.
+
+        None означает, что ключи ещё неизвестны без обращения к БД; такая
+        лента получает ETag после обработки запроса.
+        """
+        raise NotImplementedError
+
+    def get_etag(self, request, *args, **kwargs):
+        keys = self.get_version_keys()
+        if keys is None:
+            return None
+        # Текущая дата влияет на статусы с учётом просрочки.
+        return versions_etag(keys, request.path, timezone.now().date())
+
+    def dispatch(self, request, *args, **kwargs):
+        response = condition(etag_func=self.get_etag)(super().dispatch)(
+            request, *args, **kwargs
+        )
+        # Ключи версий могли стать известны при обработке запроса.
+        if response.status_code == 200 and not response.has_header("ETag"):
+            etag = self.get_etag(request, *args, **kwargs)
+            if etag:
+                response["ETag"] = quote_etag(etag)
+        return response
+
+    def get_feed(self):
+        """Возвращает пару (queryset оборудования, название календаря)."""
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        equipments, calendar_name = self.get_feed()
+        response = StreamingHttpResponse(
+            iter_ics(equipments, calendar_name), content_type=ICS_CONTENT_TYPE
+        )
+        response["Content-Disposition"] = 'inline; filename="schedule.ics"'
+        return response
+
+
+class EquipmentScheduleFeedView(ScheduleFeedView):
+    """Лента графика обслуживания одной единицы оборудования."""
+
+    # Оборудование, затем в потоке оборудование с периодичностями и график.
+    query_budget = 3
+
+    def get_version_keys(self):
+        equipment_id = self.kwargs["equipment_id"]
+        keys = equipment_version_keys(equipment_id)
+        if keys is None:
+            return None
+        return keys + [schedule_key(equipment_id)]
+
+    def get_feed(self):
+        equipments = get_feed_equipment(equipment_id=self.kwargs["equipment_id"])
+        equipment = get_object_or_404(equipments)
+        remember_equipment_type(equipment.pk, equipment.equipment_type_id)
+        return equipments, f"Обслуживание: {equipment.name}"
+
+
+class EquipmentTypeScheduleFeedView(ScheduleFeedView):
+    """Лента графика обслуживания всего оборудования типа."""
+
+    # Тип, затем в потоке оборудование с периодичностями и график.
+    query_budget = 3
+
+    def get_version_keys(self):
+        return [catalog_key(), schedule_key(None)]
+
+    def get_feed(self):
+        equipment_type = get_object_or_404(
+            EquipmentType, slug=self.kwargs["type_slug"], is_displayed=True
+        )
+        return (
+            get_feed_equipment(type_slug=equipment_type.slug),
+            f"Обслуживание: {equipment_type.name}",
+        )
+
+
+class ScheduleTransitionView(LoginRequiredMixin, View):
+    """
+    Массовая смена статусов записей графика.
+
+    Принимает JSON {"ids": [...], "status": ..., "actual_date": ...}
+    и отвечает JSON со списком изменённых записей, либо обычную форму
+    страницы графика и перенаправляет обратно с сообщением.
+    """
+
+    def post(self, request, *args, **kwargs):
+        is_json = request.content_type == "application/json"
+        if is_json:
+            try:
+                data = json.loads(request.body)
+            except ValueError:
+                data = None
+            if not isinstance(data, dict):
+                return JsonResponse(
+                    {"errors": {"__all__": ["Неверный формат запроса."]}},
+                    status=400,
+                )
+        else:
+            data = request.POST
+
+        updated = []
+        form = ScheduleTransitionForm(data)
+        if form.is_valid():
+            status = form.cleaned_data["status"]
+            actual_date = form.cleaned_data["actual_date"]
+            try:
+                updated = MaintenanceSchedule.objects.bulk_transition(
+                    (pk, status, actual_date) for pk in form.cleaned_data["ids"]
+                )
+            except ValidationError as error:
+                errors = error.message_dict
+            else:
+                errors = {}
+        else:
+            errors = {
+                field: list(field_errors)
+                for field, field_errors in form.errors.items()
+            }
+
+        if is_json:
+            if errors:
+                return JsonResponse({"errors": errors}, status=400)
+            return JsonResponse({"updated": updated})
+
+        if errors:
+            messages.error(
+                request,
+                " ".join(
+                    message
+                    for field_errors in errors.values()
+                    for message in field_errors
+                ),
+            )
+        else:
+            messages.success(
+                request, f"Статус изменён у записей: {len(updated)}."
+            )
+        return redirect(self.get_next_url())
+
+    def get_next_url(self):
+        next_url = self.request.POST.get("next")
+        if next_url and url_has_allowed_host_and_scheme(
+            next_url,
+            allowed_hosts={self.request.get_host()},
+            require_https=self.request.is_secure(),
+        ):
+            return next_url
+        return reverse("equipment:schedule")
+
+
 class MaintenanceScheduleUpdateView(LoginRequiredMixin, UpdateView):
     model = MaintenanceSchedule
     form_class = MaintenanceScheduleEditForm
@@ -259,6 +845,87 @@ class MaintenanceScheduleUpdateView(LoginRequiredMixin, UpdateView):
         return context
 
 
+class MaintenanceOccurrenceEditView(MaintenanceScheduleUpdateView):
+    """
+    Редактирование работы из проекции графика.
+
+    Работа сохраняется в графике только при сохранении формы; если
+    запись на эту дату уже есть, редактируется она.
+    """
+
+    def get_object(self, queryset=None):
+        equipment = get_object_or_404(
+            Equipment.objects.select_related("maintenance"),
+            pk=self.kwargs["equipment_id"],
+        )
+        maintenance_type = self.kwargs["maintenance_type"]
+        try:
+            planned_date = date.fromisoformat(self.kwargs["planned_date"])
+        except ValueError:
+            raise Http404("Неверная плановая дата.")
+
+        stored = MaintenanceSchedule.objects.filter(
+            equipment=equipment,
+            maintenance_type=maintenance_type,
+            planned_date=planned_date,
+        ).first()
+        if stored is not None:
+            return stored
+
+        plan = make_plan(equipment, start_date=equipment.installation_date)
+        occurrences = iter_projection([plan], planned_date, planned_date)
+        if (planned_date, equipment.pk, maintenance_type) not in occurrences:
+            raise Http404("Такой работы нет в графике оборудования.")
+        return MaintenanceSchedule(
+            equipment=equipment,
+            maintenance_type=maintenance_type,
+            planned_date=planned_date,
+            status=MaintenanceSchedule.STATUS_CHOICES[0][0],
+        )
+
+
+class ForecastView(TemplateView):
+    """Прогноз загрузки: число работ ТО/ТР/КР по неделям и типам."""
+
+    template_name = "equipment/forecast.html"
+    # При промахе кэша периодичности парка и названия типов.
+    query_budget = 2
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        form = ForecastForm(self.request.GET)
+        weeks = form.cleaned_data["weeks"] if form.is_valid() else FORECAST_WEEKS
+        forecast = get_forecast(weeks)
+        context["form"] = form
+        context["forecast"] = forecast
+        context["rows"] = [
+            {
+                "week_start": week_start,
+                "cells": [
+                    [equipment_type["counts"][kind][week] for kind in MAINTENANCE_TYPES]
+                    for equipment_type in forecast["types"]
+                ],
+                "totals": [
+                    forecast["totals"][kind][week] for kind in MAINTENANCE_TYPES
+                ],
+            }
+            for week, week_start in enumerate(forecast["week_starts"])
+        ]
+        return context
+
+
+class FragmentCacheStatsView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """Счётчики попаданий и промахов кэша фрагментов шаблонов."""
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get(self, request, *args, **kwargs):
+        return JsonResponse(
+            get_fragment_stats(), json_dumps_params={"ensure_ascii": False}
+        )
+
+
 class RegisterView(CreateView):
     template_name = "registration/registration_form.html"
     form_class = UserCreationForm
@@ -269,6 +936,7 @@ class ProfileView(DetailView):
     model = User
     template_name = "equipment/profile.html"
     context_object_name = "profile"
+    query_budget = 1
 
     def get_object(self, queryset=None):
         return get_object_or_404(User, username=self.kwargs["username"])
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -87,6 +88,37 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+# Версии календарей, фрагментов и ETag хранятся в кэше, поэтому он должен
+# быть общим для всех веб-процессов и management-команд (regenerate_schedules,
+# sweep_overdue, import_equipment, compact_schedules): с локальным кэшем
+# процесса их изменения не доходят до других процессов. В продакшене лучше
+# использовать RedisCache. Тесты работают в одном процессе и используют
+# локальный кэш, чтобы не трогать кэш разработки.
+TESTING = sys.argv[1:2] == ['test']
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+        'OPTIONS': {
+            # Ключи версий не должны вытесняться: иначе версия начнётся
+            # заново и может совпасть с версией старых записей.
+            'MAX_ENTRIES': 100000,
+        },
+    }
+}
+
+if TESTING:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -135,6 +167,22 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Обновлять просроченные статусы фоновым потоком внутри веб-процесса.
+# При нескольких процессах вместо этого запускайте по расписанию
+# команду sweep_overdue (или sweep_overdue --loop отдельным процессом).
+OVERDUE_SWEEPER_THREAD = False
+
+# Строить миниатюры изображений оборудования фоновым потоком веб-процесса.
+# Если выключено, миниатюры строятся сразу после сохранения; пропущенные
+# (например, после перезапуска процесса) достраивает команда
+# generate_thumbnails.
+THUMBNAIL_WORKER_THREAD = True
+
+# Режим доминирующего вида работ: в дни, когда у оборудования совпадают
+# работы разных видов, график содержит только самую крупную (КР, затем
+# ТР, затем ТО). Уже созданный график сжимается командой compact_schedules.
+MAINTENANCE_DOMINANT_WORK_TYPE = False
+
 CSRF_FAILURE_VIEW = 'pages.views.page_csrf_forbidden'
 
 EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"